@@ -1,5 +1,10 @@
 import os
+import asyncio
+import hashlib
+import logging
+import time
 import jwt
+import httpx
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status, Depends
@@ -7,9 +12,13 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from passlib.context import CryptContext
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from cache import TTLCache, MISSING
+from supabase_executor import supabase_executor
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Configuration
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
@@ -26,6 +35,23 @@ if not all([SUPABASE_URL, SUPABASE_ANON_KEY]):
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY)
 
+# Supabase token verification
+# "local" checks signature/expiry/audience in-process, "remote" asks Supabase Auth for every token
+AUTH_VERIFY_MODE = os.getenv("AUTH_VERIFY_MODE", "local").lower()
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+# Without a JWT secret, HS256 Supabase tokens cannot be checked locally, so they go to Supabase Auth by default
+AUTH_REMOTE_FALLBACK = os.getenv("AUTH_REMOTE_FALLBACK", "false" if SUPABASE_JWT_SECRET else "true").lower() == "true"
+SUPABASE_JWT_AUDIENCE = os.getenv("SUPABASE_JWT_AUDIENCE", "authenticated")
+SUPABASE_JWKS_URL = os.getenv("SUPABASE_JWKS_URL", f"{SUPABASE_URL.rstrip('/')}/auth/v1/.well-known/jwks.json")
+SUPABASE_JWKS_REFRESH_SECONDS = int(os.getenv("SUPABASE_JWKS_REFRESH_SECONDS", "600"))
+SUPABASE_JWKS_MIN_REFRESH_SECONDS = int(os.getenv("SUPABASE_JWKS_MIN_REFRESH_SECONDS", "30"))
+JWT_LEEWAY_SECONDS = int(os.getenv("JWT_LEEWAY_SECONDS", "10"))
+
+# Verified token cache (entries never outlive the token's own exp)
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+AUTH_NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("AUTH_NEGATIVE_CACHE_TTL_SECONDS", "30"))
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -68,31 +94,193 @@ class AuthHandler:
 
 auth_handler = AuthHandler()
 
-async def verify_supabase_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+class SupabaseJWTVerifier:
     """
-    Verify Supabase JWT token and return user information
+    Verifies Supabase access tokens without a network call.
+
+    HS256 tokens are checked against the project's JWT secret, asymmetric
+    tokens (RS256/ES256) against the project's JWKS, which is kept in memory
+    and refreshed by a background task.
+    """
+    HMAC_ALGORITHMS = ["HS256", "HS384", "HS512"]
+    ASYMMETRIC_ALGORITHMS = ["RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "EdDSA"]
+
+    def __init__(self, secret: Optional[str], jwks_url: Optional[str], audience: Optional[str]):
+        self.secret = secret
+        self.jwks_url = jwks_url
+        self.audience = audience
+        self.keys: Dict[str, jwt.PyJWK] = {}
+        self.last_refresh = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Load the JWKS and keep it fresh in the background"""
+        if not self.jwks_url or self._refresh_task:
+            return
+        await self.refresh_keys()
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(SUPABASE_JWKS_REFRESH_SECONDS)
+            await self.refresh_keys()
+
+    async def refresh_keys(self, force: bool = True) -> bool:
+        """Fetch the JWKS; without force, refreshes are rate limited"""
+        async with self._refresh_lock:
+            if not force and time.monotonic() - self.last_refresh < SUPABASE_JWKS_MIN_REFRESH_SECONDS:
+                return False
+            self.last_refresh = time.monotonic()
+            try:
+                async with httpx.AsyncClient(timeout=5.0) as client:
+                    response = await client.get(self.jwks_url, headers={"apikey": SUPABASE_ANON_KEY})
+                    response.raise_for_status()
+                    jwks = response.json()
+            except Exception as e:
+                logger.warning(f"Could not refresh Supabase JWKS: {e}")
+                return False
+
+            keys = {}
+            for key_data in jwks.get("keys", []):
+                try:
+                    keys[key_data.get("kid")] = jwt.PyJWK(key_data)
+                except jwt.PyJWTError as e:
+                    logger.warning(f"Skipping unusable JWKS key {key_data.get('kid')}: {e}")
+            self.keys = keys
+            logger.info(f"Loaded {len(keys)} Supabase signing key(s)")
+            return True
+
+    async def _get_key(self, header: Dict[str, Any]):
+        algorithm = header.get("alg")
+        if algorithm in self.HMAC_ALGORITHMS:
+            if not self.secret:
+                raise jwt.InvalidTokenError("No JWT secret configured for HMAC tokens")
+            return self.secret
+        if algorithm not in self.ASYMMETRIC_ALGORITHMS:
+            raise jwt.InvalidAlgorithmError(f"Unsupported token algorithm: {algorithm}")
+
+        kid = header.get("kid")
+        if kid not in self.keys and self.jwks_url:
+            # Unknown key id: the project may have rotated keys since the last refresh
+            await self.refresh_keys(force=False)
+        if kid not in self.keys:
+            raise jwt.InvalidTokenError("Unknown signing key")
+        return self.keys[kid]
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token claims, raising jwt.PyJWTError if the token is not valid"""
+        header = jwt.get_unverified_header(token)
+        key = await self._get_key(header)
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[header["alg"]],
+            audience=self.audience,
+            leeway=JWT_LEEWAY_SECONDS,
+            options={"require": ["exp", "sub"]},
+        )
+
+class TokenRejected(HTTPException):
+    """A 401 for a token that is definitely invalid (bad signature, expired, malformed), safe to negative-cache"""
+
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+# Verification errors that depend only on the token; anything else (unknown key id, missing secret) may pass later
+DEFINITE_TOKEN_ERRORS = (
+    jwt.ExpiredSignatureError,
+    jwt.ImmatureSignatureError,
+    jwt.DecodeError,
+    jwt.InvalidAudienceError,
+    jwt.InvalidAlgorithmError,
+    jwt.InvalidIssuedAtError,
+    jwt.MissingRequiredClaimError,
+)
+
+jwt_verifier = SupabaseJWTVerifier(SUPABASE_JWT_SECRET, SUPABASE_JWKS_URL, SUPABASE_JWT_AUDIENCE)
+
+if AUTH_VERIFY_MODE == "local" and not SUPABASE_JWT_SECRET and not AUTH_REMOTE_FALLBACK:
+    logger.warning("SUPABASE_JWT_SECRET is not set and AUTH_REMOTE_FALLBACK is off: HS256 Supabase tokens will be rejected")
+
+async def _verify_remote(token: str) -> Dict[str, Any]:
+    """
+    Verify a token by asking Supabase Auth, falling back to tokens issued by this API
     """
     try:
-        token = credentials.credentials
-        
-        # Try to verify with Supabase first
+        user_response = await supabase_executor.run(supabase.auth.get_user, token)
+        if user_response.user:
+            return {
+                "user_id": user_response.user.id,
+                "email": user_response.user.email,
+                "user": user_response.user
+            }
+    except Exception as remote_error:
+        # If Supabase verification fails, try local JWT verification
         try:
-            user_response = supabase.auth.get_user(token)
-            if user_response.user:
-                return {
-                    "user_id": user_response.user.id,
-                    "email": user_response.user.email,
-                    "user": user_response.user
-                }
-        except Exception as supabase_error:
-            # If Supabase verification fails, try local JWT verification
             payload = auth_handler.decode_token(token)
+        except HTTPException as e:
+            # Only a rejection by Supabase Auth is final; outages and a busy pool are not
+            if getattr(remote_error, "status", None) in (401, 403):
+                raise TokenRejected(e.detail)
+            raise
+        return {
+            "user_id": payload.get("sub"),
+            "email": payload.get("email"),
+            "user": None
+        }
+    return {"user_id": None, "email": None, "user": None}
+
+async def _verify_token(token: str) -> Dict[str, Any]:
+    """
+    Verify Supabase JWT token and return user information
+    """
+    try:
+        if AUTH_VERIFY_MODE == "remote":
+            return await _verify_remote(token)
+
+        try:
+            claims = await jwt_verifier.verify(token)
+            return {
+                "user_id": claims.get("sub"),
+                "email": claims.get("email"),
+                "role": claims.get("role"),
+                "user": None
+            }
+        except jwt.ExpiredSignatureError:
+            raise TokenRejected("Token expired")
+        except jwt.PyJWTError as local_error:
+            if AUTH_REMOTE_FALLBACK:
+                logger.debug(f"Local token verification failed, asking Supabase: {local_error}")
+                return await _verify_remote(token)
+            # Tokens issued by this API are signed with JWT_SECRET_KEY
+            try:
+                payload = auth_handler.decode_token(token)
+            except HTTPException as e:
+                if isinstance(local_error, DEFINITE_TOKEN_ERRORS):
+                    raise TokenRejected(e.detail)
+                raise
             return {
                 "user_id": payload.get("sub"),
                 "email": payload.get("email"),
                 "user": None
             }
-            
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -100,6 +288,55 @@ async def verify_supabase_token(credentials: HTTPAuthorizationCredentials = Depe
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+token_cache = TTLCache("auth_tokens", max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+invalid_token_cache = TTLCache("auth_invalid_tokens", max_size=AUTH_CACHE_MAX_SIZE, ttl=AUTH_NEGATIVE_CACHE_TTL_SECONDS)
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _seconds_until_expiry(token: str) -> float:
+    """Remaining lifetime of an already verified token"""
+    try:
+        exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+    except jwt.PyJWTError:
+        return 0
+    return exp - time.time() if exp else AUTH_CACHE_TTL_SECONDS
+
+async def verify_supabase_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    """
+    Verify a bearer token, answering repeated tokens from the in-process cache
+    """
+    token = credentials.credentials
+    key = _token_key(token)
+
+    auth_data = token_cache.get(key)
+    if auth_data is not MISSING:
+        return auth_data
+
+    rejection = invalid_token_cache.get(key)
+    if rejection is not MISSING:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=rejection,
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    try:
+        auth_data = await _verify_token(token)
+    except TokenRejected as e:
+        invalid_token_cache.set(key, e.detail)
+        raise
+
+    if auth_data.get("user_id"):
+        token_cache.set(key, auth_data, ttl=min(AUTH_CACHE_TTL_SECONDS, _seconds_until_expiry(token)))
+    return auth_data
+
+def auth_cache_stats() -> Dict[str, Any]:
+    return {
+        "tokens": token_cache.stats(),
+        "invalid_tokens": invalid_token_cache.stats(),
+    }
+
 async def get_current_user(auth_data: Dict[str, Any] = Depends(verify_supabase_token)) -> Dict[str, Any]:
     """
     Get current user from authentication data
@@ -145,7 +382,7 @@ async def authenticate_user(email: str, password: str) -> Optional[Dict[str, Any
     Authenticate user with email and password using Supabase
     """
     try:
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await supabase_executor.run(supabase.auth.sign_in_with_password, {
             "email": email,
             "password": password
         })
@@ -165,7 +402,7 @@ async def register_user(email: str, password: str, full_name: Optional[str] = No
     Register a new user using Supabase
     """
     try:
-        auth_response = supabase.auth.sign_up({
+        auth_response = await supabase_executor.run(supabase.auth.sign_up, {
             "email": email,
             "password": password,
             "options": {
@@ -0,0 +1,130 @@
+import os
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import asyncpg
+
+logger = logging.getLogger(__name__)
+
+# Direct Postgres connection used only to LISTEN (a transaction pooler such as pgbouncer cannot LISTEN)
+CACHE_INVALIDATION_DATABASE_URL = os.getenv("CACHE_INVALIDATION_DATABASE_URL", os.getenv("DATABASE_URL"))
+# Fixed by the pg_notify call in sql/03_create_cache_invalidation_triggers.sql; change both together
+CACHE_INVALIDATION_CHANNEL = "cache_invalidation"
+CACHE_INVALIDATION_RECONNECT_SECONDS = float(os.getenv("CACHE_INVALIDATION_RECONNECT_SECONDS", "5"))
+
+InvalidationHandler = Callable[[Dict[str, Any]], None]
+
+class CacheInvalidationListener:
+    """
+    Subscribes to the Postgres channel fed by the notify_cache_invalidation trigger
+    (sql/03_create_cache_invalidation_triggers.sql) and evicts the changed keys
+    from this worker's caches.
+
+    Handlers are registered per table and receive the notification payload
+    ({"table", "op", "id", "user_id"}). Notifications sent while the worker was
+    disconnected are lost, so reconnect hooks run after every reconnection to
+    drop anything that may have gone stale.
+    """
+
+    def __init__(self, dsn: Optional[str], channel: str):
+        self.dsn = dsn
+        self.channel = channel
+        self._handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._reconnect_hooks: List[Callable[[], None]] = []
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self.notifications = 0
+        self.connected_since: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def register(self, table: str, handler: InvalidationHandler):
+        self._handlers.setdefault(table, []).append(handler)
+
+    def on_reconnect(self, hook: Callable[[], None]):
+        self._reconnect_hooks.append(hook)
+
+    def start(self):
+        if not self.dsn:
+            logger.info("No DATABASE_URL configured, cross-worker cache invalidation disabled")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        missed_notifications = False
+        while True:
+            try:
+                self._connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                self._connection.add_termination_listener(lambda connection: closed.set())
+                await self._connection.add_listener(self.channel, self._on_notification)
+                self.connected_since = time.time()
+                logger.info(f"Listening for cache invalidations on '{self.channel}'")
+                if missed_notifications:
+                    self._run_reconnect_hooks()
+                await closed.wait()
+                logger.warning("Cache invalidation connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Cache invalidation listener error: {e}")
+            finally:
+                missed_notifications = True
+                self.connected_since = None
+                await self._close_connection()
+            await asyncio.sleep(CACHE_INVALIDATION_RECONNECT_SECONDS)
+
+    async def _close_connection(self):
+        if self._connection is not None and not self._connection.is_closed():
+            try:
+                await self._connection.close(timeout=5)
+            except Exception:
+                self._connection.terminate()
+        self._connection = None
+
+    def _run_reconnect_hooks(self):
+        for hook in self._reconnect_hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.error(f"Cache invalidation reconnect hook failed: {e}")
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed cache invalidation payload: {payload!r}")
+            return
+
+        self.notifications += 1
+        for handler in self._handlers.get(event.get("table"), []):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Cache invalidation handler for {event.get('table')} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": bool(self.dsn),
+            "channel": self.channel,
+            "connected": self.connected_since is not None,
+            "connected_since": self.connected_since,
+            "notifications": self.notifications,
+            "tables": sorted(self._handlers),
+            "last_error": self.last_error,
+        }
+
+cache_invalidation = CacheInvalidationListener(CACHE_INVALIDATION_DATABASE_URL, CACHE_INVALIDATION_CHANNEL)
@@ -0,0 +1,212 @@
+import os
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from auth import supabase_admin
+from models import DestinationResponse
+from supabase_executor import supabase_executor
+
+logger = logging.getLogger(__name__)
+
+# Incremental refresh reads rows whose updated_at is past the watermark (sql/07_add_destinations_updated_at.sql)
+DESTINATION_CATALOG_REFRESH_SECONDS = int(os.getenv("DESTINATION_CATALOG_REFRESH_SECONDS", "300"))
+# A full reload also drops rows that were hard-deleted
+DESTINATION_CATALOG_FULL_RELOAD_SECONDS = int(os.getenv("DESTINATION_CATALOG_FULL_RELOAD_SECONDS", "3600"))
+# Re-read this far behind the watermark to catch transactions that committed late
+DESTINATION_CATALOG_OVERLAP_SECONDS = int(os.getenv("DESTINATION_CATALOG_OVERLAP_SECONDS", "60"))
+
+DEFAULT_DESTINATION_ICON = "📍"
+CATEGORY_ICONS = {
+    "historical": "🏛️",
+    "archaeological": "🏛️",
+    "religious": "🕌",
+    "nature": "🏞️",
+    "desert": "🏜️",
+    "beach": "🏖️",
+    "sea": "🌊",
+    "museum": "🖼️",
+    "city": "🏙️",
+    "market": "🛍️",
+    "food": "🍽️",
+    "adventure": "🧗",
+    "wellness": "💆",
+}
+
+def destination_icon(category: Optional[str]) -> str:
+    return CATEGORY_ICONS.get((category or "").strip().lower(), DEFAULT_DESTINATION_ICON)
+
+# Called with (ids added or changed, ids removed) after every change to the catalog
+CatalogListener = Callable[[Set[str], Set[str]], None]
+
+class DestinationCatalog:
+    """
+    Process-wide copy of the active rows of the destinations table, keyed by id.
+
+    Loaded once at startup and kept current by incremental refreshes on a
+    timer and whenever a destinations NOTIFY arrives. Reads are plain dict
+    lookups, so itinerary responses can be enriched without a query per row.
+    Derived indexes register a listener to rebuild on change.
+    """
+
+    def __init__(self, refresh_interval: int, full_reload_interval: int, overlap: int):
+        self.refresh_interval = refresh_interval
+        self.full_reload_interval = full_reload_interval
+        self.overlap = overlap
+        self._destinations: Dict[str, DestinationResponse] = {}
+        self._listeners: List[CatalogListener] = []
+        self._watermark: Optional[datetime] = None
+        self._last_full_reload = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        # Bumped on every change so derived responses (e.g. ETags) can include it
+        self.version = 0
+        self.loaded = False
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh: Optional[float] = None
+
+    def add_listener(self, listener: CatalogListener):
+        self._listeners.append(listener)
+
+    def get(self, destination_id: Optional[str]) -> Optional[DestinationResponse]:
+        if destination_id is None:
+            return None
+        return self._destinations.get(str(destination_id))
+
+    def all(self) -> List[DestinationResponse]:
+        return list(self._destinations.values())
+
+    def __len__(self) -> int:
+        return len(self._destinations)
+
+    async def start(self):
+        """Load the catalog (startup continues with an empty catalog if that fails) and start refreshing"""
+        await self.refresh(full=True)
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        for task in (self._task, self._refreshing):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._refreshing = None
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            full = time.monotonic() - self._last_full_reload >= self.full_reload_interval
+            await self.refresh(full=full)
+
+    def request_refresh(self):
+        """Schedule an incremental refresh (used by the NOTIFY handler)"""
+        if self._refreshing is None:
+            self._refreshing = asyncio.create_task(self._refresh(full=False))
+
+    async def refresh(self, full: bool = False):
+        # Concurrent callers share the refresh already running
+        if self._refreshing is None:
+            self._refreshing = asyncio.create_task(self._refresh(full))
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self, full: bool):
+        self.refreshes += 1
+        try:
+            # Without a watermark (first load, or no updated_at column) only a full reload is possible
+            full = full or self._watermark is None
+            query = supabase_admin.table("destinations").select("*")
+            if full:
+                query = query.eq("is_active", True)
+            else:
+                since = self._watermark - timedelta(seconds=self.overlap)
+                query = query.gte("updated_at", since.isoformat())
+            response = await supabase_executor.execute(query)
+            self._apply(response.data or [], full)
+            if full:
+                self._last_full_reload = time.monotonic()
+            self.loaded = True
+            self.last_refresh = time.time()
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.error(f"Error refreshing destination catalog: {e}")
+        finally:
+            if self._refreshing is asyncio.current_task():
+                self._refreshing = None
+
+    def _apply(self, rows: List[Dict[str, Any]], full: bool):
+        destinations = dict(self._destinations) if not full else {}
+        for row in rows:
+            updated_at = self._parse_timestamp(row.get("updated_at"))
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+            destination_id = str(row.get("id"))
+            if row.get("is_active") is False:
+                destinations.pop(destination_id, None)
+                continue
+            destination = self._parse(row)
+            if destination is not None:
+                destinations[destination_id] = destination
+
+        changed = {
+            destination_id for destination_id, destination in destinations.items()
+            if self._destinations.get(destination_id) != destination
+        }
+        removed = set(self._destinations) - set(destinations)
+
+        self._destinations = destinations
+        if changed or removed:
+            self.version += 1
+            logger.info(f"Destination catalog: {len(changed)} changed, {len(removed)} removed, {len(destinations)} total")
+            for listener in self._listeners:
+                try:
+                    listener(changed, removed)
+                except Exception as e:
+                    logger.error(f"Destination catalog listener failed: {e}")
+
+    @staticmethod
+    def _parse(row: Dict[str, Any]) -> Optional[DestinationResponse]:
+        try:
+            return DestinationResponse(**{
+                **row,
+                "id": str(row["id"]),
+                "rating": row.get("rating") or 0.0,
+                "is_active": row.get("is_active", True) is not False,
+                "created_at": row.get("created_at") or datetime(1970, 1, 1),
+            })
+        except Exception as e:
+            logger.warning(f"Skipping invalid destination row {row.get('id')!r}: {e}")
+            return None
+
+    @staticmethod
+    def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (ValueError, AttributeError):
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self.loaded,
+            "destinations": len(self._destinations),
+            "version": self.version,
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_refresh": self.last_refresh,
+        }
+
+destination_catalog = DestinationCatalog(
+    DESTINATION_CATALOG_REFRESH_SECONDS,
+    DESTINATION_CATALOG_FULL_RELOAD_SECONDS,
+    DESTINATION_CATALOG_OVERLAP_SECONDS,
+)
@@ -0,0 +1,89 @@
+import os
+import hashlib
+import json
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi import Response
+
+from cache import TTLCache, MISSING
+
+# Remembered ETags let a matching If-None-Match be answered without a database call
+ETAG_CACHE_TTL_SECONDS = int(os.getenv("ETAG_CACHE_TTL_SECONDS", "300"))
+ETAG_CACHE_MAX_SIZE = int(os.getenv("ETAG_CACHE_MAX_SIZE", "10000"))
+# Distinct queries (pages, filters, fieldsets) remembered per user
+ETAG_CACHE_MAX_VARIANTS = int(os.getenv("ETAG_CACHE_MAX_VARIANTS", "32"))
+
+# Clients may keep the response but must revalidate it before reuse
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+def compute_etag(payload: Any) -> str:
+    """Strong ETag from a hash of the JSON form of a payload"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str, ensure_ascii=False)
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses the weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+def not_modified(etag: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(status_code=304, headers={**(headers or {}), "ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL})
+
+class ETagCache:
+    """
+    Last ETag (and response headers) served per user and query.
+
+    Entries are grouped by user so one invalidate() drops every page and
+    filter variant of that user's data. A read records its user's generation
+    before querying and its ETag is only stored if that user's data was not
+    invalidated meanwhile, so a slow read cannot resurrect data that a write
+    replaced, while writes by other users do not affect it.
+    """
+
+    def __init__(self, name: str, ttl: int, max_size: int, max_variants: int):
+        self._cache = TTLCache(name, max_size=max_size, ttl=ttl)
+        # Stamp of each user's last invalidation; stamps only grow, so an old one never matches again
+        self._stamps = TTLCache(f"{name}_generations", max_size=max_size, ttl=ttl)
+        self._counter = 0
+        self._floor = 0
+        self.max_variants = max_variants
+
+    def generation(self, scope: str) -> int:
+        stamp = self._stamps.get(scope)
+        return self._floor if stamp is MISSING else stamp
+
+    def get(self, scope: str, signature: Hashable) -> Optional[Tuple[str, Dict[str, str]]]:
+        variants = self._cache.get(scope)
+        if variants is MISSING:
+            return None
+        return variants.get(signature)
+
+    def set(self, scope: str, signature: Hashable, etag: str, headers: Dict[str, str], generation: int):
+        if generation != self.generation(scope):
+            return
+        variants = self._cache.get(scope)
+        if variants is MISSING:
+            variants = {}
+            self._cache.set(scope, variants)
+        variants.pop(signature, None)
+        variants[signature] = (etag, headers)
+        while len(variants) > self.max_variants:
+            del variants[next(iter(variants))]
+
+    def invalidate(self, scope: str):
+        self._counter += 1
+        self._stamps.set(scope, self._counter)
+        self._cache.invalidate(scope)
+
+    def clear(self):
+        self._counter += 1
+        self._floor = self._counter
+        self._stamps.clear()
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
@@ -0,0 +1,266 @@
+import os
+import asyncio
+import fcntl
+import json
+import logging
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from geo import haversine_cross
+
+logger = logging.getLogger(__name__)
+
+# Directory shared by every worker on the host; the matrix file is mapped read-only by each of them
+DISTANCE_MATRIX_DIR = os.getenv("DISTANCE_MATRIX_DIR", os.path.join(tempfile.gettempdir(), "smarttour-distance-matrix"))
+# Drive time estimate: great-circle distance * detour factor at an average road speed
+DRIVE_DETOUR_FACTOR = float(os.getenv("DRIVE_DETOUR_FACTOR", "1.3"))
+DRIVE_SPEED_KMH = float(os.getenv("DRIVE_SPEED_KMH", "60"))
+# Rows computed per vectorized block, to bound temporary memory on large catalogs
+DISTANCE_MATRIX_CHUNK_ROWS = int(os.getenv("DISTANCE_MATRIX_CHUNK_ROWS", "512"))
+
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "build.lock"
+
+# (destination id or None for an ad-hoc point, lat, lon)
+Point = Tuple[Optional[str], float, float]
+# (memory-mapped matrix, destination id -> row, manifest) of one published file
+Mapping = Tuple[np.ndarray, Dict[str, int], Dict[str, Any]]
+
+def drive_minutes(distance_km: np.ndarray) -> np.ndarray:
+    return distance_km * DRIVE_DETOUR_FACTOR / DRIVE_SPEED_KMH * 60
+
+class DistanceMatrixStore:
+    """
+    All-pairs distance and drive-time matrix of the active destinations, in a
+    memory-mapped .npy file shared by every worker on the host.
+
+    The file holds float32 of shape (2, n, n): [0] great-circle km and [1]
+    estimated drive minutes. A manifest next to it lists the destination id
+    and coordinates of each row. Builds hold an exclusive file lock, so one
+    worker builds while the others wait and then map its result. A build
+    copies the rows of destinations that did not move from the previous file
+    and only computes rows for added or moved ones. The new file and manifest
+    are published with atomic renames, so readers never see a partial matrix.
+    The mapped file, its row index and manifest are swapped in as one tuple
+    and every reader takes that tuple once, so a remap from the build thread
+    never pairs one file's index with another file's rows.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._mapping: Optional[Mapping] = None
+        self._syncing: Optional[asyncio.Task] = None
+        self._pending: Optional[Dict[str, Tuple[float, float]]] = None
+        self.builds = 0
+        self.rows_computed = 0
+        self.rows_reused = 0
+        self.last_build_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def __contains__(self, destination_id: str) -> bool:
+        mapping = self._mapping
+        return mapping is not None and destination_id in mapping[1]
+
+    def schedule_sync(self, coordinates: Dict[str, Tuple[float, float]]) -> asyncio.Task:
+        """Bring the shared matrix in line with {destination id: (lat, lon)} in the background"""
+        self._pending = coordinates
+        if self._syncing is None:
+            self._syncing = asyncio.create_task(self._sync_pending())
+        return self._syncing
+
+    async def sync(self, coordinates: Dict[str, Tuple[float, float]]):
+        await asyncio.shield(self.schedule_sync(coordinates))
+
+    async def _sync_pending(self):
+        try:
+            # Changes that arrive during a build are applied by one more build afterwards
+            while self._pending is not None:
+                coordinates, self._pending = self._pending, None
+                try:
+                    await asyncio.to_thread(self._sync_blocking, coordinates)
+                    self.last_error = None
+                except Exception as e:
+                    self.last_error = str(e)
+                    logger.error(f"Error building distance matrix: {e}")
+        finally:
+            self._syncing = None
+
+    def _sync_blocking(self, coordinates: Dict[str, Tuple[float, float]]):
+        os.makedirs(self.directory, exist_ok=True)
+        ids = sorted(coordinates)
+        coords = [list(coordinates[destination_id]) for destination_id in ids]
+
+        with open(self._path(LOCK_NAME), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = self._read_manifest()
+                if not self._is_current(manifest, ids, coords):
+                    manifest = self._build(manifest, ids, coords)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self._map(manifest)
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+            if os.path.exists(self._path(manifest["file"])):
+                return manifest
+        except (OSError, ValueError, KeyError):
+            pass
+        return None
+
+    @staticmethod
+    def _is_current(manifest: Optional[Dict[str, Any]], ids: List[str], coords: List[List[float]]) -> bool:
+        return (
+            manifest is not None
+            and manifest["ids"] == ids
+            and manifest["coords"] == coords
+            and manifest["detour_factor"] == DRIVE_DETOUR_FACTOR
+            and manifest["speed_kmh"] == DRIVE_SPEED_KMH
+        )
+
+    def _build(self, previous: Optional[Dict[str, Any]], ids: List[str], coords: List[List[float]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        n = len(ids)
+        lats = np.array([c[0] for c in coords], dtype=np.float64)
+        lons = np.array([c[1] for c in coords], dtype=np.float64)
+
+        # Rows of destinations whose coordinates are unchanged are copied from the previous matrix
+        reused, source_rows = [], []
+        if previous is not None and previous["detour_factor"] == DRIVE_DETOUR_FACTOR and previous["speed_kmh"] == DRIVE_SPEED_KMH:
+            old_rows = {destination_id: row for row, destination_id in enumerate(previous["ids"])}
+            for row, destination_id in enumerate(ids):
+                old_row = old_rows.get(destination_id)
+                if old_row is not None and previous["coords"][old_row] == coords[row]:
+                    reused.append(row)
+                    source_rows.append(old_row)
+        reused_set = set(reused)
+        computed = [row for row in range(n) if row not in reused_set]
+
+        name = f"matrix-{uuid.uuid4().hex}.npy"
+        temp_path = self._path(name + ".tmp")
+        matrix = np.lib.format.open_memmap(temp_path, mode="w+", dtype=np.float32, shape=(2, n, n))
+        try:
+            if reused:
+                old = np.load(self._path(previous["file"]), mmap_mode="r")
+                block = np.ix_(reused, reused)
+                source = np.ix_(source_rows, source_rows)
+                matrix[0][block] = old[0][source]
+                matrix[1][block] = old[1][source]
+                del old
+
+            for start in range(0, len(computed), DISTANCE_MATRIX_CHUNK_ROWS):
+                rows = computed[start:start + DISTANCE_MATRIX_CHUNK_ROWS]
+                km = haversine_cross(lats[rows], lons[rows], lats, lons)
+                minutes = drive_minutes(km)
+                matrix[0][rows, :] = km
+                matrix[0][:, rows] = km.T
+                matrix[1][rows, :] = minutes
+                matrix[1][:, rows] = minutes.T
+            matrix.flush()
+        finally:
+            del matrix
+        os.replace(temp_path, self._path(name))
+
+        manifest = {
+            "version": (previous or {}).get("version", 0) + 1,
+            "file": name,
+            "ids": ids,
+            "coords": coords,
+            "detour_factor": DRIVE_DETOUR_FACTOR,
+            "speed_kmh": DRIVE_SPEED_KMH,
+            "built_at": time.time(),
+        }
+        temp_manifest = self._path(MANIFEST_NAME + ".tmp")
+        with open(temp_manifest, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_manifest, self._path(MANIFEST_NAME))
+
+        # Workers that still map the old file keep its pages until they remap
+        if previous is not None:
+            try:
+                os.remove(self._path(previous["file"]))
+            except OSError:
+                pass
+
+        self.builds += 1
+        self.rows_computed += len(computed)
+        self.rows_reused += len(reused)
+        self.last_build_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(
+            f"Built distance matrix v{manifest['version']} for {n} destinations "
+            f"({len(computed)} rows computed, {len(reused)} reused) in {self.last_build_ms} ms"
+        )
+        return manifest
+
+    def _map(self, manifest: Dict[str, Any]):
+        if self._mapping is not None and self._mapping[2]["file"] == manifest["file"]:
+            return
+        data = np.load(self._path(manifest["file"]), mmap_mode="r")
+        index = {destination_id: row for row, destination_id in enumerate(manifest["ids"])}
+        # One assignment, so readers on the event loop see the old mapping or the new one
+        self._mapping = (data, index, manifest)
+
+    def lookup(self, from_id: str, to_id: str) -> Optional[Tuple[float, float]]:
+        """(km, drive minutes) between two destinations, or None if either is not in the matrix"""
+        mapping = self._mapping
+        if mapping is None:
+            return None
+        data, index, _ = mapping
+        row, col = index.get(from_id), index.get(to_id)
+        if row is None or col is None:
+            return None
+        return float(data[0, row, col]), float(data[1, row, col])
+
+    def matrices(self, points: Sequence[Point]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (km, drive minutes) matrices between the given points. Pairs of known
+        destinations are read from the shared matrix; rows for ad-hoc points
+        and destinations not in it yet are computed on the fly.
+        """
+        data, index, _ = self._mapping or (None, {}, None)
+        n = len(points)
+        lats = np.array([point[1] for point in points], dtype=np.float64)
+        lons = np.array([point[2] for point in points], dtype=np.float64)
+        km = np.zeros((n, n))
+        minutes = np.zeros((n, n))
+
+        known = [i for i, point in enumerate(points) if point[0] is not None and point[0] in index]
+        if known:
+            rows = [index[points[i][0]] for i in known]
+            block, source = np.ix_(known, known), np.ix_(rows, rows)
+            km[block] = data[0][source]
+            minutes[block] = data[1][source]
+
+        known_set = set(known)
+        unknown = [i for i in range(n) if i not in known_set]
+        if unknown:
+            computed = haversine_cross(lats[unknown], lons[unknown], lats, lons)
+            km[unknown, :] = computed
+            km[:, unknown] = computed.T
+            minutes[unknown, :] = drive_minutes(computed)
+            minutes[:, unknown] = drive_minutes(computed.T)
+        return km, minutes
+
+    def stats(self) -> Dict[str, Any]:
+        mapping = self._mapping
+        return {
+            "directory": self.directory,
+            "version": mapping[2]["version"] if mapping else None,
+            "destinations": len(mapping[1]) if mapping else 0,
+            "builds": self.builds,
+            "rows_computed": self.rows_computed,
+            "rows_reused": self.rows_reused,
+            "last_build_ms": self.last_build_ms,
+            "last_error": self.last_error,
+        }
+
+distance_matrix = DistanceMatrixStore(DISTANCE_MATRIX_DIR)
@@ -0,0 +1,196 @@
+import os
+import heapq
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Grid cell size of the destination spatial index; 0.05 degrees is about 5.5 km north-south
+DESTINATION_INDEX_CELL_DEGREES = float(os.getenv("DESTINATION_INDEX_CELL_DEGREES", "0.05"))
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def haversine_cross(
+    lats_a: Sequence[float], lons_a: Sequence[float], lats_b: Sequence[float], lons_b: Sequence[float]
+) -> np.ndarray:
+    """Great-circle distances in kilometres from every point of a to every point of b, shape (len(a), len(b))"""
+    phi_a = np.radians(np.asarray(lats_a, dtype=np.float64))[:, None]
+    phi_b = np.radians(np.asarray(lats_b, dtype=np.float64))[None, :]
+    dlambda = np.radians(np.asarray(lons_a, dtype=np.float64))[:, None] - np.radians(np.asarray(lons_b, dtype=np.float64))[None, :]
+    a = np.sin((phi_b - phi_a) / 2) ** 2 + np.cos(phi_a) * np.cos(phi_b) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def haversine_matrix(lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """All-pairs great-circle distances in kilometres, computed in one vectorized pass"""
+    return haversine_cross(lats, lons, lats, lons)
+
+Cell = Tuple[int, int]
+# (id, lat, lon, lowercased category)
+Entry = Tuple[str, float, float, Optional[str]]
+
+class GridIndex:
+    """
+    Uniform latitude/longitude grid over points, for radius and k-nearest queries.
+
+    Each point sits in one bucket; a query only measures the points in the
+    cells that can contain an answer, so lookups stay in the microsecond
+    range for tens of thousands of points. Points are upserted and removed
+    individually, which keeps catalog updates incremental.
+    """
+
+    def __init__(self, cell_degrees: float = DESTINATION_INDEX_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Cell, Dict[str, Entry]] = {}
+        self._points: Dict[str, Cell] = {}
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return int(math.floor(lat / self.cell_degrees)), int(math.floor(lon / self.cell_degrees))
+
+    def upsert(self, point_id: str, lat: float, lon: float, category: Optional[str] = None):
+        self.remove(point_id)
+        cell = self._cell(lat, lon)
+        self._cells.setdefault(cell, {})[point_id] = (point_id, lat, lon, category.lower() if category else None)
+        self._points[point_id] = cell
+        if self._bounds is None:
+            self._bounds = (cell[0], cell[0], cell[1], cell[1])
+        else:
+            min_i, max_i, min_j, max_j = self._bounds
+            self._bounds = (min(min_i, cell[0]), max(max_i, cell[0]), min(min_j, cell[1]), max(max_j, cell[1]))
+
+    def remove(self, point_id: str):
+        cell = self._points.pop(point_id, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[point_id]
+        if not bucket:
+            del self._cells[cell]
+        # Bounds may now be loose, which only costs a few empty cell lookups
+        if not self._points:
+            self._bounds = None
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+        self._bounds = None
+
+    def _entries(self, cells: Iterable[Cell], categories: Optional[Set[str]]) -> Iterable[Entry]:
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if not bucket:
+                continue
+            for entry in bucket.values():
+                if categories is None or entry[3] in categories:
+                    yield entry
+
+    def within(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        categories: Optional[Set[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[float, str]]:
+        """(distance_km, id) of the points within radius_km, nearest first"""
+        if self._bounds is None:
+            return []
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        # Widest longitude span is at the latitude closest to a pole within the radius
+        max_abs_lat = min(89.9, abs(lat) + lat_span)
+        lon_span = min(180.0, radius_km / (KM_PER_DEGREE_LAT * math.cos(math.radians(max_abs_lat))))
+
+        min_i, min_j = self._cell(lat - lat_span, lon - lon_span)
+        max_i, max_j = self._cell(lat + lat_span, lon + lon_span)
+        b_min_i, b_max_i, b_min_j, b_max_j = self._bounds
+        cells = (
+            (i, j)
+            for i in range(max(min_i, b_min_i), min(max_i, b_max_i) + 1)
+            for j in range(max(min_j, b_min_j), min(max_j, b_max_j) + 1)
+        )
+
+        results = []
+        for point_id, point_lat, point_lon, _ in self._entries(cells, categories):
+            distance = haversine_km(lat, lon, point_lat, point_lon)
+            if distance <= radius_km:
+                results.append((distance, point_id))
+        results.sort()
+        return results[:limit] if limit is not None else results
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int,
+        categories: Optional[Set[str]] = None,
+        max_radius_km: Optional[float] = None,
+    ) -> List[Tuple[float, str]]:
+        """(distance_km, id) of the k nearest points, searching rings of cells outwards"""
+        if self._bounds is None or k <= 0:
+            return []
+        center_i, center_j = self._cell(lat, lon)
+        b_min_i, b_max_i, b_min_j, b_max_j = self._bounds
+        max_ring = max(center_i - b_min_i, b_max_i - center_i, center_j - b_min_j, b_max_j - center_j)
+
+        best: List[Tuple[float, str]] = []  # max-heap of (-distance, id)
+        for ring in range(max(0, max_ring) + 1):
+            for point_id, point_lat, point_lon, _ in self._entries(self._ring(center_i, center_j, ring), categories):
+                distance = haversine_km(lat, lon, point_lat, point_lon)
+                if max_radius_km is not None and distance > max_radius_km:
+                    continue
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, point_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, point_id))
+
+            # Every point outside this ring is at least this far away
+            reach = self._ring_reach_km(lat, ring)
+            if len(best) == k and reach >= -best[0][0]:
+                break
+            if max_radius_km is not None and reach >= max_radius_km:
+                break
+
+        return sorted((-distance, point_id) for distance, point_id in best)
+
+    def _ring(self, center_i: int, center_j: int, ring: int) -> Iterable[Cell]:
+        """Cells on the square ring at Chebyshev distance ring, clipped to the occupied bounds"""
+        b_min_i, b_max_i, b_min_j, b_max_j = self._bounds
+        if ring == 0:
+            yield center_i, center_j
+            return
+        for i in (center_i - ring, center_i + ring):
+            if b_min_i <= i <= b_max_i:
+                for j in range(max(center_j - ring, b_min_j), min(center_j + ring, b_max_j) + 1):
+                    yield i, j
+        for j in (center_j - ring, center_j + ring):
+            if b_min_j <= j <= b_max_j:
+                for i in range(max(center_i - ring + 1, b_min_i), min(center_i + ring - 1, b_max_i) + 1):
+                    yield i, j
+
+    def _ring_reach_km(self, lat: float, ring: int) -> float:
+        """Lower bound on the distance from (lat, lon) to any cell beyond the given ring"""
+        degrees = ring * self.cell_degrees
+        max_abs_lat = min(89.9, abs(lat) + degrees + self.cell_degrees)
+        lon_km = degrees * KM_PER_DEGREE_LAT * math.cos(math.radians(max_abs_lat))
+        return min(degrees * KM_PER_DEGREE_LAT, lon_km)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "points": len(self._points),
+            "cells": len(self._cells),
+            "cell_degrees": self.cell_degrees,
+        }
+
+destination_index = GridIndex(DESTINATION_INDEX_CELL_DEGREES)
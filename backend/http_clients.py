@@ -0,0 +1,99 @@
+import os
+import logging
+from typing import Any, Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Outbound HTTP connection pool configuration
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_DEFAULT_TIMEOUT_SECONDS = float(os.getenv("HTTP_DEFAULT_TIMEOUT_SECONDS", "30"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+# HTTP/2 needs the optional "h2" package (pip install "httpx[http2]")
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class HTTPClientRegistry:
+    """
+    Long-lived httpx.AsyncClient instances, one per upstream, opened in the app lifespan.
+
+    Reusing a client keeps connections alive between requests so calls to the
+    same host skip the TCP and TLS handshakes.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        http2 = HTTP2_ENABLED and HTTP2_AVAILABLE
+        if HTTP2_ENABLED and not HTTP2_AVAILABLE:
+            logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed, using HTTP/1.1")
+
+        counters = self._counters.setdefault(name, {"requests": 0, "responses": 0, "errors": 0})
+
+        async def on_request(request: httpx.Request):
+            counters["requests"] += 1
+
+        async def on_response(response: httpx.Response):
+            counters["responses"] += 1
+            if response.status_code >= 500:
+                counters["errors"] += 1
+
+        client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(HTTP_DEFAULT_TIMEOUT_SECONDS, connect=HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            ),
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+        logger.info(f"Opened HTTP client '{name}' (http2={http2}, max_connections={HTTP_MAX_CONNECTIONS})")
+        return client
+
+    def start(self, *names: str):
+        for name in names:
+            if name not in self._clients:
+                self._clients[name] = self._create(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """Return the shared client for an upstream, creating it if the lifespan did not"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name)
+        return client
+
+    async def close(self):
+        for name, client in self._clients.items():
+            await client.aclose()
+            logger.info(f"Closed HTTP client '{name}'")
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, client in self._clients.items():
+            client_stats: Dict[str, Any] = dict(self._counters.get(name, {}))
+            # httpx does not expose pool state publicly; read it from the httpcore pool when present
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            connections = list(getattr(pool, "connections", []) or [])
+            client_stats.update({
+                "connections": len(connections),
+                "idle_connections": sum(1 for c in connections if c.is_idle()),
+                "http2": HTTP2_ENABLED and HTTP2_AVAILABLE,
+                "max_connections": HTTP_MAX_CONNECTIONS,
+                "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            })
+            stats[name] = client_stats
+        return stats
+
+http_clients = HTTPClientRegistry()
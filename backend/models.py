@@ -3,11 +3,22 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-from datetime import datetime
+from datetime import datetime, date
+from pathlib import Path
+from dotenv import load_dotenv
+import os
 import uuid
 
+# server.py imports this module before it loads .env itself
+load_dotenv(Path(__file__).parent / '.env')
+
 Base = declarative_base()
 
+# CHECK (priority BETWEEN 1 AND 5) in sql/02_create_itineraries_table.sql
+ITINERARY_PRIORITY_MIN = 1
+ITINERARY_PRIORITY_MAX = 5
+ITINERARY_BATCH_MAX_SIZE = int(os.getenv("ITINERARY_BATCH_MAX_SIZE", "100"))
+
 # SQLAlchemy Models (Database Tables)
 class User(Base):
     __tablename__ = "users"
@@ -152,7 +163,7 @@ class ItineraryBase(BaseModel):
     notes: Optional[str] = None
     status: str = "planned"
     visit_date: Optional[datetime] = None
-    priority: int = 1
+    priority: int = Field(1, ge=ITINERARY_PRIORITY_MIN, le=ITINERARY_PRIORITY_MAX)
 
 class ItineraryCreate(ItineraryBase):
     pass
@@ -164,16 +175,85 @@ class ItineraryUpdate(BaseModel):
     notes: Optional[str] = None
     status: Optional[str] = None
     visit_date: Optional[datetime] = None
-    priority: Optional[int] = None
+    priority: Optional[int] = Field(None, ge=ITINERARY_PRIORITY_MIN, le=ITINERARY_PRIORITY_MAX)
 
 class ItineraryResponse(ItineraryBase):
     id: str
     user_id: str
     added_at: datetime
+    # Filled from the destination catalog when the destination is known
+    destination_name_ar: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     
     class Config:
         from_attributes = True
 
+# Batch items take any priority so that, like status, it is checked per operation in the handler
+class ItineraryBatchCreate(ItineraryCreate):
+    priority: int = 1
+
+class ItineraryBatchUpdate(ItineraryUpdate):
+    priority: Optional[int] = None
+
+class ItineraryBatchOperation(BaseModel):
+    op: str = Field(..., pattern="^(create|update|delete)$")
+    id: Optional[str] = None  # required for update and delete
+    item: Optional[ItineraryBatchCreate] = None  # required for create
+    changes: Optional[ItineraryBatchUpdate] = None  # required for update
+
+class ItineraryBatchRequest(BaseModel):
+    # Checked while the list is parsed, so an oversized batch is rejected before its items are validated
+    operations: List[ItineraryBatchOperation] = Field(..., max_length=ITINERARY_BATCH_MAX_SIZE)
+
+class ItineraryBatchResult(BaseModel):
+    index: int
+    op: str
+    id: Optional[str] = None
+    status: str  # ok, not_found, invalid, error
+    item: Optional[ItineraryResponse] = None
+    error: Optional[str] = None
+
+class ItineraryBatchResponse(BaseModel):
+    results: List[ItineraryBatchResult]
+
+class ItineraryRouteStop(BaseModel):
+    order: int
+    item: ItineraryResponse
+    leg_distance_km: float
+    cumulative_distance_km: float
+
+class ItineraryRouteResponse(BaseModel):
+    stops: List[ItineraryRouteStop]
+    total_distance_km: float
+    # Items whose destination has no known coordinates
+    unrouted: List[ItineraryResponse] = []
+
+class ScheduledStop(BaseModel):
+    order: int
+    item: ItineraryResponse
+    start_time: str  # HH:MM
+    end_time: str
+    travel_minutes: float  # from the previous stop, or from the base for the first one
+    visit_minutes: float
+
+class ScheduledDay(BaseModel):
+    day: int
+    visit_date: date
+    stops: List[ScheduledStop]
+    visit_minutes: float
+    travel_minutes: float
+    total_minutes: float
+    over_budget: bool = False
+
+class UnscheduledItem(BaseModel):
+    item: ItineraryResponse
+    reason: str
+
+class ItineraryScheduleResponse(BaseModel):
+    days: List[ScheduledDay]
+    unscheduled: List[UnscheduledItem] = []
+
 class DestinationBase(BaseModel):
     name: str
     name_ar: Optional[str] = None
@@ -207,6 +287,16 @@ class DestinationResponse(DestinationBase):
     class Config:
         from_attributes = True
 
+class NearbyDestinationResponse(DestinationResponse):
+    distance_km: float
+
+class DestinationSearchResult(DestinationResponse):
+    score: float
+
+class DestinationRecommendation(DestinationResponse):
+    score: float
+    reasons: List[str] = []
+
 class WeatherResponse(BaseModel):
     id: str
     city_name: str
@@ -236,4 +326,5 @@ class HealthCheck(BaseModel):
     status: str
     timestamp: datetime
     version: str
-    database_status: str
\ No newline at end of file
+    database_status: str
+    upstreams: Dict[str, Any] = {}
\ No newline at end of file
@@ -0,0 +1,28 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from fastapi import HTTPException
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    """Opaque keyset cursor for the (added_at, id) position of a row"""
+    position = json.dumps([item["added_at"], item["id"]])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    (added_at, id) of a cursor from encode_cursor, raising a 400 for anything else.
+    Both values end up inside a PostgREST filter string, so they must be a real
+    timestamp and UUID: quotes, commas or parentheses would change the filter.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        added_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(added_at, str) or not isinstance(item_id, str):
+            raise ValueError("cursor values must be strings")
+        datetime.fromisoformat(added_at.replace("Z", "+00:00"))
+        return added_at, str(uuid.UUID(item_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,99 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from auth import supabase_admin
+from cache import TTLCache, MISSING
+from supabase_executor import supabase_executor
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_TTL_SECONDS = int(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300"))
+PROFILE_CACHE_MAX_SIZE = int(os.getenv("PROFILE_CACHE_MAX_SIZE", "10000"))
+# Users without a profile are remembered for a shorter time, so one created elsewhere shows up soon
+PROFILE_CACHE_MISS_TTL_SECONDS = int(os.getenv("PROFILE_CACHE_MISS_TTL_SECONDS", "30"))
+
+class ProfileCache:
+    """
+    Read-through cache of rows from the profiles table, keyed by user id.
+
+    The profile, chat and planner routes all read through it, so an active
+    chat session costs one profiles select per TTL instead of one per message.
+    Writers must call invalidate() (or set() with the authoritative row).
+    """
+
+    def __init__(self, ttl: int, max_size: int, miss_ttl: int = PROFILE_CACHE_MISS_TTL_SECONDS):
+        self._cache = TTLCache("profiles", max_size=max_size, ttl=ttl)
+        self.miss_ttl = miss_ttl
+        # user id -> (load task, whether the task creates missing profiles)
+        self._loading: Dict[str, Tuple[asyncio.Task, bool]] = {}
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return the profile row, or None if the user has no profile yet"""
+        return await self._get(user_id, None)
+
+    async def get_or_create(self, user_id: str, preferences: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the profile row, creating it with the given preferences in the same round trip"""
+        return await self._get(user_id, preferences)
+
+    async def _get(self, user_id: str, create_with: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        row = self._cache.get(user_id)
+        # A cached miss still lets get_or_create go on and create the profile
+        if row is not MISSING and (row is not None or create_with is None):
+            return row
+
+        # Parallel requests for the same user share one database call
+        task, creates = self._loading.get(user_id, (None, False))
+        if task is None:
+            task = asyncio.create_task(self._load(user_id, create_with))
+            creates = create_with is not None
+            self._loading[user_id] = (task, creates)
+        row = await asyncio.shield(task)
+        if row is None and create_with is not None and not creates:
+            # The shared call was a plain select that found nothing; create the profile now
+            return await self._get(user_id, create_with)
+        return row
+
+    async def _load(self, user_id: str, create_with: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        try:
+            if create_with is None:
+                query = supabase_admin.table("profiles").select("*").eq("id", user_id)
+            else:
+                # sql/04_create_get_or_create_profile_function.sql
+                query = supabase_admin.rpc("get_or_create_profile", {"p_user_id": user_id, "p_preferences": create_with})
+            response = await supabase_executor.execute(query)
+            data = response.data
+            if isinstance(data, list):
+                data = data[0] if data else None
+            row = data or None
+            # Skip caching if the profile was invalidated while this call was running
+            if self._loading.get(user_id, (None,))[0] is asyncio.current_task():
+                self._cache.set(user_id, row, ttl=None if row is not None else self.miss_ttl)
+            return row
+        finally:
+            if self._loading.get(user_id, (None,))[0] is asyncio.current_task():
+                del self._loading[user_id]
+
+    async def get_preferences(self, user_id: str, default: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        default = default if default is not None else {}
+        row = await self.get(user_id)
+        if row is None:
+            return default
+        return row.get("preferences", default)
+
+    def set(self, user_id: str, row: Dict[str, Any]):
+        self._cache.set(user_id, row)
+
+    def invalidate(self, user_id: str):
+        self._cache.invalidate(user_id)
+        self._loading.pop(user_id, None)
+
+    def clear(self):
+        self._cache.clear()
+        self._loading.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "loads_in_flight": len(self._loading)}
+
+profile_cache = ProfileCache(PROFILE_CACHE_TTL_SECONDS, PROFILE_CACHE_MAX_SIZE)
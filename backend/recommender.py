@@ -0,0 +1,320 @@
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from geo import EARTH_RADIUS_KM
+
+# Most recommendations from one category before others get a turn, so a strong interest does not crowd out the rest
+RECOMMEND_MAX_PER_CATEGORY = int(os.getenv("RECOMMEND_MAX_PER_CATEGORY", "3"))
+# Distance at which the proximity score halves, from the user's location or itinerary
+RECOMMEND_PROXIMITY_HALF_KM = float(os.getenv("RECOMMEND_PROXIMITY_HALF_KM", "40"))
+
+# Relative weight of each signal in the final score
+RECOMMEND_WEIGHTS = {
+    "interest": 0.45,
+    "rating": 0.2,
+    "budget": 0.15,
+    "companion": 0.1,
+    "proximity": 0.1,
+}
+
+# How strongly each profile interest points at each catalog category
+INTEREST_CATEGORIES = {
+    "history": {"historical": 1.0, "archaeological": 1.0, "museum": 0.7, "religious": 0.5, "city": 0.3},
+    "culture": {"museum": 1.0, "historical": 0.7, "religious": 0.7, "city": 0.6, "market": 0.6, "food": 0.4},
+    "nature": {"nature": 1.0, "desert": 0.8, "sea": 0.5, "beach": 0.4, "adventure": 0.4},
+    "adventure": {"adventure": 1.0, "desert": 0.9, "nature": 0.6, "sea": 0.4, "archaeological": 0.3},
+    "relaxation": {"wellness": 1.0, "beach": 0.9, "sea": 0.8, "nature": 0.3},
+    "food": {"food": 1.0, "market": 0.7, "city": 0.5},
+    "shopping": {"market": 1.0, "city": 0.7},
+    "religion": {"religious": 1.0, "historical": 0.4},
+    "photography": {"nature": 0.8, "desert": 0.8, "archaeological": 0.7, "historical": 0.6, "city": 0.4},
+    "nightlife": {"city": 1.0, "food": 0.6},
+}
+INTEREST_ALIASES = {
+    "historical": "history",
+    "heritage": "history",
+    "cultural": "culture",
+    "wellness": "relaxation",
+    "spa": "relaxation",
+    "cuisine": "food",
+    "religious": "religion",
+}
+
+# Typical spend at each category: 0 free or cheap, 1 moderate, 2 expensive
+CATEGORY_COST = {
+    "historical": 1,
+    "archaeological": 1,
+    "religious": 0,
+    "nature": 0,
+    "desert": 1,
+    "beach": 1,
+    "sea": 1,
+    "museum": 0,
+    "city": 0,
+    "market": 0,
+    "food": 1,
+    "adventure": 2,
+    "wellness": 2,
+}
+DEFAULT_CATEGORY_COST = 1
+BUDGET_LEVELS = {
+    "economy": 0,
+    "budget": 0,
+    "low": 0,
+    "medium": 1,
+    "mid-range": 1,
+    "moderate": 1,
+    "luxury": 2,
+    "high": 2,
+}
+
+# How well each category suits each kind of travel party; unknown categories score 0.5
+COMPANION_AFFINITY = {
+    "solo": {"adventure": 0.9, "desert": 0.8, "historical": 0.8, "archaeological": 0.8, "museum": 0.8, "city": 0.7, "market": 0.7},
+    "partner": {"wellness": 1.0, "beach": 0.9, "sea": 0.9, "food": 0.9, "desert": 0.8, "historical": 0.7, "nature": 0.7},
+    "family": {"nature": 0.9, "beach": 0.9, "sea": 0.9, "museum": 0.8, "city": 0.7, "historical": 0.6, "adventure": 0.3, "desert": 0.5},
+    "friends": {"adventure": 1.0, "desert": 0.9, "food": 0.8, "market": 0.8, "city": 0.8, "beach": 0.7},
+}
+COMPANION_ALIASES = {"couple": "partner", "spouse": "partner", "kids": "family", "group": "friends"}
+
+OTHER_CATEGORY = ""
+
+def _unit_vectors(lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+    """Points on the unit sphere, shape (n, 3); chord length between them orders great-circle distance"""
+    phi = np.radians(np.asarray(lats, dtype=np.float64))
+    lam = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)], axis=-1).reshape(-1, 3)
+
+def _interest_key(value: Any) -> Optional[str]:
+    key = str(value).strip().lower()
+    key = INTEREST_ALIASES.get(key, key)
+    return key if key in INTEREST_CATEGORIES else None
+
+def _budget_level(value: Any) -> Optional[int]:
+    return BUDGET_LEVELS.get(str(value or "").strip().lower())
+
+def _companion_key(value: Any) -> Optional[str]:
+    key = str(value or "").strip().lower()
+    key = COMPANION_ALIASES.get(key, key)
+    return key if key in COMPANION_AFFINITY else None
+
+class Recommender:
+    """
+    Scores every active destination against a user's profile preferences in one vectorized pass.
+
+    The catalog is held as a one-hot category matrix plus rating and
+    coordinate arrays, rebuilt whenever the catalog changes. Each signal is
+    a per-category table, so a request turns the preferences into category
+    vectors and scores the whole catalog with a matrix-vector product:
+    interests (plus the categories already on the user's itinerary),
+    budget fit, travel-party fit, rating, and closeness to the user's
+    location or itinerary. Destinations already on the itinerary are
+    excluded, and the list is re-ranked so no category takes more than its
+    share of the top places while there are others to show.
+    """
+
+    def __init__(self):
+        self._ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self._categories: List[str] = []
+        self._one_hot = np.zeros((0, 0))
+        self._ratings = np.zeros(0)
+        self._columns = np.zeros(0, dtype=np.intp)
+        self._members: List[np.ndarray] = []
+        self._vectors = np.zeros((0, 3))
+        self._interest_matrix = np.zeros((len(INTEREST_CATEGORIES), 0))
+        self._costs = np.zeros(0)
+        self._companions: Dict[str, np.ndarray] = {}
+        self.version: Optional[int] = None
+        self.rebuilds = 0
+        self.requests = 0
+        self.last_build_ms: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def rebuild(self, destinations: Sequence[Any], version: Optional[int] = None):
+        """Recompute the feature matrices from the catalog's destinations"""
+        started = time.perf_counter()
+        destinations = sorted(destinations, key=lambda d: d.id)
+        categories = sorted({(d.category or "").strip().lower() for d in destinations} | {OTHER_CATEGORY})
+        column = {category: j for j, category in enumerate(categories)}
+
+        one_hot = np.zeros((len(destinations), len(categories)))
+        rows = [column[(d.category or "").strip().lower()] for d in destinations]
+        one_hot[np.arange(len(destinations)), rows] = 1.0
+
+        self._interest_matrix = np.array([
+            [affinities.get(category, 0.0) for category in categories]
+            for affinities in INTEREST_CATEGORIES.values()
+        ]).reshape(len(INTEREST_CATEGORIES), len(categories))
+        self._costs = np.array([CATEGORY_COST.get(category, DEFAULT_CATEGORY_COST) for category in categories], dtype=np.float64)
+        self._companions = {
+            companion: np.array([affinities.get(category, 0.5) for category in categories])
+            for companion, affinities in COMPANION_AFFINITY.items()
+        }
+        self._ids = [d.id for d in destinations]
+        self._index = {destination_id: i for i, destination_id in enumerate(self._ids)}
+        self._categories = categories
+        self._one_hot = one_hot
+        self._ratings = np.clip(np.array([d.rating or 0.0 for d in destinations], dtype=np.float64) / 5.0, 0.0, 1.0)
+        self._columns = np.array(rows, dtype=np.intp)
+        self._members = [np.flatnonzero(self._columns == j) for j in range(len(categories))]
+        self._vectors = _unit_vectors([d.latitude for d in destinations], [d.longitude for d in destinations])
+        self.version = version
+        self.rebuilds += 1
+        self.last_build_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _category_preference(self, interests: Iterable[Any], planned_categories: Iterable[str]) -> Tuple[np.ndarray, List[str]]:
+        """Per-category interest in [0, 1] and the interests that were recognised"""
+        if isinstance(interests, str):
+            # A single value, possibly comma-separated, rather than a list
+            interests = interests.split(",")
+        keys = list(INTEREST_CATEGORIES)
+        matched = sorted({key for key in (_interest_key(value) for value in interests or []) if key})
+        weights = np.zeros(len(keys))
+        for key in matched:
+            weights[keys.index(key)] = 1.0
+        preference = np.clip(weights @ self._interest_matrix, 0.0, 1.0) if matched else np.zeros(len(self._categories))
+
+        # Categories already on the itinerary count as a weaker, implicit interest
+        column = {category: j for j, category in enumerate(self._categories)}
+        planned = np.zeros(len(self._categories))
+        for category in planned_categories:
+            j = column.get((category or "").strip().lower())
+            if j is not None:
+                planned[j] += 1.0
+        if planned.any():
+            preference = np.maximum(preference, 0.5 * planned / planned.max())
+        return preference, matched
+
+    def recommend(
+        self,
+        preferences: Dict[str, Any],
+        exclude_ids: Optional[Set[str]] = None,
+        planned: Sequence[Tuple[Optional[str], Optional[float], Optional[float]]] = (),
+        location: Optional[Tuple[float, float]] = None,
+        categories: Optional[Set[str]] = None,
+        limit: int = 10,
+    ) -> List[Tuple[str, float, List[str]]]:
+        """
+        (destination id, score in [0, 1], reasons) of the best destinations for the preferences.
+
+        planned lists (category, lat, lon) of the user's itinerary items; they
+        reinforce those categories and favour destinations close to them.
+        location is an optional (lat, lon) the user is at. categories limits
+        the results to those categories, and then the per-category cap does
+        not apply.
+        """
+        self.requests += 1
+        n = len(self._ids)
+        if n == 0 or limit <= 0:
+            return []
+
+        preference, interests = self._category_preference(preferences.get("interests") or [], [item[0] for item in planned])
+        interest = self._one_hot @ preference
+
+        level = _budget_level(preferences.get("budget"))
+        if level is None:
+            budget = np.full(n, 0.5)
+        else:
+            # A destination at or under the user's level fits; each level above it costs half the score
+            budget = self._one_hot @ np.clip(1.0 - 0.5 * np.maximum(self._costs - level, 0.0), 0.0, 1.0)
+
+        companion_key = _companion_key(preferences.get("travelsWith"))
+        companion = self._one_hot @ self._companions[companion_key] if companion_key else np.full(n, 0.5)
+
+        anchors = [(lat, lon) for _, lat, lon in planned if lat is not None and lon is not None]
+        if location is not None:
+            anchors.append(location)
+        if anchors:
+            # Nearest anchor by largest dot product, converted to great-circle km only for that one
+            dots = (self._vectors @ _unit_vectors([a[0] for a in anchors], [a[1] for a in anchors]).T).max(axis=1)
+            distances = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.sqrt(np.maximum(2 - 2 * dots, 0.0)) / 2, 0.0, 1.0))
+            proximity = np.power(0.5, distances / RECOMMEND_PROXIMITY_HALF_KM)
+        else:
+            distances = None
+            proximity = np.full(n, 0.5)
+
+        scores = (
+            RECOMMEND_WEIGHTS["interest"] * interest
+            + RECOMMEND_WEIGHTS["rating"] * self._ratings
+            + RECOMMEND_WEIGHTS["budget"] * budget
+            + RECOMMEND_WEIGHTS["companion"] * companion
+            + RECOMMEND_WEIGHTS["proximity"] * proximity
+        )
+
+        allowed = np.ones(n, dtype=bool)
+        if exclude_ids:
+            allowed[[self._index[i] for i in exclude_ids if i in self._index]] = False
+        if categories:
+            columns = [j for j, category in enumerate(self._categories) if category in categories]
+            allowed &= np.isin(self._columns, columns)
+        scores = np.where(allowed, scores, -np.inf)
+
+        results = []
+        for i in self._top(scores, limit, diversify=not categories).tolist():
+            j = int(self._columns[i])
+            reasons = []
+            category = self._categories[j]
+            matching = [key for key in interests if INTEREST_CATEGORIES[key].get(category, 0.0) >= 0.5]
+            if matching:
+                reasons.append(f"matches your interest in {', '.join(matching)}")
+            elif preference[j] > 0:
+                reasons.append("similar to places on your itinerary")
+            if self._ratings[i] >= 0.85:
+                reasons.append("highly rated")
+            if level is not None and budget[i] >= 1.0:
+                reasons.append("fits your budget")
+            if companion_key and companion[i] >= 0.8:
+                reasons.append(f"good for {companion_key} trips")
+            if distances is not None and distances[i] <= RECOMMEND_PROXIMITY_HALF_KM:
+                reasons.append(f"{distances[i]:.0f} km away")
+            results.append((self._ids[i], float(scores[i]), reasons))
+        return results
+
+    def _top(self, scores: np.ndarray, limit: int, diversify: bool = True) -> np.ndarray:
+        """
+        Indices of the best finite scores, best first with ties by id (the storage order).
+
+        With diversify, the best RECOMMEND_MAX_PER_CATEGORY of each category
+        come first and the remaining places are filled from the rest in score
+        order, so the cap varies the list without shortening it.
+        """
+        finite = np.isfinite(scores)
+        keep = RECOMMEND_MAX_PER_CATEGORY
+        if not diversify or keep <= 0:
+            return self._best(np.flatnonzero(finite), scores, limit)
+        picks = []
+        for members in self._members:
+            members = members[finite[members]]
+            if len(members) > keep:
+                members = members[np.argpartition(-scores[members], keep - 1)[:keep]]
+            picks.append(members)
+        top = self._best(np.concatenate(picks), scores, limit)
+        if len(top) < limit:
+            rest = finite.copy()
+            rest[top] = False
+            top = np.concatenate([top, self._best(np.flatnonzero(rest), scores, limit - len(top))])
+        return top
+
+    @staticmethod
+    def _best(indices: np.ndarray, scores: np.ndarray, limit: int) -> np.ndarray:
+        if len(indices) > limit:
+            indices = indices[np.argpartition(-scores[indices], limit - 1)[:limit]]
+        return indices[np.lexsort((indices, -scores[indices]))]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "destinations": len(self._ids),
+            "categories": len(self._categories),
+            "catalog_version": self.version,
+            "rebuilds": self.rebuilds,
+            "requests": self.requests,
+            "last_build_ms": self.last_build_ms,
+        }
+
+recommender = Recommender()
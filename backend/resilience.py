@@ -0,0 +1,207 @@
+import os
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker configuration shared by the n8n webhooks
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "1"))
+# A call slower than this fraction of its timeout counts as a failure
+CIRCUIT_SLOW_CALL_RATIO = float(os.getenv("CIRCUIT_SLOW_CALL_RATIO", "0.5"))
+
+# Longest time a call may wait for a bulkhead slot before it is rejected
+BULKHEAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BULKHEAD_QUEUE_TIMEOUT_SECONDS", "2"))
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream.
+
+    closed:    calls pass; failure_threshold consecutive failures (errors or
+               calls slower than slow_call_seconds) open the circuit.
+    open:      calls are refused so callers can answer with a fallback at once.
+    half_open: after reset_seconds a limited number of probe calls pass; a
+               successful probe closes the circuit, a failed one reopens it.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        slow_call_seconds: float,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS,
+        half_open_max_calls: int = CIRCUIT_HALF_OPEN_MAX_CALLS,
+    ):
+        self.name = name
+        self.slow_call_seconds = slow_call_seconds
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_max_calls = half_open_max_calls
+        self._state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probes_started = 0
+        self._probe_started_at = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+            self._probes_started = 0
+            logger.info(f"Circuit '{self.name}' half-open, probing upstream")
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) must not block probing forever
+            if self._probes_started and time.monotonic() - self._probe_started_at >= self.reset_seconds:
+                self._probes_started = 0
+            if self._probes_started < self.half_open_max_calls:
+                self._probes_started += 1
+                self._probe_started_at = time.monotonic()
+                return True
+        self.rejected += 1
+        return False
+
+    def release_probe(self):
+        """Hand back a half-open probe slot for a call that ended without a verdict (cancelled, rejected locally)"""
+        if self._state == self.HALF_OPEN and self._probes_started > 0:
+            self._probes_started -= 1
+
+    def record_success(self, duration: float):
+        if duration >= self.slow_call_seconds:
+            self.slow_calls += 1
+            self.record_failure()
+            return
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self._state == self.HALF_OPEN:
+            self._state = self.CLOSED
+            logger.info(f"Circuit '{self.name}' closed")
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or (
+            self._state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        logger.warning(f"Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failure(s)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "slow_calls": self.slow_calls,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "slow_call_seconds": self.slow_call_seconds,
+        }
+
+class BulkheadFullError(Exception):
+    """Raised when a bulkhead's wait queue is full or the wait for a slot timed out"""
+    pass
+
+class Bulkhead:
+    """
+    Concurrency limit for one upstream with a bounded wait queue.
+
+    At most max_concurrent calls run at once and at most max_queue more wait
+    up to queue_timeout for a slot; everything else is rejected immediately so
+    one slow upstream cannot take every socket and worker slot.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float = BULKHEAD_QUEUE_TIMEOUT_SECONDS):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending, so it is never counted as queued
+            await self._semaphore.acquire()
+        else:
+            await self._wait_for_slot()
+
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _wait_for_slot(self):
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise BulkheadFullError(f"Bulkhead '{self.name}' queue is full ({self.queued} waiting)")
+
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        started = time.perf_counter()
+        acquired = False
+        try:
+            # wait_for can drop a permit when the timeout races the acquire; a timeout scope cannot
+            async with asyncio.timeout(self.queue_timeout):
+                await self._semaphore.acquire()
+                acquired = True
+        except TimeoutError:
+            if acquired:
+                # The deadline fired just after the slot was taken: hand it back
+                self._semaphore.release()
+            self.rejected += 1
+            self.timed_out += 1
+            raise BulkheadFullError(f"Bulkhead '{self.name}' wait exceeded {self.queue_timeout}s")
+        finally:
+            self.queued -= 1
+            waited = time.perf_counter() - started
+            self.total_wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = self.admitted + self.timed_out
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.total_wait_seconds * 1000 / waits, 2) if waits else 0.0,
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+        }
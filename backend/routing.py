@@ -0,0 +1,70 @@
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# Upper bound on 2-opt improvement passes; each pass is O(n^2) vectorized work
+ROUTE_MAX_PASSES = int(os.getenv("ROUTE_MAX_PASSES", "50"))
+
+def optimize_route(
+    distances: np.ndarray,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+) -> Tuple[List[int], float]:
+    """
+    Near-optimal open path through every node of a distance matrix.
+
+    start and end pin the first and last node (they may be the same node for
+    a round trip). The path is built with nearest neighbour and improved
+    with 2-opt until no segment reversal shortens it. Returns the node order
+    and its total length.
+    """
+    n = len(distances)
+    if n == 0:
+        return [], 0.0
+
+    # A free end is modelled as a dummy node at distance 0 from every node,
+    # so 2-opt only has to handle paths whose two ends are fixed
+    dummy = n
+    matrix = np.zeros((n + 1, n + 1))
+    matrix[:n, :n] = distances
+
+    fixed = {node for node in (start, end) if node is not None}
+    path = [start if start is not None else dummy]
+    path += _nearest_neighbour(matrix, path[0], [node for node in range(n) if node not in fixed])
+    path.append(end if end is not None else dummy)
+
+    path = _two_opt(matrix, np.array(path))
+    # A round trip lists its start node at both ends
+    order = [int(node) for node in path if node != dummy]
+    length = float(matrix[path[:-1], path[1:]].sum())
+    return order, length
+
+def _nearest_neighbour(matrix: np.ndarray, first: int, nodes: List[int]) -> List[int]:
+    remaining = np.array(nodes, dtype=np.int64)
+    order = []
+    current = first
+    while len(remaining):
+        nearest = int(np.argmin(matrix[current, remaining]))
+        current = int(remaining[nearest])
+        order.append(current)
+        remaining = np.delete(remaining, nearest)
+    return order
+
+def _two_opt(matrix: np.ndarray, path: np.ndarray) -> np.ndarray:
+    """Reverse path[i..j] while that shortens the path; the first and last positions stay fixed"""
+    m = len(path)
+    for _ in range(ROUTE_MAX_PASSES):
+        improved = False
+        for i in range(1, m - 2):
+            j = np.arange(i + 1, m - 1)
+            a, b = path[i - 1], path[i]
+            c, d = path[j], path[j + 1]
+            delta = matrix[a, c] + matrix[b, d] - matrix[a, b] - matrix[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                path[i:j[best] + 1] = path[i:j[best] + 1][::-1].copy()
+                improved = True
+        if not improved:
+            break
+    return path
@@ -0,0 +1,120 @@
+import os
+from datetime import date, datetime
+from typing import List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from routing import optimize_route
+
+SCHEDULE_DEFAULT_VISIT_MINUTES = float(os.getenv("SCHEDULE_DEFAULT_VISIT_MINUTES", "120"))
+# Minutes of extra travel accepted per minute of load already on a day, to spread stops over the trip
+SCHEDULE_BALANCE_WEIGHT = float(os.getenv("SCHEDULE_BALANCE_WEIGHT", "0.25"))
+# Calendar days of a trip are those of the destination's local time
+SCHEDULE_TIMEZONE = ZoneInfo(os.getenv("SCHEDULE_TIMEZONE", "Asia/Amman"))
+
+# Typical time spent at a destination, by catalog category
+VISIT_MINUTES_BY_CATEGORY = {
+    "historical": 150,
+    "archaeological": 180,
+    "religious": 60,
+    "nature": 150,
+    "desert": 240,
+    "beach": 180,
+    "sea": 180,
+    "museum": 90,
+    "city": 120,
+    "market": 90,
+    "food": 75,
+    "adventure": 180,
+    "wellness": 120,
+}
+
+def local_date(value: datetime) -> date:
+    """Trip-local calendar date of a timestamp; naive values are taken as already local"""
+    if value.tzinfo is None:
+        return value.date()
+    return value.astimezone(SCHEDULE_TIMEZONE).date()
+
+def visit_minutes(category: Optional[str]) -> float:
+    return float(VISIT_MINUTES_BY_CATEGORY.get((category or "").strip().lower(), SCHEDULE_DEFAULT_VISIT_MINUTES))
+
+def plan_days(
+    travel: np.ndarray,
+    durations: Sequence[float],
+    priorities: Sequence[int],
+    fixed_days: Sequence[Optional[int]],
+    day_count: int,
+    daily_budget: float,
+    base: Optional[int] = None,
+) -> Tuple[List[List[int]], List[Tuple[int, str]]]:
+    """
+    Pack stops into days under a daily time budget (visits plus travel, in minutes).
+
+    travel is the travel-time matrix between the stops (and the base, when
+    given, at index base); each day starts and ends at the base. Stops with a
+    fixed day are placed on it first, even past the budget. The others are
+    taken highest priority first and placed at the day and position that
+    add the least time (cheapest insertion) while staying within budget,
+    with busier days penalised so stops spread over the trip.
+    Each day is then re-ordered with 2-opt. Returns the stop indices of each
+    day in visiting order, and (stop, reason) for stops that did not fit.
+    """
+    n = len(durations)
+    # Without a base, days are open paths: a dummy node at zero distance stands for both ends
+    anchor = base if base is not None else travel.shape[0]
+    matrix = np.zeros((travel.shape[0] + 1, travel.shape[0] + 1))
+    matrix[:travel.shape[0], :travel.shape[0]] = travel
+
+    routes = [[anchor, anchor] for _ in range(day_count)]
+    loads = [0.0] * day_count
+    unscheduled: List[Tuple[int, str]] = []
+
+    def insertion(route: List[int], stop: int) -> Tuple[float, int]:
+        nodes = np.array(route)
+        delta = matrix[nodes[:-1], stop] + matrix[stop, nodes[1:]] - matrix[nodes[:-1], nodes[1:]]
+        position = int(np.argmin(delta))
+        return float(delta[position]), position + 1
+
+    for stop in range(n):
+        day = fixed_days[stop]
+        if day is None:
+            continue
+        if not 0 <= day < day_count:
+            unscheduled.append((stop, "visit_date is outside the trip"))
+            continue
+        added, position = insertion(routes[day], stop)
+        routes[day].insert(position, stop)
+        loads[day] += added + durations[stop]
+
+    flexible = sorted((stop for stop in range(n) if fixed_days[stop] is None), key=lambda stop: -priorities[stop])
+    for stop in flexible:
+        best = None
+        for day in range(day_count):
+            added, position = insertion(routes[day], stop)
+            cost = added + durations[stop]
+            if loads[day] + cost > daily_budget:
+                continue
+            score = cost + SCHEDULE_BALANCE_WEIGHT * loads[day]
+            if best is None or score < best[0]:
+                best = (score, day, position, cost)
+        if best is None:
+            unscheduled.append((stop, "does not fit in the daily time budget"))
+            continue
+        _, day, position, cost = best
+        routes[day].insert(position, stop)
+        loads[day] += cost
+
+    days = []
+    for route in routes:
+        stops = route[1:-1]
+        if len(stops) > 1:
+            if base is not None:
+                nodes = [base] + stops + [base]
+                order, _ = optimize_route(matrix[np.ix_(nodes, nodes)], 0, len(nodes) - 1)
+                stops = [nodes[i] for i in order[1:-1]]
+            else:
+                order, _ = optimize_route(matrix[np.ix_(stops, stops)])
+                stops = [stops[i] for i in order]
+        days.append(stops)
+    return days, unscheduled
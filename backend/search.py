@@ -0,0 +1,236 @@
+import os
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Relative weight of a match in each field of a destination
+SEARCH_FIELD_WEIGHTS = {
+    "name": 3.0,
+    "name_ar": 3.0,
+    "category": 1.5,
+    "description": 1.0,
+    "description_ar": 1.0,
+}
+# Most vocabulary terms a type-ahead prefix expands to
+SEARCH_MAX_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_MAX_PREFIX_EXPANSIONS", "50"))
+# A prefix match scores this fraction of a whole-word match
+SEARCH_PREFIX_WEIGHT = float(os.getenv("SEARCH_PREFIX_WEIGHT", "0.7"))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+ARABIC_FOLDING = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي",
+    "ؤ": "و",
+    "ة": "ه",
+})
+ARABIC_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+TOKEN_PATTERN = re.compile(r"\w+")
+# Shortest English stem a verb suffix may leave ("walking" -> "walk", but "spring" stays)
+STEM_MIN_LENGTH = 4
+
+def normalize(text: str) -> str:
+    """Case-fold, strip Latin accents and Arabic diacritics/tatweel, and fold Arabic letter variants"""
+    text = ARABIC_DIACRITICS.sub("", text).translate(ARABIC_FOLDING)
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def _is_arabic(token: str) -> bool:
+    return "\u0600" <= token[0] <= "\u06ff"
+
+def stem(token: str) -> str:
+    """Light stemming: Arabic definite-article prefixes, English plural and verb suffixes"""
+    if _is_arabic(token):
+        for prefix in ARABIC_PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+                return token[len(prefix):]
+        return token
+    if len(token) <= 3:
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith(("sses", "ches", "shes", "xes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    if token.endswith("ing") and len(token) - 3 >= STEM_MIN_LENGTH:
+        return token[:-3]
+    if token.endswith("ed") and len(token) - 2 >= STEM_MIN_LENGTH:
+        return token[:-2]
+    return token
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Normalized, unstemmed tokens"""
+    if not text:
+        return []
+    return TOKEN_PATTERN.findall(normalize(text))
+
+class SearchIndex:
+    """
+    In-memory inverted index with BM25 ranking over weighted document fields.
+
+    Postings map each stemmed term to the documents containing it with the
+    field-weighted term frequency. Both the stemmed terms and the unstemmed
+    surface tokens are kept in sorted vocabularies, so the last query token
+    can be expanded with a binary search to every term it prefixes
+    (type-ahead): "hiki" reaches "hiking" although the term is stemmed.
+    Documents are upserted and removed one at a time, so catalog changes do
+    not rebuild the whole index.
+    """
+
+    def __init__(self, field_weights: Dict[str, float] = SEARCH_FIELD_WEIGHTS):
+        self.field_weights = field_weights
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        # Unstemmed tokens, for prefix expansion, with the number of documents containing each
+        self._surface: List[str] = []
+        self._surface_counts: Dict[str, int] = {}
+        self._doc_terms: Dict[str, Set[str]] = {}
+        self._doc_surfaces: Dict[str, Set[str]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def upsert(self, doc_id: str, fields: Dict[str, Optional[str]]):
+        self.remove(doc_id)
+        frequencies: Dict[str, float] = {}
+        surfaces: Set[str] = set()
+        length = 0.0
+        for field, weight in self.field_weights.items():
+            for token in tokenize(fields.get(field)):
+                term = stem(token)
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+                surfaces.add(token)
+                length += weight
+
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._vocabulary, term)
+            postings[doc_id] = frequency
+        for token in surfaces:
+            count = self._surface_counts.get(token, 0)
+            if count == 0:
+                insort(self._surface, token)
+            self._surface_counts[token] = count + 1
+        self._doc_terms[doc_id] = set(frequencies)
+        self._doc_surfaces[doc_id] = surfaces
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+
+    def remove(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+        for token in self._doc_surfaces.pop(doc_id):
+            count = self._surface_counts[token] - 1
+            if count:
+                self._surface_counts[token] = count
+            else:
+                del self._surface_counts[token]
+                del self._surface[bisect_left(self._surface, token)]
+        self._total_length -= self._doc_lengths.pop(doc_id)
+
+    def clear(self):
+        self._postings.clear()
+        self._vocabulary.clear()
+        self._surface.clear()
+        self._surface_counts.clear()
+        self._doc_terms.clear()
+        self._doc_surfaces.clear()
+        self._doc_lengths.clear()
+        self._total_length = 0.0
+
+    @staticmethod
+    def _prefixed(vocabulary: List[str], prefix: str) -> List[str]:
+        start = bisect_left(vocabulary, prefix)
+        words = []
+        for word in vocabulary[start:start + SEARCH_MAX_PREFIX_EXPANSIONS]:
+            if not word.startswith(prefix):
+                break
+            words.append(word)
+        return words
+
+    def _query_terms(self, token: str, prefix: bool) -> Dict[str, float]:
+        """Index terms a query token matches, with the weight of each match"""
+        matches = {}
+        if prefix:
+            # Surface tokens catch partial words longer than their stem ("hiki" -> "hiking" -> "hik");
+            # stemmed terms catch prefixes of stripped Arabic words ("بتر" -> "بتراء")
+            for surface in self._prefixed(self._surface, token):
+                matches[stem(surface)] = SEARCH_PREFIX_WEIGHT
+            for source in {token, stem(token)}:
+                for term in self._prefixed(self._vocabulary, source):
+                    matches[term] = SEARCH_PREFIX_WEIGHT
+        term = stem(token)
+        if term in self._postings:
+            matches[term] = 1.0
+        return matches
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        prefix: bool = True,
+        accept: Optional[Callable[[str], bool]] = None,
+    ) -> List[Tuple[float, str]]:
+        """
+        (score, doc_id) of the documents matching every query token, best first.
+        With prefix, the last token also matches the terms it starts (search-as-you-type).
+        accept filters documents (e.g. by category) before ranking.
+        """
+        tokens = tokenize(query)
+        if not tokens or not self._doc_terms:
+            return []
+
+        doc_count = len(self._doc_terms)
+        average_length = self._total_length / doc_count or 1.0
+        scores: Optional[Dict[str, float]] = None
+
+        for position, token in enumerate(tokens):
+            token_scores: Dict[str, float] = {}
+            is_last = position == len(tokens) - 1
+            for term, match_weight in self._query_terms(token, prefix and is_last).items():
+                postings = self._postings[term]
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    if accept is not None and not accept(doc_id):
+                        continue
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / average_length)
+                    score = match_weight * idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    # A token counts once per document, through its best matching term
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {doc_id: score + token_scores[doc_id] for doc_id, score in scores.items() if doc_id in token_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(((score, doc_id) for doc_id, score in scores.items()), key=lambda item: (-item[0], item[1]))
+        return ranked[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self._doc_terms),
+            "terms": len(self._vocabulary),
+            "surface_tokens": len(self._surface),
+        }
+
+destination_search = SearchIndex()
@@ -1,18 +1,47 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from contextlib import asynccontextmanager
 import os
+import asyncio
+import copy
+import hashlib
+import hmac
+import time
 import logging
-import httpx
+import re
+import uuid
 from pathlib import Path
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import Callable, List, Optional, Dict, Any, Set, Tuple
+from datetime import datetime, date, timedelta
 import json
 
 # Import our modules
 from models import *
-from auth import get_current_user, get_optional_user, authenticate_user, register_user, supabase, supabase_admin
+from auth import get_current_user, get_optional_user, authenticate_user, register_user, supabase, supabase_admin, jwt_verifier, auth_cache_stats, AUTH_VERIFY_MODE
+from supabase_executor import supabase_executor
+from cache import TTLCache, MISSING
+from http_clients import http_clients
+from resilience import CircuitBreaker, Bulkhead, BulkheadFullError, CIRCUIT_SLOW_CALL_RATIO
+from profile_cache import profile_cache
+from catalog import destination_catalog, destination_icon
+from geo import destination_index
+from routing import optimize_route
+from distance_matrix import distance_matrix
+from scheduler import local_date, plan_days, visit_minutes
+from search import destination_search
+from pagination import encode_cursor, decode_cursor
+from recommender import recommender
+from cache_invalidation import cache_invalidation
+from conditional import (
+    ETagCache, compute_etag, etag_matches, not_modified, CONDITIONAL_CACHE_CONTROL,
+    ETAG_CACHE_TTL_SECONDS, ETAG_CACHE_MAX_SIZE, ETAG_CACHE_MAX_VARIANTS
+)
+from weather import (
+    weather_cache, WeatherPrefetcher, WEATHER_PREFETCH_ENABLED, WEATHER_PREFETCH_INTERVAL_SECONDS,
+    WEATHER_PREFETCH_LANGS, WEATHER_PREFETCH_CONCURRENCY, WEATHER_PREFETCH_SOURCE, WEATHER_PREFETCH_LOCATIONS
+)
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
@@ -25,6 +54,21 @@ APP_NAME = os.getenv("APP_NAME", "SmartTour.Jo API")
 APP_VERSION = os.getenv("APP_VERSION", "1.0.0")
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 N8N_WEBHOOK_BASE_URL = os.getenv("N8N_WEBHOOK_BASE_URL", "https://n8n.smart-tour.app/webhook")
+ITINERARY_CACHE_TTL_SECONDS = int(os.getenv("ITINERARY_CACHE_TTL_SECONDS", "1800"))
+ITINERARY_CACHE_MAX_SIZE = int(os.getenv("ITINERARY_CACHE_MAX_SIZE", "512"))
+ITINERARY_PAGE_DEFAULT_LIMIT = int(os.getenv("ITINERARY_PAGE_DEFAULT_LIMIT", "50"))
+ITINERARY_PAGE_MAX_LIMIT = int(os.getenv("ITINERARY_PAGE_MAX_LIMIT", "200"))
+ROUTE_MAX_STOPS = int(os.getenv("ROUTE_MAX_STOPS", "200"))
+SCHEDULE_MAX_DAYS = int(os.getenv("SCHEDULE_MAX_DAYS", "30"))
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", "500"))
+NEARBY_MAX_RESULTS = int(os.getenv("NEARBY_MAX_RESULTS", "100"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+# Shared secret for GET /api/metrics (X-Metrics-Token header); without it only loopback clients may read metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+RECOMMEND_MAX_RESULTS = int(os.getenv("RECOMMEND_MAX_RESULTS", "50"))
+# Size of the plan the local planner builds from recommendations
+PLANNER_LOCAL_DAYS = int(os.getenv("PLANNER_LOCAL_DAYS", "5"))
+PLANNER_LOCAL_STOPS_PER_DAY = int(os.getenv("PLANNER_LOCAL_STOPS_PER_DAY", "2"))
 
 # MongoDB connection (temporary - will migrate to PostgreSQL)
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
@@ -43,10 +87,23 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting up SmartTour.Jo API...")
+    if AUTH_VERIFY_MODE == "local":
+        await jwt_verifier.start()
+    http_clients.start("n8n")
+    cache_invalidation.start()
+    await destination_catalog.start()
+    if WEATHER_PREFETCH_ENABLED:
+        weather_prefetcher.start()
     logger.info("MongoDB and Supabase connections ready")
     yield
     # Shutdown
     logger.info("Shutting down SmartTour.Jo API...")
+    await weather_prefetcher.stop()
+    await destination_catalog.stop()
+    await cache_invalidation.stop()
+    await jwt_verifier.stop()
+    supabase_executor.shutdown()
+    await http_clients.close()
     mongo_client.close()
     logger.info("Database connections closed")
 
@@ -68,8 +125,23 @@ app.add_middleware(
     allow_origins=["*"],  # In production, replace with specific origins
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Cache", "ETag"],
 )
 
+# Evict rows changed by other workers (or directly in the database) from local caches
+cache_invalidation.register("profiles", lambda event: profile_cache.invalidate(event["id"]))
+cache_invalidation.on_reconnect(profile_cache.clear)
+
+# ETags of itinerary list responses, per user, so unchanged polls are answered without Supabase
+itinerary_etags = ETagCache("itinerary_etags", ETAG_CACHE_TTL_SECONDS, ETAG_CACHE_MAX_SIZE, ETAG_CACHE_MAX_VARIANTS)
+cache_invalidation.register("itineraries", lambda event: itinerary_etags.invalidate(event["user_id"]))
+cache_invalidation.on_reconnect(itinerary_etags.clear)
+
+# Destinations are shared by every user; refresh the catalog and drop ETags of responses enriched from it
+cache_invalidation.register("destinations", lambda event: destination_catalog.request_refresh())
+cache_invalidation.on_reconnect(destination_catalog.request_refresh)
+destination_catalog.add_listener(lambda changed, removed: itinerary_etags.clear())
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -114,9 +186,44 @@ async def health_check():
         status="healthy" if db_status == "healthy" else "unhealthy",
         timestamp=datetime.utcnow(),
         version=APP_VERSION,
-        database_status=db_status
+        database_status=db_status,
+        upstreams={name: breaker.stats() for name, breaker in circuit_breakers.items()}
     )
 
+def require_metrics_access(request: Request):
+    """Allow internal callers only: the metrics token, or a loopback client when no token is configured"""
+    if METRICS_TOKEN:
+        supplied = request.headers.get("X-Metrics-Token", "")
+        if hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode()):
+            return
+    elif request.client and request.client.host in ("127.0.0.1", "::1", "localhost"):
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Metrics are only available to internal callers")
+
+@api_router.get("/metrics", dependencies=[Depends(require_metrics_access)])
+async def get_metrics():
+    """In-process cache and upstream statistics for this worker (internal callers only)"""
+    return {
+        "pid": os.getpid(),
+        "timestamp": datetime.utcnow(),
+        "auth_cache": auth_cache_stats(),
+        "profile_cache": profile_cache.stats(),
+        "cache_invalidation": cache_invalidation.stats(),
+        "destination_catalog": destination_catalog.stats(),
+        "destination_index": destination_index.stats(),
+        "destination_search": destination_search.stats(),
+        "recommender": recommender.stats(),
+        "distance_matrix": distance_matrix.stats(),
+        "supabase_pool": supabase_executor.stats(),
+        "http_clients": http_clients.stats(),
+        "weather_cache": weather_cache.stats(),
+        "weather_prefetch": weather_prefetcher.stats(),
+        "circuit_breakers": {name: breaker.stats() for name, breaker in circuit_breakers.items()},
+        "bulkheads": {name: bulkhead.stats() for name, bulkhead in bulkheads.items()},
+        "itinerary_etags": itinerary_etags.stats(),
+        "itinerary_suggestion_cache": suggestion_cache.stats()
+    }
+
 @api_router.get("/")
 async def root():
     """Root endpoint"""
@@ -177,53 +284,77 @@ async def get_current_user_info(current_user: Dict[str, Any] = Depends(get_curre
         "user": current_user.get("user")
     }
 
+def _parse_fields(fields: Optional[str], allowed: List[str]) -> Optional[List[str]]:
+    """Parse a comma separated fields= sparse fieldset, rejecting unknown names"""
+    if not fields:
+        return None
+    requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+    return requested or None
+
+FIELDS_DESCRIPTION = "Comma separated list of fields to return (default: all)"
+
 # User Profile Routes
+DEFAULT_PREFERENCES = {"interests": [], "budget": "medium", "travelsWith": "Solo"}
+
+def _parse_timestamp(value: Optional[str]) -> datetime:
+    """Parse a Supabase timestamp, falling back to now when it is missing or malformed"""
+    if value:
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except (ValueError, AttributeError):
+            pass
+    return datetime.utcnow()
+
+PROFILE_FIELDS = list(UserProfileResponse.model_fields)
+
+def _profile_values(profile_data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": profile_data["id"],
+        "preferences": profile_data.get("preferences") or {},
+        "created_at": _parse_timestamp(profile_data.get("created_at")),
+        "updated_at": _parse_timestamp(profile_data.get("updated_at"))
+    }
+
+def _profile_response(profile_data: Dict[str, Any]) -> UserProfileResponse:
+    return UserProfileResponse(**_profile_values(profile_data))
+
 @api_router.get("/profile", response_model=UserProfileResponse)
-async def get_user_profile(current_user: Dict[str, Any] = Depends(get_current_user)):
-    """Get user profile and preferences"""
+async def get_user_profile(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Get user profile and preferences, creating a default profile on first access.
+    Supports If-None-Match: an unchanged profile is answered with 304 straight from the profile cache.
+    """
+    selected = _parse_fields(fields, PROFILE_FIELDS)
     try:
-        # Get profile from Supabase
-        profile_response = supabase_admin.table("profiles").select("*").eq("id", current_user["user_id"]).execute()
-        
-        if profile_response.data:
-            profile_data = profile_response.data[0]
-            # Handle created_at and updated_at safely
-            created_at = datetime.utcnow()
-            updated_at = datetime.utcnow()
-            
-            if profile_data.get("created_at"):
-                try:
-                    created_at = datetime.fromisoformat(profile_data["created_at"].replace('Z', '+00:00'))
-                except:
-                    pass
-            
-            if profile_data.get("updated_at"):
-                try:
-                    updated_at = datetime.fromisoformat(profile_data["updated_at"].replace('Z', '+00:00'))
-                except:
-                    pass
-            
-            return UserProfileResponse(
-                id=profile_data["id"],
-                preferences=profile_data.get("preferences", {}),
-                created_at=created_at,
-                updated_at=updated_at
-            )
-        else:
-            # Create default profile
-            default_profile = {
-                "id": current_user["user_id"],
-                "preferences": {"interests": [], "budget": "medium", "travelsWith": "Solo"}
-            }
-            supabase_admin.table("profiles").insert(default_profile).execute()
-            
-            return UserProfileResponse(
-                id=current_user["user_id"],
-                preferences=default_profile["preferences"],
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
+        # The row comes from the profile cache, so fields= only narrows the payload
+        profile_data = await profile_cache.get_or_create(current_user["user_id"], DEFAULT_PREFERENCES)
+        if not profile_data:
+            raise HTTPException(status_code=500, detail="Error fetching user profile")
+
+        etag = compute_etag([profile_data.get("id"), profile_data.get("preferences"), profile_data.get("updated_at"), selected])
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return not_modified(etag)
+        headers = {"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL}
+
+        if selected:
+            values = _profile_values(profile_data)
+            return JSONResponse(content=jsonable_encoder({field: values[field] for field in selected}), headers=headers)
+        response.headers.update(headers)
+        return _profile_response(profile_data)
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching user profile: {e}")
         raise HTTPException(status_code=500, detail="Error fetching user profile")
@@ -235,40 +366,17 @@ async def update_user_profile(
 ):
     """Update user profile and preferences"""
     try:
-        update_data = {
-            "preferences": profile_update.preferences,
-            "updated_at": datetime.utcnow().isoformat()
-        }
-        
-        response = supabase_admin.table("profiles").upsert({
+        # created_at/updated_at are set by the database (column default and update trigger)
+        response = await supabase_executor.execute(supabase_admin.table("profiles").upsert({
             "id": current_user["user_id"],
-            **update_data
-        }).execute()
+            "preferences": profile_update.preferences
+        }))
+        profile_cache.invalidate(current_user["user_id"])
         
         if response.data:
             profile_data = response.data[0]
-            # Handle created_at and updated_at safely
-            created_at = datetime.utcnow()
-            updated_at = datetime.utcnow()
-            
-            if profile_data.get("created_at"):
-                try:
-                    created_at = datetime.fromisoformat(profile_data["created_at"].replace('Z', '+00:00'))
-                except:
-                    pass
-            
-            if profile_data.get("updated_at"):
-                try:
-                    updated_at = datetime.fromisoformat(profile_data["updated_at"].replace('Z', '+00:00'))
-                except:
-                    pass
-            
-            return UserProfileResponse(
-                id=profile_data["id"],
-                preferences=profile_data["preferences"],
-                created_at=created_at,
-                updated_at=updated_at
-            )
+            profile_cache.set(current_user["user_id"], profile_data)
+            return _profile_response(profile_data)
         else:
             raise HTTPException(status_code=500, detail="Failed to update profile")
             
@@ -277,37 +385,173 @@ async def update_user_profile(
         raise HTTPException(status_code=500, detail="Error updating user profile")
 
 # Itinerary Routes
+ITINERARY_STATUS_PATTERN = "^(planned|visited|cancelled)$"
+
+def _parse_visit_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, AttributeError):
+        return None
+
+ITINERARY_FIELDS = list(ItineraryResponse.model_fields)
+
+# Columns each field is computed from, when not just the column of the same name
+ITINERARY_FIELD_COLUMNS = {
+    "destination_name": ["destination_name", "destination_id"],
+    "destination_type": ["destination_type", "destination_id"],
+    "destination_icon": ["destination_icon", "destination_type", "destination_id"],
+    "destination_name_ar": ["destination_id"],
+    "latitude": ["destination_id"],
+    "longitude": ["destination_id"],
+}
+
+def _itinerary_values(item: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    API values for an itineraries row, with defaults for columns that are empty or not selected.
+    Name, category and coordinates come from the destination catalog when it knows the destination.
+    """
+    destination = destination_catalog.get(item.get("destination_id"))
+    if destination is not None:
+        destination_name = destination.name
+        destination_type = destination.category or item.get("destination_type") or "attraction"
+    else:
+        destination_name = item.get("destination_name") or f"Destination {item.get('destination_id')}"
+        destination_type = item.get("destination_type") or "attraction"
+    return {
+        "id": item.get("id"),
+        "user_id": item.get("user_id"),
+        "destination_id": item.get("destination_id"),
+        "destination_name": destination_name,
+        "destination_name_ar": destination.name_ar if destination else None,
+        "destination_type": destination_type,
+        "destination_icon": item.get("destination_icon") or destination_icon(destination_type),
+        "latitude": destination.latitude if destination else None,
+        "longitude": destination.longitude if destination else None,
+        "notes": item.get("notes") or "",
+        "status": item.get("status") or "planned",
+        "visit_date": _parse_visit_date(item.get("visit_date")),
+        "priority": item.get("priority") or 1,
+        "added_at": _parse_timestamp(item.get("added_at") or item.get("created_at"))
+    }
+
+def _itinerary_from_row(item: Dict[str, Any]) -> ItineraryResponse:
+    """Build the API model from an itineraries row"""
+    return ItineraryResponse(**_itinerary_values(item))
+
+def _itinerary_columns(fields: List[str]) -> str:
+    """Select list for a sparse fieldset; id and added_at are always read for the cursor"""
+    columns = {"id": None, "added_at": None}
+    for field in fields:
+        for column in ITINERARY_FIELD_COLUMNS.get(field, [field]):
+            columns[column] = None
+    return ",".join(columns)
+
+# Columns that may be cleared with an explicit null; the others are NOT NULL or have defaults
+NULLABLE_ITINERARY_COLUMNS = {"destination_type", "destination_icon", "notes", "visit_date"}
+
+def _itinerary_changes(changes: ItineraryUpdate) -> Dict[str, Any]:
+    """Columns to write for an update: only the fields the client sent"""
+    data = {}
+    for field, value in changes.model_dump(exclude_unset=True).items():
+        if value is None and field not in NULLABLE_ITINERARY_COLUMNS:
+            continue
+        if field == "visit_date" and value is not None:
+            # The trip-local day, the same one the scheduler places the visit on
+            value = local_date(value).isoformat()
+        data[field] = value
+    return data
+
+def _itinerary_insert_row(item: ItineraryCreate, user_id: str) -> Dict[str, Any]:
+    return {
+        "user_id": user_id,
+        "destination_id": item.destination_id,
+        "destination_name": item.destination_name,
+        "destination_type": item.destination_type,
+        "destination_icon": item.destination_icon,
+        "notes": item.notes,
+        "status": item.status or "planned",
+        "visit_date": local_date(item.visit_date).isoformat() if item.visit_date else None,
+        "priority": item.priority
+    }
+
+def _is_uuid(value: Optional[str]) -> bool:
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
 @api_router.get("/itineraries", response_model=List[ItineraryResponse])
-async def get_user_itineraries(current_user: Dict[str, Any] = Depends(get_current_user)):
-    """Get user's itineraries"""
+async def get_user_itineraries(
+    request: Request,
+    response: Response,
+    limit: int = Query(ITINERARY_PAGE_DEFAULT_LIMIT, ge=1, le=ITINERARY_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status", pattern=ITINERARY_STATUS_PATTERN),
+    visit_date_from: Optional[date] = None,
+    visit_date_to: Optional[date] = None,
+    priority: Optional[int] = Query(None, ge=1, le=5),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Get user's itineraries, newest first, one page at a time.
+    The next page is requested with the cursor returned in the X-Next-Cursor header.
+    fields= narrows both the columns read from the database and the items returned.
+    Supports If-None-Match; a page whose ETag is remembered is answered with 304 without a query.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    selected = _parse_fields(fields, ITINERARY_FIELDS)
+    user_id = current_user["user_id"]
+    if_none_match = request.headers.get("if-none-match")
+    signature = (limit, cursor, status_filter, visit_date_from, visit_date_to, priority, tuple(selected or ()))
+    remembered = itinerary_etags.get(user_id, signature)
+    if remembered and etag_matches(if_none_match, remembered[0]):
+        return not_modified(*remembered)
+
+    generation = itinerary_etags.generation(user_id)
     try:
-        response = supabase_admin.table("itineraries").select("*").eq("user_id", current_user["user_id"]).execute()
-        
-        itineraries = []
-        for item in response.data:
-            # Handle the actual schema fields and provide defaults for missing ones
-            added_at = datetime.utcnow()
-            if item.get("created_at"):
-                try:
-                    added_at = datetime.fromisoformat(item["created_at"].replace('Z', '+00:00'))
-                except:
-                    pass
-            
-            itineraries.append(ItineraryResponse(
-                id=item["id"],
-                user_id=item["user_id"],
-                destination_id=item["destination_id"],
-                destination_name=f"Destination {item['destination_id']}",  # Default name
-                destination_type="attraction",  # Default type
-                destination_icon="📍",  # Default icon
-                notes="",  # Default empty notes
-                status="planned",  # Default status
-                visit_date=None,  # No visit date in schema
-                priority=1,  # Default priority
-                added_at=added_at
-            ))
+        columns = _itinerary_columns(selected) if selected else "*"
+        # Served by idx_itineraries_user_added_at_id (user_id, added_at DESC, id DESC)
+        query = supabase_admin.table("itineraries").select(columns).eq("user_id", user_id)
+        if status_filter:
+            query = query.eq("status", status_filter)
+        if visit_date_from:
+            query = query.gte("visit_date", visit_date_from.isoformat())
+        if visit_date_to:
+            query = query.lte("visit_date", visit_date_to.isoformat())
+        if priority:
+            query = query.eq("priority", priority)
+        if after:
+            added_at, item_id = after
+            query = query.or_(f'added_at.lt."{added_at}",and(added_at.eq."{added_at}",id.lt.{item_id})')
+        query = query.order("added_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+        result = await supabase_executor.execute(query)
+        rows = result.data or []
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+
+        etag = compute_etag([rows, selected, destination_catalog.version])
+        itinerary_etags.set(user_id, signature, etag, headers, generation)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag, headers)
+        headers.update({"ETag": etag, "Cache-Control": CONDITIONAL_CACHE_CONTROL})
+        response.headers.update(headers)
+
+        if selected:
+            items = []
+            for item in rows:
+                values = _itinerary_values(item)
+                items.append({field: values[field] for field in selected})
+            # A returned Response does not pick up headers set on the injected one
+            return JSONResponse(content=jsonable_encoder(items), headers=dict(response.headers))
         
-        return itineraries
+        return [_itinerary_from_row(item) for item in rows]
         
     except Exception as e:
         logger.error(f"Error fetching itineraries: {e}")
@@ -319,36 +563,20 @@ async def create_itinerary(
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Create a new itinerary item"""
+    if not re.match(ITINERARY_STATUS_PATTERN, itinerary.status or "planned"):
+        raise HTTPException(status_code=400, detail=f"Invalid status '{itinerary.status}'")
     try:
-        # Use only fields that exist in the actual Supabase schema
-        itinerary_data = {
-            "user_id": current_user["user_id"],
-            "destination_id": itinerary.destination_id
-        }
-        
-        logger.info(f"Creating itinerary with data: {itinerary_data}")
-        response = supabase_admin.table("itineraries").insert(itinerary_data).execute()
-        logger.info(f"Supabase response: {response}")
-        
+        row = _itinerary_insert_row(itinerary, current_user["user_id"])
+        response = await supabase_executor.execute(supabase_admin.table("itineraries").insert(row))
+        itinerary_etags.invalidate(current_user["user_id"])
+
         if response.data:
-            item = response.data[0]
-            # Return response with available fields and defaults for missing ones
-            return ItineraryResponse(
-                id=item["id"],
-                user_id=item["user_id"],
-                destination_id=item["destination_id"],
-                destination_name=itinerary.destination_name or f"Destination {item['destination_id']}",
-                destination_type=itinerary.destination_type,
-                destination_icon=itinerary.destination_icon,
-                notes=itinerary.notes,
-                status=itinerary.status or "planned",
-                visit_date=itinerary.visit_date,
-                priority=itinerary.priority or 1,
-                added_at=datetime.fromisoformat(item["created_at"].replace('Z', '+00:00'))
-            )
+            return _itinerary_from_row(response.data[0])
         else:
             raise HTTPException(status_code=500, detail="Failed to create itinerary")
-            
+
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating itinerary: {e}")
         raise HTTPException(status_code=500, detail="Error creating itinerary")
@@ -359,36 +587,26 @@ async def update_itinerary(
     itinerary_update: ItineraryUpdate,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Update an itinerary item"""
+    """Update an itinerary item with one filtered UPDATE ... RETURNING"""
+    if not _is_uuid(itinerary_id):
+        raise HTTPException(status_code=404, detail="Itinerary not found")
+    if itinerary_update.status is not None and not re.match(ITINERARY_STATUS_PATTERN, itinerary_update.status):
+        raise HTTPException(status_code=400, detail=f"Invalid status '{itinerary_update.status}'")
+
     try:
-        # Check if itinerary belongs to user
-        existing = supabase_admin.table("itineraries").select("*").eq("id", itinerary_id).eq("user_id", current_user["user_id"]).execute()
-        
-        if not existing.data:
+        changes = _itinerary_changes(itinerary_update)
+        query = supabase_admin.table("itineraries")
+        # The user_id filter is the ownership check; nothing to write is a plain read
+        query = query.update(changes) if changes else query.select("*")
+        response = await supabase_executor.execute(query.eq("id", itinerary_id).eq("user_id", current_user["user_id"]))
+        if changes:
+            itinerary_etags.invalidate(current_user["user_id"])
+
+        if not response.data:
             raise HTTPException(status_code=404, detail="Itinerary not found")
-        
-        # For the current schema, we can only update destination_id
-        # Since the schema is minimal, we'll just return the existing data with updated fields from the request
-        # In a real implementation, you'd extend the schema to support more fields
-        
-        # Get the existing item
-        existing_item = existing.data[0]
-        
-        # Return response with updated fields (simulated since we can't actually update them in the current schema)
-        return ItineraryResponse(
-            id=existing_item["id"],
-            user_id=existing_item["user_id"],
-            destination_id=existing_item["destination_id"],
-            destination_name=itinerary_update.destination_name or f"Destination {existing_item['destination_id']}",
-            destination_type=itinerary_update.destination_type or "attraction",
-            destination_icon=itinerary_update.destination_icon or "📍",
-            notes=itinerary_update.notes or "",
-            status=itinerary_update.status or "planned",
-            visit_date=itinerary_update.visit_date,
-            priority=itinerary_update.priority or 1,
-            added_at=datetime.fromisoformat(existing_item["created_at"].replace('Z', '+00:00'))
-        )
-            
+
+        return _itinerary_from_row(response.data[0])
+
     except HTTPException:
         raise
     except Exception as e:
@@ -402,7 +620,8 @@ async def delete_itinerary(
 ):
     """Delete an itinerary item"""
     try:
-        response = supabase_admin.table("itineraries").delete().eq("id", itinerary_id).eq("user_id", current_user["user_id"]).execute()
+        response = await supabase_executor.execute(supabase_admin.table("itineraries").delete().eq("id", itinerary_id).eq("user_id", current_user["user_id"]))
+        itinerary_etags.invalidate(current_user["user_id"])
         
         if response.data:
             return {"message": "Itinerary deleted successfully"}
@@ -415,52 +634,553 @@ async def delete_itinerary(
         logger.error(f"Error deleting itinerary: {e}")
         raise HTTPException(status_code=500, detail="Error deleting itinerary")
 
+@api_router.post("/itineraries/batch", response_model=ItineraryBatchResponse)
+async def batch_itineraries(
+    batch: ItineraryBatchRequest,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Create, update and delete many itinerary items in one request.
+    Each kind of operation runs as a single multi-row statement; results are reported per operation.
+    At most ITINERARY_BATCH_MAX_SIZE operations are accepted.
+    """
+    user_id = current_user["user_id"]
+    results: List[Optional[ItineraryBatchResult]] = [None] * len(batch.operations)
+    creates, updates, deletes = [], [], []
+    seen_ids = set()
+
+    def invalid(index: int, operation: ItineraryBatchOperation, error: str):
+        results[index] = ItineraryBatchResult(index=index, op=operation.op, id=operation.id, status="invalid", error=error)
+
+    for index, operation in enumerate(batch.operations):
+        changes = operation.item if operation.op == "create" else operation.changes
+        if changes is not None and changes.status is not None and not re.match(ITINERARY_STATUS_PATTERN, changes.status):
+            invalid(index, operation, f"Invalid status '{changes.status}'")
+            continue
+        if changes is not None and changes.priority is not None and not ITINERARY_PRIORITY_MIN <= changes.priority <= ITINERARY_PRIORITY_MAX:
+            invalid(index, operation, f"Invalid priority {changes.priority}, must be {ITINERARY_PRIORITY_MIN}-{ITINERARY_PRIORITY_MAX}")
+            continue
+
+        if operation.op == "create":
+            if operation.item is None:
+                invalid(index, operation, "create requires 'item'")
+            else:
+                creates.append(index)
+            continue
+
+        if not _is_uuid(operation.id):
+            invalid(index, operation, f"{operation.op} requires a valid 'id'")
+        elif operation.id in seen_ids:
+            invalid(index, operation, "id appears in more than one operation")
+        elif operation.op == "update" and (operation.changes is None or not _itinerary_changes(operation.changes)):
+            invalid(index, operation, "update requires non-empty 'changes'")
+        else:
+            seen_ids.add(operation.id)
+            (updates if operation.op == "update" else deletes).append(index)
+
+    async def run_creates():
+        rows = [_itinerary_insert_row(batch.operations[i].item, user_id) for i in creates]
+        response = await supabase_executor.execute(supabase_admin.table("itineraries").insert(rows))
+        # PostgREST returns inserted rows in request order
+        for index, item in zip(creates, response.data or []):
+            results[index] = ItineraryBatchResult(index=index, op="create", id=item["id"], status="ok", item=_itinerary_from_row(item))
+
+    async def run_updates():
+        changes = [{"id": batch.operations[i].id, **_itinerary_changes(batch.operations[i].changes)} for i in updates]
+        # sql/06_create_batch_update_itineraries_function.sql
+        response = await supabase_executor.execute(
+            supabase_admin.rpc("batch_update_itineraries", {"p_user_id": user_id, "p_changes": changes})
+        )
+        updated = {str(item["id"]): item for item in response.data or []}
+        for index in updates:
+            item = updated.get(batch.operations[index].id)
+            results[index] = ItineraryBatchResult(
+                index=index, op="update", id=batch.operations[index].id,
+                status="ok" if item else "not_found",
+                item=_itinerary_from_row(item) if item else None
+            )
+
+    async def run_deletes():
+        ids = [batch.operations[i].id for i in deletes]
+        response = await supabase_executor.execute(
+            supabase_admin.table("itineraries").delete().in_("id", ids).eq("user_id", user_id)
+        )
+        deleted = {str(item["id"]) for item in response.data or []}
+        for index in deletes:
+            item_id = batch.operations[index].id
+            results[index] = ItineraryBatchResult(
+                index=index, op="delete", id=item_id,
+                status="ok" if item_id in deleted else "not_found"
+            )
+
+    # The kinds touch disjoint ids, so their statements can run concurrently
+    kinds = [(indexes, runner) for indexes, runner in ((creates, run_creates), (updates, run_updates), (deletes, run_deletes)) if indexes]
+    outcomes = await asyncio.gather(*(runner() for _, runner in kinds), return_exceptions=True)
+    if kinds:
+        itinerary_etags.invalidate(user_id)
+    for (indexes, _), outcome in zip(kinds, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Error in itinerary batch: {outcome}")
+            for index in indexes:
+                if results[index] is None:
+                    operation = batch.operations[index]
+                    results[index] = ItineraryBatchResult(index=index, op=operation.op, id=operation.id, status="error", error="Database error")
+
+    for index in creates:
+        if results[index] is None:
+            results[index] = ItineraryBatchResult(index=index, op="create", status="error", error="Row was not returned")
+
+    return ItineraryBatchResponse(results=results)
+
+async def _fetch_user_itinerary_rows(user_id: str, status_filter: Optional[str]) -> List[Dict[str, Any]]:
+    """A user's itinerary rows (up to ROUTE_MAX_STOPS), highest priority first"""
+    query = supabase_admin.table("itineraries").select("*").eq("user_id", user_id)
+    if status_filter:
+        query = query.eq("status", status_filter)
+    query = query.order("priority", desc=True).order("added_at").limit(ROUTE_MAX_STOPS)
+    response = await supabase_executor.execute(query)
+    return response.data or []
+
+@api_router.get("/itineraries/route", response_model=ItineraryRouteResponse)
+async def get_itinerary_route(
+    status_filter: Optional[str] = Query("planned", alias="status", pattern=ITINERARY_STATUS_PATTERN),
+    start_lat: Optional[float] = Query(None, ge=-90, le=90),
+    start_lon: Optional[float] = Query(None, ge=-180, le=180),
+    end_lat: Optional[float] = Query(None, ge=-90, le=90),
+    end_lon: Optional[float] = Query(None, ge=-180, le=180),
+    round_trip: bool = False,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Visiting order for the user's itinerary items that keeps travel distance short.
+    Optional start/end points (e.g. the hotel) are pinned; round_trip returns to the start.
+    """
+    if (start_lat is None) != (start_lon is None) or (end_lat is None) != (end_lon is None):
+        raise HTTPException(status_code=400, detail="Give both latitude and longitude for start and end points")
+    if round_trip and start_lat is None:
+        raise HTTPException(status_code=400, detail="round_trip requires a start point")
+
+    try:
+        rows = await _fetch_user_itinerary_rows(current_user["user_id"], status_filter)
+    except Exception as e:
+        logger.error(f"Error fetching itineraries for route: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching itineraries")
+
+    items = [_itinerary_from_row(row) for row in rows]
+    routed = [item for item in items if item.latitude is not None and item.longitude is not None]
+    unrouted = [item for item in items if item.latitude is None or item.longitude is None]
+
+    # Matrix nodes: the routed items, then the optional start and end points
+    points = [(item.destination_id, item.latitude, item.longitude) for item in routed]
+    start = end = None
+    if start_lat is not None:
+        start = len(points)
+        points.append((None, start_lat, start_lon))
+    if round_trip:
+        end = start
+    elif end_lat is not None:
+        end = len(points)
+        points.append((None, end_lat, end_lon))
+
+    distances, _ = distance_matrix.matrices(points)
+    order, total = optimize_route(distances, start, end)
+
+    stops = []
+    cumulative = 0.0
+    previous = None
+    for node in order:
+        leg = float(distances[previous, node]) if previous is not None else 0.0
+        cumulative += leg
+        previous = node
+        if node < len(routed):
+            stops.append(ItineraryRouteStop(
+                order=len(stops) + 1,
+                item=routed[node],
+                leg_distance_km=round(leg, 3),
+                cumulative_distance_km=round(cumulative, 3)
+            ))
+
+    return ItineraryRouteResponse(stops=stops, total_distance_km=round(total, 3), unrouted=unrouted)
+
+def _clock(minutes: float) -> str:
+    minutes = int(round(minutes))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+@api_router.get("/itineraries/schedule", response_model=ItineraryScheduleResponse)
+async def get_itinerary_schedule(
+    start_date: Optional[date] = None,
+    days: int = Query(3, ge=1, le=SCHEDULE_MAX_DAYS),
+    daily_hours: float = Query(8, gt=0, le=16),
+    day_start: str = Query("09:00", pattern="^([01][0-9]|2[0-3]):[0-5][0-9]$"),
+    base_lat: Optional[float] = Query(None, ge=-90, le=90),
+    base_lon: Optional[float] = Query(None, ge=-180, le=180),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Day-by-day plan for the user's planned itinerary items, computed locally.
+    Items with a visit_date stay on that day; the rest are packed by priority into
+    days of at most daily_hours of visits and travel, ordered to keep driving short.
+    An optional base (e.g. the hotel) is where every day starts and ends.
+    """
+    if (base_lat is None) != (base_lon is None):
+        raise HTTPException(status_code=400, detail="Give both base_lat and base_lon")
+    start_date = start_date or local_date(datetime.now().astimezone())
+
+    try:
+        rows = await _fetch_user_itinerary_rows(current_user["user_id"], "planned")
+    except Exception as e:
+        logger.error(f"Error fetching itineraries for schedule: {e}")
+        raise HTTPException(status_code=500, detail="Error fetching itineraries")
+
+    items = [_itinerary_from_row(row) for row in rows]
+    stops = [item for item in items if item.latitude is not None and item.longitude is not None]
+    unscheduled = [UnscheduledItem(item=item, reason="destination location is unknown") for item in items if item.latitude is None or item.longitude is None]
+
+    points = [(item.destination_id, item.latitude, item.longitude) for item in stops]
+    base = None
+    if base_lat is not None:
+        base = len(points)
+        points.append((None, base_lat, base_lon))
+    _, travel = distance_matrix.matrices(points)
+
+    durations = [visit_minutes(item.destination_type) for item in stops]
+    fixed_days = [(local_date(item.visit_date) - start_date).days if item.visit_date else None for item in stops]
+    budget = daily_hours * 60
+    plan, rejected = plan_days(travel, durations, [item.priority for item in stops], fixed_days, days, budget, base)
+    unscheduled += [UnscheduledItem(item=stops[stop], reason=reason) for stop, reason in rejected]
+
+    hour, minute = map(int, day_start.split(":"))
+    scheduled_days = []
+    for day, route in enumerate(plan):
+        clock = hour * 60 + minute
+        previous = base
+        day_stops = []
+        travel_total = 0.0
+        for stop in route:
+            leg = float(travel[previous, stop]) if previous is not None else 0.0
+            travel_total += leg
+            clock += leg
+            day_stops.append(ScheduledStop(
+                order=len(day_stops) + 1,
+                item=stops[stop],
+                start_time=_clock(clock),
+                end_time=_clock(clock + durations[stop]),
+                travel_minutes=round(leg, 1),
+                visit_minutes=durations[stop]
+            ))
+            clock += durations[stop]
+            previous = stop
+        if base is not None and route:
+            travel_total += float(travel[previous, base])
+        visit_total = sum(durations[stop] for stop in route)
+        scheduled_days.append(ScheduledDay(
+            day=day + 1,
+            visit_date=start_date + timedelta(days=day),
+            stops=day_stops,
+            visit_minutes=visit_total,
+            travel_minutes=round(travel_total, 1),
+            total_minutes=round(visit_total + travel_total, 1),
+            over_budget=visit_total + travel_total > budget
+        ))
+
+    return ItineraryScheduleResponse(days=scheduled_days, unscheduled=unscheduled)
+
+# Destination Routes
+def _sync_destination_indexes(changed: Set[str], removed: Set[str]):
+    """Apply catalog changes to the spatial and search indexes"""
+    for destination_id in removed:
+        destination_index.remove(destination_id)
+        destination_search.remove(destination_id)
+    for destination_id in changed:
+        destination = destination_catalog.get(destination_id)
+        if destination is not None:
+            destination_index.upsert(destination_id, destination.latitude, destination.longitude, destination.category)
+            destination_search.upsert(destination_id, destination.model_dump())
+
+destination_catalog.add_listener(_sync_destination_indexes)
+# Recommendation features are rebuilt as a whole; one vectorized pass is cheap next to a catalog refresh
+destination_catalog.add_listener(lambda changed, removed: recommender.rebuild(destination_catalog.all(), destination_catalog.version))
+# The shared distance matrix is rebuilt off the event loop; only added or moved destinations are recomputed
+destination_catalog.add_listener(lambda changed, removed: distance_matrix.schedule_sync(
+    {d.id: (d.latitude, d.longitude) for d in destination_catalog.all()}
+))
+
+def _parse_categories(category: Optional[str]) -> Optional[Set[str]]:
+    """Comma separated categories, matched case-insensitively"""
+    if not category:
+        return None
+    categories = {value.strip().lower() for value in category.split(",") if value.strip()}
+    return categories or None
+
+def _category_filter(categories: Optional[Set[str]]) -> Optional[Callable[[str], bool]]:
+    """Predicate accepting catalog destination ids in the given categories (None: accept all)"""
+    if not categories:
+        return None
+    def accept(destination_id: str) -> bool:
+        destination = destination_catalog.get(destination_id)
+        return destination is not None and (destination.category or "").lower() in categories
+    return accept
+
+@api_router.get("/destinations/nearby", response_model=List[NearbyDestinationResponse])
+async def get_nearby_destinations(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    limit: int = Query(20, ge=1, le=NEARBY_MAX_RESULTS),
+    category: Optional[str] = None
+):
+    """
+    Active destinations near a point, nearest first, from the in-memory spatial index.
+    With radius_km: every destination within the radius (up to limit); without it: the limit nearest.
+    """
+    categories = _parse_categories(category)
+    if radius_km is not None:
+        matches = destination_index.within(lat, lon, radius_km, categories, limit)
+    else:
+        matches = destination_index.nearest(lat, lon, limit, categories)
+
+    results = []
+    for distance, destination_id in matches:
+        destination = destination_catalog.get(destination_id)
+        if destination is not None:
+            results.append(NearbyDestinationResponse(**destination.model_dump(), distance_km=round(distance, 3)))
+    return results
+
+@api_router.get("/destinations/search", response_model=List[DestinationSearchResult])
+async def search_destinations(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=SEARCH_MAX_RESULTS),
+    category: Optional[str] = None
+):
+    """
+    Search active destinations by English or Arabic name, category and description, best match first.
+    The last word is matched as a prefix, so the endpoint can back search-as-you-type.
+    """
+    results = []
+    for score, destination_id in destination_search.search(q, limit, accept=_category_filter(_parse_categories(category))):
+        destination = destination_catalog.get(destination_id)
+        if destination is not None:
+            results.append(DestinationSearchResult(**destination.model_dump(), score=round(score, 4)))
+    return results
+
+async def _recommend(
+    preferences: Dict[str, Any],
+    user_id: Optional[str],
+    limit: int,
+    location: Optional[Tuple[float, float]] = None,
+    categories: Optional[Set[str]] = None
+) -> List[DestinationRecommendation]:
+    """Recommendations for the preferences, skipping destinations already on the user's itinerary"""
+    preferences = preferences or {}
+    exclude, planned = set(), []
+    if user_id:
+        for row in await _fetch_user_itinerary_rows(user_id, None):
+            if row.get("status") == "cancelled":
+                continue
+            exclude.add(str(row.get("destination_id")))
+            destination = destination_catalog.get(row.get("destination_id"))
+            if destination is not None:
+                planned.append((destination.category, destination.latitude, destination.longitude))
+            else:
+                planned.append((row.get("destination_type"), None, None))
+
+    results = []
+    for destination_id, score, reasons in recommender.recommend(preferences, exclude, planned, location, categories, limit):
+        destination = destination_catalog.get(destination_id)
+        if destination is not None:
+            results.append(DestinationRecommendation(**destination.model_dump(), score=round(score, 4), reasons=reasons))
+    return results
+
+@api_router.get("/recommendations", response_model=List[DestinationRecommendation])
+async def get_recommendations(
+    limit: int = Query(10, ge=1, le=RECOMMEND_MAX_RESULTS),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    category: Optional[str] = None,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Destinations ranked for the user's profile preferences (interests, budget, travelsWith),
+    computed in-process. Destinations already on the itinerary are left out, and the
+    itinerary (and lat/lon, when given) pull the ranking towards similar and nearby places.
+    """
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="Give both lat and lon")
+    location = (lat, lon) if lat is not None else None
+
+    try:
+        preferences = await profile_cache.get_preferences(current_user["user_id"], dict(DEFAULT_PREFERENCES))
+        return await _recommend(preferences, current_user["user_id"], limit, location, _parse_categories(category))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing recommendations: {e}")
+        raise HTTPException(status_code=500, detail="Error computing recommendations")
+
+# n8n Webhooks
+WEBHOOKS = {
+    "weather": {
+        "path": "Simple-Weather-API-Live-Data",
+        "timeout": 10.0,
+        "max_concurrent": int(os.getenv("BULKHEAD_WEATHER_MAX_CONCURRENT", "20")),
+        "max_queue": int(os.getenv("BULKHEAD_WEATHER_MAX_QUEUE", "50")),
+    },
+    "chat": {
+        "path": "gemini-tour-chat",
+        "timeout": 30.0,
+        "max_concurrent": int(os.getenv("BULKHEAD_CHAT_MAX_CONCURRENT", "30")),
+        "max_queue": int(os.getenv("BULKHEAD_CHAT_MAX_QUEUE", "30")),
+    },
+    "planner": {
+        "path": "Smart-Itinerary-Planner",
+        "timeout": 30.0,
+        "max_concurrent": int(os.getenv("BULKHEAD_PLANNER_MAX_CONCURRENT", "10")),
+        "max_queue": int(os.getenv("BULKHEAD_PLANNER_MAX_QUEUE", "20")),
+    },
+}
+
+circuit_breakers = {
+    name: CircuitBreaker(name, slow_call_seconds=webhook["timeout"] * CIRCUIT_SLOW_CALL_RATIO)
+    for name, webhook in WEBHOOKS.items()
+}
+
+# Separate concurrency limits keep a slow upstream from starving the others
+bulkheads = {
+    name: Bulkhead(name, webhook["max_concurrent"], webhook["max_queue"])
+    for name, webhook in WEBHOOKS.items()
+}
+
+async def _post_webhook(name: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    POST to an n8n webhook through its circuit breaker and bulkhead.
+    Returns the JSON body, or None when the call failed, the circuit is open
+    or the bulkhead is full.
+    """
+    webhook = WEBHOOKS[name]
+    breaker = circuit_breakers[name]
+    if not breaker.allow_request():
+        logger.debug(f"Circuit '{name}' is open, skipping webhook call")
+        return None
+
+    try:
+        async with bulkheads[name].acquire():
+            started = time.perf_counter()
+            client = http_clients.get("n8n")
+            response = await client.post(
+                f"{N8N_WEBHOOK_BASE_URL}/{webhook['path']}",
+                json=payload,
+                timeout=webhook["timeout"]
+            )
+            elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            logger.warning(f"Webhook '{name}' returned {response.status_code}")
+            breaker.record_failure()
+            return None
+        data = response.json()
+    except BulkheadFullError as e:
+        # Rejected locally: not a sign of upstream failure
+        logger.warning(str(e))
+        breaker.release_probe()
+        return None
+    except asyncio.CancelledError:
+        breaker.release_probe()
+        raise
+    except Exception as e:
+        logger.error(f"Error calling webhook '{name}': {e}")
+        breaker.record_failure()
+        return None
+
+    breaker.record_success(elapsed)
+    return data
+
 # Weather Data Routes
+def _weather_fallback(lang: str) -> Dict[str, Any]:
+    return {
+        "temperature": 25,
+        "cityName": "Amman",
+        "description": "Clear sky" if lang == "en" else "سماء صافية",
+        "humidity": 50,
+        "wind_speed": 5,
+        "source": "fallback"
+    }
+
+async def _fetch_weather(lat: float, lon: float, lang: str) -> Optional[Dict[str, Any]]:
+    """Call the weather webhook, returning None when it does not answer"""
+    return await _post_webhook("weather", {
+        "lat": lat,
+        "lon": lon,
+        "cityName": "User Location",
+        "lang": lang
+    })
+
+async def _weather_prefetch_locations() -> List[tuple]:
+    """Locations kept warm in the weather cache"""
+    if WEATHER_PREFETCH_SOURCE == "destinations":
+        if len(destination_catalog):
+            return [(d.name, d.latitude, d.longitude) for d in destination_catalog.all()]
+        try:
+            response = await supabase_executor.execute(
+                supabase_admin.table("destinations").select("name,latitude,longitude").eq("is_active", True)
+            )
+            if response.data:
+                return [(row["name"], row["latitude"], row["longitude"]) for row in response.data]
+        except Exception as e:
+            logger.error(f"Error loading destinations for weather prefetch: {e}")
+    return WEATHER_PREFETCH_LOCATIONS
+
+weather_prefetcher = WeatherPrefetcher(
+    weather_cache,
+    _fetch_weather,
+    _weather_prefetch_locations,
+    WEATHER_PREFETCH_INTERVAL_SECONDS,
+    WEATHER_PREFETCH_LANGS,
+    WEATHER_PREFETCH_CONCURRENCY,
+)
+
 @api_router.get("/weather/current")
 async def get_current_weather(
+    response: Response,
     lat: float = 31.9539,
     lon: float = 35.9106,
     lang: str = "en"
 ):
     """Get current weather data"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{N8N_WEBHOOK_BASE_URL}/Simple-Weather-API-Live-Data",
-                json={
-                    "lat": lat,
-                    "lon": lon,
-                    "cityName": "User Location",
-                    "lang": lang
-                },
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                # Return fallback data
-                return {
-                    "temperature": 25,
-                    "cityName": "Amman",
-                    "description": "Clear sky" if lang == "en" else "سماء صافية",
-                    "humidity": 50,
-                    "wind_speed": 5,
-                    "source": "fallback"
-                }
-                
+        weather, cache_status = await weather_cache.get(lat, lon, lang, _fetch_weather)
+        response.headers["X-Cache"] = cache_status
+        if weather is not None:
+            return weather
+        # Return fallback data
+        return _weather_fallback(lang)
+
     except Exception as e:
         logger.error(f"Error fetching weather data: {e}")
-        return {
-            "temperature": 25,
-            "cityName": "Amman", 
-            "description": "Clear sky" if lang == "en" else "سماء صافية",
-            "humidity": 50,
-            "wind_speed": 5,
-            "source": "fallback"
-        }
+        return _weather_fallback(lang)
 
 # Chat/AI Routes
+CHAT_FALLBACK_RESPONSE = {
+    "reply": "I'm sorry, I'm having trouble processing your request right now. Please try again later.",
+    "status": "error"
+}
+
+async def _chat_payload(message: str, current_user: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the gemini-tour-chat webhook payload, including the user's preferences if authenticated"""
+    preferences = {}
+    if current_user:
+        try:
+            preferences = await profile_cache.get_preferences(current_user["user_id"])
+        except:
+            pass
+
+    return {
+        "message": message,
+        "sessionId": f"session_{datetime.utcnow().timestamp()}",
+        "preferences": preferences,
+        "language": "en",
+        "location": None,
+        "liveData": None
+    }
+
 @api_router.post("/chat/message")
 async def send_chat_message(
     message: str,
@@ -468,103 +1188,241 @@ async def send_chat_message(
 ):
     """Send message to AI chatbot"""
     try:
-        # Get user preferences if authenticated
-        preferences = {}
-        if current_user:
-            try:
-                profile_response = supabase_admin.table("profiles").select("preferences").eq("id", current_user["user_id"]).execute()
-                if profile_response.data:
-                    preferences = profile_response.data[0].get("preferences", {})
-            except:
-                pass
-        
-        session_id = f"session_{datetime.utcnow().timestamp()}"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{N8N_WEBHOOK_BASE_URL}/gemini-tour-chat",
-                json={
-                    "message": message,
-                    "sessionId": session_id,
-                    "preferences": preferences,
-                    "language": "en",
-                    "location": None,
-                    "liveData": None
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return {
-                    "reply": "I'm sorry, I'm having trouble processing your request right now. Please try again later.",
-                    "status": "error"
-                }
+        reply = await _post_webhook("chat", await _chat_payload(message, current_user))
+        return reply if reply is not None else dict(CHAT_FALLBACK_RESPONSE)
                 
     except Exception as e:
         logger.error(f"Error processing chat message: {e}")
-        return {
-            "reply": "I'm sorry, I'm having trouble processing your request right now. Please try again later.",
-            "status": "error"
+        return dict(CHAT_FALLBACK_RESPONSE)
+
+def _sse_event(data: str, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event; multi-line data is split over several data: fields"""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+async def _stream_chat_reply(request: Request, payload: Dict[str, Any]):
+    """
+    Relay the chat webhook response to the client as SSE chunks as soon as they arrive.
+
+    Upstream bytes are only read after the previous event has been sent, so a
+    slow client applies backpressure all the way to the n8n connection. When
+    the client disconnects the upstream request is closed.
+    """
+    breaker = circuit_breakers["chat"]
+    if not breaker.allow_request():
+        yield _sse_event(CHAT_FALLBACK_RESPONSE["reply"], "fallback")
+        yield _sse_event("", "done")
+        return
+
+    webhook = WEBHOOKS["chat"]
+    first_chunk_after = None
+    recorded = False
+    try:
+        async with bulkheads["chat"].acquire():
+            started = time.perf_counter()
+            client = http_clients.get("n8n")
+            async with client.stream(
+                "POST",
+                f"{N8N_WEBHOOK_BASE_URL}/{webhook['path']}",
+                json=payload,
+                timeout=webhook["timeout"]
+            ) as upstream:
+                if upstream.status_code != 200:
+                    logger.warning(f"Webhook 'chat' returned {upstream.status_code}")
+                    breaker.record_failure()
+                    recorded = True
+                    yield _sse_event(CHAT_FALLBACK_RESPONSE["reply"], "fallback")
+                    yield _sse_event("", "done")
+                    return
+
+                async for chunk in upstream.aiter_text():
+                    if await request.is_disconnected():
+                        logger.info("Chat stream client disconnected, closing upstream")
+                        return
+                    if not chunk:
+                        continue
+                    if first_chunk_after is None:
+                        first_chunk_after = time.perf_counter() - started
+                    yield _sse_event(chunk, "chunk")
+            total = time.perf_counter() - started
+
+        # Streams are judged by time to first chunk, not by total generation time
+        breaker.record_success(first_chunk_after if first_chunk_after is not None else total)
+        recorded = True
+        yield _sse_event("", "done")
+
+    except BulkheadFullError as e:
+        logger.warning(str(e))
+        yield _sse_event(CHAT_FALLBACK_RESPONSE["reply"], "fallback")
+        yield _sse_event("", "done")
+    except Exception as e:
+        logger.error(f"Error streaming chat message: {e}")
+        if not recorded:
+            breaker.record_failure()
+            recorded = True
+        event = "fallback" if first_chunk_after is None else "error"
+        yield _sse_event(CHAT_FALLBACK_RESPONSE["reply"], event)
+        yield _sse_event("", "done")
+    finally:
+        # Client disconnects and cancellations end the stream without a verdict from the normal paths
+        if not recorded:
+            if first_chunk_after is not None:
+                # The upstream was answering; the client simply went away
+                breaker.record_success(first_chunk_after)
+            else:
+                breaker.release_probe()
+
+@api_router.post("/chat/stream")
+async def stream_chat_message(
+    request: Request,
+    message: str,
+    current_user: Optional[Dict[str, Any]] = Depends(get_optional_user)
+):
+    """Send message to AI chatbot and stream the reply as Server-Sent Events (chunk, fallback, error, done)"""
+    payload = await _chat_payload(message, current_user)
+    return StreamingResponse(
+        _stream_chat_reply(request, payload),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
         }
+    )
 
 # Smart Itinerary Routes
+ITINERARY_FALLBACK_RESPONSE = {
+    "tripPlan": {
+        "details": "Suggested Jordan Travel Plan:\n\n🌅 Day 1: Visit Downtown Amman, Explore Amman Citadel, Dinner at Rainbow Street\n\n🏛️ Day 2: Trip to Jerash Roman ruins, Visit Ajloun Castle\n\n🏖️ Day 3: Dead Sea excursion, Natural mud therapy\n\n💎 Day 4: Travel to Petra, Explore the Rose City\n\n🌵 Day 5: Wadi Rum desert adventure"
+    },
+    "crowdLevel": 45,
+    "planModified": "false",
+    "source": "fallback"
+}
+
+# Planner results depend only on preferences, language and location, so users share entries
+suggestion_cache = TTLCache("itinerary_suggestions", max_size=ITINERARY_CACHE_MAX_SIZE, ttl=ITINERARY_CACHE_TTL_SECONDS)
+
+def _normalize_preferences(preferences: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical form of preferences: defaults filled in, strings lower-cased, lists sorted and de-duplicated"""
+    normalized = {}
+    for key, value in {**DEFAULT_PREFERENCES, **(preferences or {})}.items():
+        if isinstance(value, str):
+            value = value.strip().lower()
+        elif isinstance(value, (list, tuple, set)):
+            value = sorted({str(v).strip().lower() for v in value if str(v).strip()})
+        normalized[key] = value
+    return normalized
+
+def _suggestion_cache_key(preferences: Dict[str, Any], language: str, location: Dict[str, float]) -> str:
+    canonical = json.dumps({
+        "preferences": _normalize_preferences(preferences),
+        "language": language,
+        "location": [round(location["lat"], 2), round(location["lon"], 2)],
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+async def _local_itinerary_plan(
+    preferences: Dict[str, Any],
+    user_id: Optional[str],
+    language: str,
+    location: Dict[str, float]
+) -> Optional[Dict[str, Any]]:
+    """
+    Plan built in-process from recommendations, in the planner's response shape.
+    The picks are ordered into a short drive from the location and split into days.
+    Returns None when the catalog is not loaded.
+    """
+    if not len(recommender):
+        return None
+    picks = await _recommend(
+        preferences, user_id, PLANNER_LOCAL_DAYS * PLANNER_LOCAL_STOPS_PER_DAY, (location["lat"], location["lon"])
+    )
+    if not picks:
+        return None
+
+    points = [(pick.id, pick.latitude, pick.longitude) for pick in picks] + [(None, location["lat"], location["lon"])]
+    distances, _ = distance_matrix.matrices(points)
+    order, _ = optimize_route(distances, start=len(picks))
+    ordered = [picks[node] for node in order if node < len(picks)]
+
+    days = []
+    lines = []
+    for start in range(0, len(ordered), PLANNER_LOCAL_STOPS_PER_DAY):
+        stops = ordered[start:start + PLANNER_LOCAL_STOPS_PER_DAY]
+        names = [(stop.name_ar or stop.name) if language == "ar" else stop.name for stop in stops]
+        days.append({"day": len(days) + 1, "destinations": [stop.id for stop in stops]})
+        lines.append(f"{destination_icon(stops[0].category)} Day {len(days)}: {', '.join(names)}")
+
+    return {
+        "tripPlan": {
+            "details": "Suggested Jordan Travel Plan:\n\n" + "\n\n".join(lines),
+            "days": days
+        },
+        "recommendations": jsonable_encoder(picks),
+        "crowdLevel": ITINERARY_FALLBACK_RESPONSE["crowdLevel"],
+        "planModified": "false",
+        "source": "local"
+    }
+
 @api_router.post("/itinerary/suggest")
 async def suggest_itinerary(
+    response: Response,
+    refresh: bool = False,
+    mode: str = Query("auto", pattern="^(auto|webhook|local)$"),
     current_user: Optional[Dict[str, Any]] = Depends(get_optional_user)
 ):
-    """Get AI-suggested itinerary based on user preferences"""
+    """
+    Get a suggested itinerary based on user preferences (refresh=true bypasses the cache).
+    mode=webhook asks the AI planner, mode=local builds the plan in-process from
+    recommendations, and mode=auto (default) asks the planner and falls back to the local plan.
+    """
+    user_id = current_user["user_id"] if current_user else None
+    preferences = dict(DEFAULT_PREFERENCES)
+    language = "en"
+    location = {"lat": 31.9539, "lon": 35.9106}
     try:
         # Get user preferences if authenticated
-        preferences = {"interests": [], "budget": "medium", "travelsWith": "Solo"}
-        user_data = None
-        
         if current_user:
             try:
-                profile_response = supabase_admin.table("profiles").select("preferences").eq("id", current_user["user_id"]).execute()
-                if profile_response.data:
-                    preferences = profile_response.data[0].get("preferences", preferences)
-                user_data = {"email": current_user["email"]}
+                preferences = await profile_cache.get_preferences(user_id, preferences)
             except:
                 pass
+
+        if mode == "local":
+            return await _local_itinerary_plan(preferences, user_id, language, location) or copy.deepcopy(ITINERARY_FALLBACK_RESPONSE)
+
+        cache_key = _suggestion_cache_key(preferences, language, location)
+        if not refresh:
+            cached_plan = suggestion_cache.get(cache_key)
+            if cached_plan is not MISSING:
+                response.headers["X-Cache"] = "HIT"
+                return cached_plan
+        response.headers["X-Cache"] = "MISS"
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{N8N_WEBHOOK_BASE_URL}/Smart-Itinerary-Planner",
-                json={
-                    "preferences": preferences,
-                    "user": user_data,
-                    "language": "en",
-                    "location": {"lat": 31.9539, "lon": 35.9106},
-                    "liveData": None
-                },
-                timeout=30.0
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                # Return fallback itinerary
-                return {
-                    "tripPlan": {
-                        "details": "Suggested Jordan Travel Plan:\n\n🌅 Day 1: Visit Downtown Amman, Explore Amman Citadel, Dinner at Rainbow Street\n\n🏛️ Day 2: Trip to Jerash Roman ruins, Visit Ajloun Castle\n\n🏖️ Day 3: Dead Sea excursion, Natural mud therapy\n\n💎 Day 4: Travel to Petra, Explore the Rose City\n\n🌵 Day 5: Wadi Rum desert adventure"
-                    },
-                    "crowdLevel": 45,
-                    "planModified": "false",
-                    "source": "fallback"
-                }
-                
+        plan = await _post_webhook("planner", {
+            "preferences": preferences,
+            # Plans are cached per preferences and shared between users, so nothing user-specific is sent
+            "user": None,
+            "language": language,
+            "location": location,
+            "liveData": None
+        })
+        if plan is not None:
+            suggestion_cache.set(cache_key, plan)
+            return plan
     except Exception as e:
         logger.error(f"Error generating suggested itinerary: {e}")
-        return {
-            "tripPlan": {
-                "details": "Suggested Jordan Travel Plan:\n\n🌅 Day 1: Visit Downtown Amman, Explore Amman Citadel, Dinner at Rainbow Street\n\n🏛️ Day 2: Trip to Jerash Roman ruins, Visit Ajloun Castle\n\n🏖️ Day 3: Dead Sea excursion, Natural mud therapy\n\n💎 Day 4: Travel to Petra, Explore the Rose City\n\n🌵 Day 5: Wadi Rum desert adventure"
-            },
-            "crowdLevel": 45,
-            "planModified": "false",
-            "source": "fallback"
-        }
+
+    # Planner unavailable: a personalised local plan, or the static plan if that fails too
+    if mode == "auto":
+        try:
+            plan = await _local_itinerary_plan(preferences, user_id, language, location)
+            if plan is not None:
+                return plan
+        except Exception as e:
+            logger.error(f"Error building local itinerary: {e}")
+    return copy.deepcopy(ITINERARY_FALLBACK_RESPONSE)
 
 # WebSocket Route for Real-time Features
 @app.websocket("/ws/{client_id}")
@@ -0,0 +1,88 @@
+import os
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# The supabase-py client is synchronous; its calls run on a dedicated, bounded pool
+SUPABASE_MAX_WORKERS = int(os.getenv("SUPABASE_MAX_WORKERS", "16"))
+SUPABASE_MAX_PENDING = int(os.getenv("SUPABASE_MAX_PENDING", "200"))
+
+class SupabaseBusyError(Exception):
+    """Raised when the Supabase pool already has its maximum number of pending calls"""
+    pass
+
+class BlockingCallExecutor:
+    """
+    Runs blocking client calls on a private thread pool so they never stall the event loop.
+
+    At most max_workers calls run at once and at most max_pending more wait for a
+    thread; anything beyond that is rejected immediately with SupabaseBusyError
+    instead of growing an unbounded queue.
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        if self.in_flight >= self.max_workers + self.max_pending:
+            self.rejected += 1
+            raise SupabaseBusyError(f"{self.name} pool is saturated ({self.in_flight} calls in flight)")
+
+        loop = asyncio.get_running_loop()
+        self.in_flight += 1
+        started = time.perf_counter()
+        future = self._executor.submit(partial(func, *args, **kwargs))
+        # Bookkeeping follows the thread, not the caller: a cancelled await leaves the call running
+        future.add_done_callback(lambda done: self._call_on_loop(loop, self._finished, done, started))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    @staticmethod
+    def _call_on_loop(loop: asyncio.AbstractEventLoop, callback: Callable, *args):
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # The loop is already closed (shutdown); run the bookkeeping in place
+            callback(*args)
+
+    def _finished(self, future, started: float):
+        self.in_flight -= 1
+        self.total_seconds += time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    async def execute(self, query) -> Any:
+        """Execute a postgrest query builder, e.g. supabase_admin.table("profiles").select("*")"""
+        return await self.run(query.execute)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"{self.name} executor shut down")
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.total_seconds * 1000 / finished, 2) if finished else 0.0,
+        }
+
+supabase_executor = BlockingCallExecutor("supabase", SUPABASE_MAX_WORKERS, SUPABASE_MAX_PENDING)
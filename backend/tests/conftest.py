@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules import each other as top-level modules (e.g. "from cache import TTLCache")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# auth.py builds its Supabase clients at import time; the tests never reach them over the network
+os.environ.setdefault("SUPABASE_URL", "https://test-project.supabase.co")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test-anon-key")
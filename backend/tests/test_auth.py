@@ -0,0 +1,292 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+from auth import SupabaseJWTVerifier, TokenRejected
+from supabase_executor import SupabaseBusyError
+
+SECRET = "test-supabase-jwt-secret-of-32-bytes!"
+API_SECRET = "test-api-jwt-secret-key-of-32-bytes!"
+AUDIENCE = "authenticated"
+JWKS_URL = "https://test-project.supabase.co/auth/v1/.well-known/jwks.json"
+
+EC_KEY = ec.generate_private_key(ec.SECP256R1())
+OTHER_EC_KEY = ec.generate_private_key(ec.SECP256R1())
+
+def _jwk(private_key, kid: str) -> dict:
+    jwk = json.loads(jwt.algorithms.ECAlgorithm.to_jwk(private_key.public_key()))
+    return {**jwk, "kid": kid, "alg": "ES256", "use": "sig"}
+
+def _claims(**overrides) -> dict:
+    claims = {"sub": "user-1", "email": "user@example.com", "role": "authenticated", "aud": AUDIENCE, "exp": int(time.time()) + 3600}
+    claims.update(overrides)
+    return {key: value for key, value in claims.items() if value is not None}
+
+def hs256_token(secret: str = SECRET, **claims) -> str:
+    return jwt.encode(_claims(**claims), secret, algorithm="HS256")
+
+def es256_token(private_key=EC_KEY, kid: str = "key-1", **claims) -> str:
+    return jwt.encode(_claims(**claims), private_key, algorithm="ES256", headers={"kid": kid})
+
+class FakeJWKSClient:
+    """Stands in for httpx.AsyncClient and serves a JWKS document"""
+    fetches = 0
+    keys = [_jwk(EC_KEY, "key-1")]
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, url, headers=None):
+        assert url == JWKS_URL
+        FakeJWKSClient.fetches += 1
+        return SimpleNamespace(raise_for_status=lambda: None, json=lambda: {"keys": FakeJWKSClient.keys})
+
+class FakeExecutor:
+    """Stands in for supabase_executor; answers Supabase Auth get_user calls"""
+
+    def __init__(self, user=None, error: Exception = None):
+        self.user = user
+        self.error = error
+        self.calls = 0
+
+    async def run(self, fn, *args, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(user=self.user)
+
+class RemoteAuthError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"Supabase Auth answered {status}")
+        self.status = status
+
+REMOTE_USER = SimpleNamespace(id="remote-user", email="remote@example.com")
+
+@pytest.fixture
+def verifier(monkeypatch):
+    FakeJWKSClient.fetches = 0
+    FakeJWKSClient.keys = [_jwk(EC_KEY, "key-1")]
+    monkeypatch.setattr(auth.httpx, "AsyncClient", FakeJWKSClient)
+    verifier = SupabaseJWTVerifier(SECRET, JWKS_URL, AUDIENCE)
+    asyncio.run(verifier.refresh_keys())
+    monkeypatch.setattr(auth, "jwt_verifier", verifier)
+    monkeypatch.setattr(auth, "AUTH_VERIFY_MODE", "local")
+    monkeypatch.setattr(auth, "AUTH_REMOTE_FALLBACK", False)
+    monkeypatch.setattr(auth, "JWT_SECRET_KEY", API_SECRET)
+    return verifier
+
+@pytest.fixture
+def remote(monkeypatch):
+    executor = FakeExecutor(user=REMOTE_USER)
+    monkeypatch.setattr(auth, "supabase_executor", executor)
+    return executor
+
+def verify(token: str) -> dict:
+    return asyncio.run(auth._verify_token(token))
+
+def test_hs256_token_is_verified_with_the_secret(verifier, remote):
+    assert verify(hs256_token()) == {"user_id": "user-1", "email": "user@example.com", "role": "authenticated", "user": None}
+    assert remote.calls == 0
+
+def test_es256_token_is_verified_with_the_jwks_key(verifier, remote):
+    assert verify(es256_token())["user_id"] == "user-1"
+    assert FakeJWKSClient.fetches == 1
+    assert remote.calls == 0
+
+@pytest.mark.parametrize("token", [
+    hs256_token(secret="some-other-secret-of-32-bytes-long!!"),
+    es256_token(private_key=OTHER_EC_KEY),
+    hs256_token(aud="anon"),
+    hs256_token(exp=None),
+    "not-a-jwt",
+], ids=["hs256-signature", "es256-signature", "audience", "no-exp", "malformed"])
+def test_definitely_invalid_tokens_are_rejected(verifier, remote, token):
+    with pytest.raises(TokenRejected) as error:
+        verify(token)
+    assert error.value.status_code == 401
+    assert remote.calls == 0
+
+def test_expired_token_is_rejected_even_with_fallback(verifier, remote, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_REMOTE_FALLBACK", True)
+    with pytest.raises(TokenRejected) as error:
+        verify(hs256_token(exp=int(time.time()) - 3600))
+    assert error.value.detail == "Token expired"
+    assert remote.calls == 0
+
+def test_expiry_within_leeway_is_accepted(verifier, remote):
+    assert verify(hs256_token(exp=int(time.time()) - 2))["user_id"] == "user-1"
+
+def test_unknown_kid_refreshes_the_jwks_once_then_picks_up_rotated_keys(verifier, remote, monkeypatch):
+    monkeypatch.setattr(auth, "SUPABASE_JWKS_MIN_REFRESH_SECONDS", 30)
+    token = es256_token(private_key=OTHER_EC_KEY, kid="key-2")
+    # The refresh right after startup is rate limited, so the key stays unknown
+    with pytest.raises(HTTPException) as error:
+        verify(token)
+    assert not isinstance(error.value, TokenRejected)
+    assert FakeJWKSClient.fetches == 1
+
+    # Once the interval has passed, an unknown kid triggers a refresh that finds the rotated key
+    FakeJWKSClient.keys = [_jwk(EC_KEY, "key-1"), _jwk(OTHER_EC_KEY, "key-2")]
+    verifier.last_refresh -= 31
+    assert verify(token)["user_id"] == "user-1"
+    assert FakeJWKSClient.fetches == 2
+
+def test_hs256_without_secret_is_not_a_definite_rejection(verifier, remote):
+    verifier.secret = None
+    with pytest.raises(HTTPException) as error:
+        verify(hs256_token())
+    assert not isinstance(error.value, TokenRejected)
+    assert remote.calls == 0
+
+def test_fallback_on_asks_supabase_auth(verifier, remote, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_REMOTE_FALLBACK", True)
+    verifier.secret = None
+
+    result = verify(hs256_token())
+    assert result["user_id"] == "remote-user"
+    assert result["user"] is REMOTE_USER
+    assert remote.calls == 1
+
+def test_fallback_rejection_by_supabase_auth_is_definite(verifier, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_REMOTE_FALLBACK", True)
+    monkeypatch.setattr(auth, "supabase_executor", FakeExecutor(error=RemoteAuthError(401)))
+    with pytest.raises(TokenRejected):
+        verify(hs256_token(secret="some-other-secret-of-32-bytes-long!!"))
+
+def test_fallback_outage_is_not_a_definite_rejection(verifier, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_REMOTE_FALLBACK", True)
+    monkeypatch.setattr(auth, "supabase_executor", FakeExecutor(error=ConnectionError("Supabase Auth unreachable")))
+    with pytest.raises(HTTPException) as error:
+        verify(hs256_token(secret="some-other-secret-of-32-bytes-long!!"))
+    assert error.value.status_code == 401
+    assert not isinstance(error.value, TokenRejected)
+
+def test_legacy_api_tokens_are_accepted_without_fallback(verifier, remote):
+    token = auth.auth_handler.encode_token("legacy-user", "legacy@example.com")
+    result = verify(token)
+    assert result == {"user_id": "legacy-user", "email": "legacy@example.com", "user": None}
+    assert remote.calls == 0
+
+def test_legacy_api_tokens_are_accepted_through_fallback(verifier, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_REMOTE_FALLBACK", True)
+    monkeypatch.setattr(auth, "supabase_executor", FakeExecutor(error=RemoteAuthError(401)))
+    token = auth.auth_handler.encode_token("legacy-user", "legacy@example.com")
+    assert verify(token)["user_id"] == "legacy-user"
+
+def test_remote_mode_always_asks_supabase_auth(verifier, remote, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_VERIFY_MODE", "remote")
+    assert verify(hs256_token())["user_id"] == "remote-user"
+    assert remote.calls == 1
+
+@pytest.fixture
+def caches():
+    auth.token_cache.clear()
+    auth.invalid_token_cache.clear()
+    yield auth.token_cache, auth.invalid_token_cache
+    auth.token_cache.clear()
+    auth.invalid_token_cache.clear()
+
+def verify_cached(token: str) -> dict:
+    return asyncio.run(auth.verify_supabase_token(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+def _ttl(cache, token: str) -> float:
+    _, expires_at = cache._entries[auth._token_key(token)]
+    return expires_at - time.monotonic()
+
+def test_verified_tokens_are_cached_by_hash(verifier, remote, caches, monkeypatch):
+    token_cache, _ = caches
+    calls = []
+    verify_token = auth._verify_token
+
+    async def counting_verify(token):
+        calls.append(token)
+        return await verify_token(token)
+
+    monkeypatch.setattr(auth, "_verify_token", counting_verify)
+    token = hs256_token()
+    first = verify_cached(token)
+    assert verify_cached(token) == first
+    assert len(calls) == 1
+    assert token not in token_cache._entries
+    assert auth._token_key(token) in token_cache._entries
+
+def test_cache_entry_never_outlives_the_token(verifier, remote, caches, monkeypatch):
+    token_cache, _ = caches
+    monkeypatch.setattr(auth, "AUTH_CACHE_TTL_SECONDS", 300)
+    soon = hs256_token(exp=int(time.time()) + 60)
+    later = hs256_token(exp=int(time.time()) + 3600)
+    verify_cached(soon)
+    verify_cached(later)
+
+    assert 55 < _ttl(token_cache, soon) <= 60
+    assert 295 < _ttl(token_cache, later) <= 300
+
+def test_token_inside_the_leeway_is_not_cached(verifier, remote, caches):
+    token_cache, _ = caches
+    token = hs256_token(exp=int(time.time()) - 2)
+    assert verify_cached(token)["user_id"] == "user-1"
+    assert len(token_cache) == 0
+
+def test_definite_rejections_are_negative_cached(verifier, remote, caches, monkeypatch):
+    _, invalid_token_cache = caches
+    token = hs256_token(exp=int(time.time()) - 3600)
+    with pytest.raises(TokenRejected):
+        verify_cached(token)
+    assert auth._token_key(token) in invalid_token_cache._entries
+
+    async def must_not_run(token):
+        raise AssertionError("a cached rejection must not be verified again")
+
+    monkeypatch.setattr(auth, "_verify_token", must_not_run)
+    with pytest.raises(HTTPException) as error:
+        verify_cached(token)
+    assert error.value.status_code == 401
+    assert error.value.detail == "Token expired"
+
+@pytest.mark.parametrize("failure", ["unknown-kid", "pool-busy", "network"])
+def test_transient_failures_are_not_negative_cached(verifier, caches, monkeypatch, failure):
+    token_cache, invalid_token_cache = caches
+    monkeypatch.setattr(auth, "SUPABASE_JWKS_MIN_REFRESH_SECONDS", 30)
+    if failure == "unknown-kid":
+        monkeypatch.setattr(auth, "supabase_executor", FakeExecutor(user=REMOTE_USER))
+        token = es256_token(private_key=OTHER_EC_KEY, kid="key-2")
+    else:
+        error = SupabaseBusyError("pool is full") if failure == "pool-busy" else ConnectionError("Supabase Auth unreachable")
+        monkeypatch.setattr(auth, "AUTH_REMOTE_FALLBACK", True)
+        monkeypatch.setattr(auth, "supabase_executor", FakeExecutor(error=error))
+        token = hs256_token(secret="some-other-secret-of-32-bytes-long!!")
+
+    with pytest.raises(HTTPException) as error:
+        verify_cached(token)
+    assert error.value.status_code == 401
+    assert len(invalid_token_cache) == 0
+    assert len(token_cache) == 0
+
+    # The token is verified again once the cause is gone
+    if failure == "unknown-kid":
+        FakeJWKSClient.keys = [_jwk(OTHER_EC_KEY, "key-2")]
+        verifier.last_refresh -= 31
+    else:
+        monkeypatch.setattr(auth, "supabase_executor", FakeExecutor(user=REMOTE_USER))
+    assert verify_cached(token)["user_id"] in ("user-1", "remote-user")
+
+def test_responses_without_a_user_are_not_cached(verifier, caches, monkeypatch):
+    token_cache, _ = caches
+    monkeypatch.setattr(auth, "AUTH_VERIFY_MODE", "remote")
+    monkeypatch.setattr(auth, "supabase_executor", FakeExecutor(user=None))
+    assert verify_cached(hs256_token())["user_id"] is None
+    assert len(token_cache) == 0
@@ -0,0 +1,78 @@
+import pytest
+
+import cache as cache_module
+from cache import MISSING, TTLCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache("test", ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is MISSING
+    assert cache.get("b") == 2
+    assert len(cache) == 1
+
+def test_none_is_cached_and_missing_keys_use_the_default(clock):
+    cache = TTLCache("test")
+    cache.set("a", None)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is MISSING
+    assert cache.get("b", "fallback") == "fallback"
+
+def test_non_positive_ttl_drops_the_entry(clock):
+    cache = TTLCache("test")
+    cache.set("a", 1)
+    cache.set("a", 2, ttl=0)
+
+    assert cache.get("a") is MISSING
+    assert len(cache) == 0
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache("test", max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+def test_invalidate_clear_and_stats(clock):
+    cache = TTLCache("test", max_size=8, ttl=5)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert cache.invalidate("a") is True
+    assert cache.invalidate("a") is False
+    cache.get("a")
+    cache.get("b")
+    assert cache.stats() == {
+        "name": "test",
+        "size": 1,
+        "max_size": 8,
+        "ttl_seconds": 5,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 0,
+        "hit_rate": 0.5,
+    }
+    cache.clear()
+    assert len(cache) == 0
@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import catalog as catalog_module
+from catalog import DestinationCatalog, destination_icon
+
+T0 = datetime(2026, 10, 18, 9, 0, tzinfo=timezone.utc)
+
+def _row(destination_id, minutes=0, **overrides):
+    row = {
+        "id": destination_id,
+        "name": destination_id.title(),
+        "latitude": 31.0,
+        "longitude": 35.5,
+        "category": "historical",
+        "rating": 4.5,
+        "is_active": True,
+        "updated_at": (T0 + timedelta(minutes=minutes)).isoformat(),
+    }
+    row.update(overrides)
+    return row
+
+class Query:
+    def __init__(self):
+        self.filters = []
+
+    def select(self, *args):
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(("eq", column, value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(("gte", column, value))
+        return self
+
+class FakeDestinations:
+    """destinations table behind supabase_admin; answers each query from the next queued result"""
+
+    def __init__(self):
+        self.results = []
+        self.queries = []
+
+    def table(self, name):
+        assert name == "destinations"
+        return Query()
+
+    async def execute(self, query):
+        self.queries.append(query.filters)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return SimpleNamespace(data=result)
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDestinations()
+    monkeypatch.setattr(catalog_module, "supabase_admin", db)
+    monkeypatch.setattr(catalog_module, "supabase_executor", db)
+    return db
+
+@pytest.fixture
+def catalog():
+    catalog = DestinationCatalog(refresh_interval=300, full_reload_interval=3600, overlap=60)
+    catalog.changes = []
+    catalog.add_listener(lambda changed, removed: catalog.changes.append((changed, removed)))
+    return catalog
+
+def test_first_refresh_is_a_full_load_of_active_rows(db, catalog):
+    db.results = [[_row("petra", 0), _row("jerash", 5, rating=None), _row("broken", 6, latitude=None)]]
+    # Without a watermark an incremental refresh still reads the whole catalog
+    asyncio.run(catalog.refresh(full=False))
+
+    assert db.queries == [[("eq", "is_active", True)]]
+    assert sorted(d.id for d in catalog.all()) == ["jerash", "petra"]
+    assert catalog.get("jerash").rating == 0.0
+    assert catalog.stats()["watermark"] == (T0 + timedelta(minutes=6)).isoformat()
+    assert catalog.version == 1
+    assert catalog.changes == [({"petra", "jerash"}, set())]
+
+def test_incremental_refresh_reads_past_the_watermark_with_overlap(db, catalog):
+    db.results = [[_row("petra", 0), _row("jerash", 10)]]
+    asyncio.run(catalog.refresh(full=True))
+
+    db.results = [[
+        _row("jerash", 10),
+        _row("petra", 12, rating=4.9),
+        _row("wadi-rum", 15),
+    ]]
+    asyncio.run(catalog.refresh())
+
+    since = T0 + timedelta(minutes=10) - timedelta(seconds=60)
+    assert db.queries[1] == [("gte", "updated_at", since.isoformat())]
+    assert catalog.get("petra").rating == 4.9
+    assert catalog.get("wadi-rum") is not None
+    assert catalog.stats()["watermark"] == (T0 + timedelta(minutes=15)).isoformat()
+    # Re-read rows that did not change are not reported
+    assert catalog.changes[-1] == ({"petra", "wadi-rum"}, set())
+    assert catalog.version == 2
+
+def test_watermark_never_moves_backwards(db, catalog):
+    db.results = [[_row("petra", 30)], [_row("jerash", 5)]]
+    asyncio.run(catalog.refresh(full=True))
+    asyncio.run(catalog.refresh())
+
+    assert catalog.stats()["watermark"] == (T0 + timedelta(minutes=30)).isoformat()
+    assert catalog.get("jerash") is not None
+
+def test_deactivated_rows_are_removed_incrementally(db, catalog):
+    db.results = [[_row("petra", 0), _row("jerash", 1)], [_row("jerash", 5, is_active=False)]]
+    asyncio.run(catalog.refresh(full=True))
+    asyncio.run(catalog.refresh())
+
+    assert catalog.get("jerash") is None
+    assert len(catalog) == 1
+    assert catalog.changes[-1] == (set(), {"jerash"})
+
+def test_full_reload_drops_hard_deleted_rows(db, catalog):
+    db.results = [[_row("petra", 0), _row("jerash", 1)], [_row("petra", 0)]]
+    asyncio.run(catalog.refresh(full=True))
+    asyncio.run(catalog.refresh(full=True))
+
+    assert [d.id for d in catalog.all()] == ["petra"]
+    assert catalog.changes[-1] == (set(), {"jerash"})
+
+def test_unchanged_refresh_keeps_the_version(db, catalog):
+    db.results = [[_row("petra", 0)], [_row("petra", 0)]]
+    asyncio.run(catalog.refresh(full=True))
+    asyncio.run(catalog.refresh())
+
+    assert catalog.version == 1
+    assert len(catalog.changes) == 1
+
+def test_failed_refresh_keeps_the_catalog(db, catalog):
+    db.results = [[_row("petra", 0)], ConnectionError("database unreachable")]
+    asyncio.run(catalog.refresh(full=True))
+    asyncio.run(catalog.refresh())
+
+    assert catalog.get("petra") is not None
+    assert catalog.stats()["refresh_failures"] == 1
+    assert catalog.stats()["refreshes"] == 2
+
+def test_concurrent_refreshes_share_one_query(db, catalog):
+    db.results = [[_row("petra", 0)]]
+
+    async def scenario():
+        await asyncio.gather(*(catalog.refresh(full=True) for _ in range(5)))
+
+    asyncio.run(scenario())
+    assert len(db.queries) == 1
+
+def test_destination_icon_by_category():
+    assert destination_icon(" Desert ") == "🏜️"
+    assert destination_icon(None) == "📍"
@@ -0,0 +1,53 @@
+from conditional import ETagCache, compute_etag, etag_matches
+
+def test_compute_etag_is_stable_and_quoted():
+    etag = compute_etag({"b": 1, "a": [1, 2]})
+    assert etag == compute_etag({"a": [1, 2], "b": 1})
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag != compute_etag({"a": [2, 1], "b": 1})
+
+def test_etag_matches_weak_lists_and_star():
+    etag = compute_etag("x")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('"other"', etag)
+
+def _cache() -> ETagCache:
+    return ETagCache("test", ttl=60, max_size=100, max_variants=2)
+
+def test_read_is_stored_unless_its_own_scope_was_invalidated():
+    cache = _cache()
+    generation = cache.generation("u1")
+    cache.invalidate("u1")
+    cache.set("u1", "page1", '"a"', {}, generation)
+    assert cache.get("u1", "page1") is None
+
+    generation = cache.generation("u1")
+    cache.set("u1", "page1", '"b"', {"X-Next-Cursor": "c"}, generation)
+    assert cache.get("u1", "page1") == ('"b"', {"X-Next-Cursor": "c"})
+
+def test_writes_by_other_users_do_not_block_a_read():
+    cache = _cache()
+    generation = cache.generation("u1")
+    for user in ("u2", "u3"):
+        cache.invalidate(user)
+    cache.set("u1", "page1", '"a"', {}, generation)
+    assert cache.get("u1", "page1") == ('"a"', {})
+
+def test_clear_rejects_reads_that_started_before_it():
+    cache = _cache()
+    generation = cache.generation("u1")
+    cache.clear()
+    cache.set("u1", "page1", '"a"', {}, generation)
+    assert cache.get("u1", "page1") is None
+
+def test_invalidate_drops_every_variant_and_variants_are_bounded():
+    cache = _cache()
+    for page in ("p1", "p2", "p3"):
+        cache.set("u1", page, f'"{page}"', {}, cache.generation("u1"))
+    assert cache.get("u1", "p1") is None
+    assert cache.get("u1", "p3") == ('"p3"', {})
+    cache.invalidate("u1")
+    assert cache.get("u1", "p3") is None
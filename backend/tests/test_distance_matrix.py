@@ -0,0 +1,138 @@
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from distance_matrix import MANIFEST_NAME, DistanceMatrixStore, drive_minutes
+from geo import haversine_km
+
+COORDINATES = {
+    "amman": (31.9539, 35.9106),
+    "petra": (30.3285, 35.4444),
+    "wadi-rum": (29.5730, 35.4200),
+    "jerash": (32.2808, 35.8993),
+    "aqaba": (29.5320, 35.0063),
+}
+
+def _store(tmp_path, coordinates=COORDINATES) -> DistanceMatrixStore:
+    store = DistanceMatrixStore(str(tmp_path))
+    store._sync_blocking(dict(coordinates))
+    return store
+
+def _matrix_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name.endswith(".npy"))
+
+def test_lookup_matches_haversine(tmp_path):
+    store = _store(tmp_path)
+
+    km, minutes = store.lookup("amman", "petra")
+    assert km == pytest.approx(haversine_km(*COORDINATES["amman"], *COORDINATES["petra"]), rel=1e-5)
+    assert minutes == pytest.approx(float(drive_minutes(np.array(km))), rel=1e-5)
+    assert store.lookup("petra", "amman") == store.lookup("amman", "petra")
+    assert store.lookup("amman", "amman") == (0.0, 0.0)
+    assert store.lookup("amman", "unknown") is None
+    assert "amman" in store and "unknown" not in store
+
+def test_unchanged_catalog_is_not_rebuilt(tmp_path):
+    _store(tmp_path)
+    files = _matrix_files(tmp_path)
+
+    # Another worker syncing the same catalog maps the existing file
+    other = _store(tmp_path)
+    assert other.builds == 0
+    assert _matrix_files(tmp_path) == files
+    assert other.lookup("jerash", "aqaba") is not None
+
+def test_rebuild_reuses_rows_of_unmoved_destinations(tmp_path):
+    store = _store(tmp_path)
+    coordinates = dict(COORDINATES)
+    del coordinates["aqaba"]
+    coordinates["petra"] = (30.3300, 35.4500)
+    coordinates["dead-sea"] = (31.5590, 35.4732)
+    store._sync_blocking(coordinates)
+
+    assert store.builds == 2
+    assert store.rows_computed == len(COORDINATES) + 2
+    assert store.rows_reused == 3
+    assert len(_matrix_files(tmp_path)) == 1
+    assert store.lookup("aqaba", "amman") is None
+    for a in coordinates:
+        for b in coordinates:
+            km, _ = store.lookup(a, b)
+            assert km == pytest.approx(haversine_km(*coordinates[a], *coordinates[b]), rel=1e-5, abs=1e-6)
+    assert store.stats()["version"] == 2
+
+def test_matrices_mix_known_destinations_and_ad_hoc_points(tmp_path):
+    store = _store(tmp_path)
+    hotel = (31.95, 35.93)
+    points = [("amman", *COORDINATES["amman"]), (None, *hotel), ("petra", *COORDINATES["petra"]), ("new", 30.0, 35.0)]
+    km, minutes = store.matrices(points)
+
+    assert km.shape == minutes.shape == (4, 4)
+    for i, a in enumerate(points):
+        for j, b in enumerate(points):
+            assert km[i, j] == pytest.approx(haversine_km(a[1], a[2], b[1], b[2]), rel=1e-5, abs=1e-6)
+    assert np.allclose(minutes, drive_minutes(km), rtol=1e-5)
+
+def test_sync_coalesces_changes_made_during_a_build(tmp_path):
+    store = DistanceMatrixStore(str(tmp_path))
+
+    async def scenario():
+        first = store.schedule_sync({"amman": COORDINATES["amman"]})
+        second = store.schedule_sync(dict(COORDINATES))
+        assert first is second
+        await first
+
+    asyncio.run(scenario())
+    assert store.builds == 1
+    assert store.last_error is None
+    assert all(destination_id in store for destination_id in COORDINATES)
+    assert os.path.exists(tmp_path / MANIFEST_NAME)
+
+def test_remap_during_matrices_keeps_one_consistent_mapping(tmp_path, monkeypatch):
+    store = _store(tmp_path)
+    shrunk = {"wadi-rum": COORDINATES["wadi-rum"], "aqaba": COORDINATES["aqaba"]}
+    points = [(destination_id, *coords) for destination_id, coords in COORDINATES.items()]
+    ix = np.ix_
+    remapped = []
+
+    def remap_then_ix(*args):
+        # The build thread publishes a smaller catalog after the rows were looked up
+        if not remapped:
+            remapped.append(True)
+            store._sync_blocking(shrunk)
+        return ix(*args)
+
+    monkeypatch.setattr(np, "ix_", remap_then_ix)
+    km, _ = store.matrices(points)
+    monkeypatch.undo()
+
+    assert remapped and store.stats()["destinations"] == 2
+    for i, a in enumerate(points):
+        for j, b in enumerate(points):
+            assert km[i, j] == pytest.approx(haversine_km(a[1], a[2], b[1], b[2]), rel=1e-5, abs=1e-6)
+
+def test_lookups_stay_consistent_while_another_thread_remaps(tmp_path):
+    store = _store(tmp_path)
+    shrunk = {"wadi-rum": COORDINATES["wadi-rum"], "aqaba": COORDINATES["aqaba"]}
+    expected = haversine_km(*COORDINATES["wadi-rum"], *COORDINATES["aqaba"])
+    stop = threading.Event()
+
+    def remap():
+        while not stop.is_set():
+            # Alternate between the shrunk and the full catalog, so every sync is a remap
+            store._sync_blocking(dict(shrunk if store.builds % 2 else COORDINATES))
+
+    thread = threading.Thread(target=remap)
+    thread.start()
+    try:
+        for _ in range(2000):
+            km, _ = store.lookup("wadi-rum", "aqaba")
+            assert km == pytest.approx(expected, rel=1e-5)
+            store.matrices([("amman", *COORDINATES["amman"]), ("aqaba", *COORDINATES["aqaba"])])
+    finally:
+        stop.set()
+        thread.join()
+    assert store.builds > 1
@@ -0,0 +1,101 @@
+import math
+
+import numpy as np
+import pytest
+
+from geo import GridIndex, haversine_cross, haversine_km, haversine_matrix
+
+AMMAN = (31.9539, 35.9106)
+PETRA = (30.3285, 35.4444)
+
+def _catalog(seed=0, count=400):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(29.2, 33.4, count)
+    lons = rng.uniform(34.9, 39.3, count)
+    categories = rng.choice(["historical", "nature", "Museum"], count)
+    return [(f"p{i}", float(lat), float(lon), str(category)) for i, (lat, lon, category) in enumerate(zip(lats, lons, categories))]
+
+def _index(points, cell_degrees=0.05):
+    index = GridIndex(cell_degrees)
+    for point_id, lat, lon, category in points:
+        index.upsert(point_id, lat, lon, category)
+    return index
+
+def _brute_force(points, lat, lon, categories=None):
+    return sorted(
+        (haversine_km(lat, lon, p_lat, p_lon), point_id)
+        for point_id, p_lat, p_lon, category in points
+        if categories is None or category.lower() in categories
+    )
+
+def test_haversine_known_distances():
+    assert haversine_km(*AMMAN, *AMMAN) == 0.0
+    assert haversine_km(*AMMAN, *PETRA) == pytest.approx(186.0, abs=2.0)
+    # A quarter of a meridian
+    assert haversine_km(0, 0, 90, 0) == pytest.approx(math.pi * 6371.0088 / 2)
+    assert haversine_km(0, 0, 0, 180) == pytest.approx(math.pi * 6371.0088)
+
+def test_vectorized_haversine_matches_scalar():
+    points = _catalog(count=12)
+    lats = [p[1] for p in points]
+    lons = [p[2] for p in points]
+    matrix = haversine_matrix(lats, lons)
+    cross = haversine_cross(lats[:3], lons[:3], lats, lons)
+
+    assert matrix.shape == (12, 12)
+    assert np.allclose(matrix, matrix.T)
+    assert np.allclose(np.diag(matrix), 0.0)
+    for i in range(12):
+        for j in range(12):
+            assert matrix[i, j] == pytest.approx(haversine_km(lats[i], lons[i], lats[j], lons[j]))
+    assert np.allclose(cross, matrix[:3])
+
+@pytest.mark.parametrize("radius_km", [0.5, 10, 60, 250])
+def test_within_matches_brute_force(radius_km):
+    points = _catalog()
+    index = _index(points)
+    for lat, lon in [AMMAN, PETRA, (31.0, 36.0), (28.0, 40.0)]:
+        expected = [hit for hit in _brute_force(points, lat, lon) if hit[0] <= radius_km]
+        assert index.within(lat, lon, radius_km) == expected
+        assert index.within(lat, lon, radius_km, limit=3) == expected[:3]
+
+def test_within_filters_categories_case_insensitively():
+    points = _catalog()
+    index = _index(points)
+    expected = [hit for hit in _brute_force(points, *AMMAN, {"museum"}) if hit[0] <= 80]
+    assert expected
+    assert index.within(*AMMAN, 80, categories={"museum"}) == expected
+
+@pytest.mark.parametrize("cell_degrees", [0.05, 0.5])
+@pytest.mark.parametrize("k", [1, 5, 40])
+def test_nearest_matches_brute_force(cell_degrees, k):
+    points = _catalog()
+    index = _index(points, cell_degrees)
+    # Includes query points outside the occupied grid
+    for lat, lon in [AMMAN, PETRA, (31.0, 36.0), (25.0, 45.0)]:
+        assert index.nearest(lat, lon, k) == _brute_force(points, lat, lon)[:k]
+        assert index.nearest(lat, lon, k, categories={"nature"}) == _brute_force(points, lat, lon, {"nature"})[:k]
+
+def test_nearest_respects_max_radius():
+    points = _catalog()
+    index = _index(points)
+    expected = [hit for hit in _brute_force(points, *PETRA) if hit[0] <= 30][:10]
+    assert index.nearest(*PETRA, 10, max_radius_km=30) == expected
+
+def test_upsert_moves_and_remove_forgets_points():
+    index = GridIndex(0.05)
+    index.upsert("a", *AMMAN, "city")
+    index.upsert("b", *PETRA, "historical")
+    assert [point_id for _, point_id in index.nearest(*AMMAN, 1)] == ["a"]
+
+    index.upsert("a", PETRA[0] + 0.01, PETRA[1], "city")
+    assert len(index) == 2
+    assert index.within(*AMMAN, 50) == []
+
+    index.remove("b")
+    index.remove("missing")
+    assert [point_id for _, point_id in index.nearest(*PETRA, 5)] == ["a"]
+    index.clear()
+    assert len(index) == 0
+    assert index.nearest(*PETRA, 5) == []
+    assert index.within(*PETRA, 5) == []
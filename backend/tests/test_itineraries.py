@@ -0,0 +1,112 @@
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from models import ITINERARY_BATCH_MAX_SIZE
+
+USER_ID = "user-1"
+
+class FakeQuery:
+    """Records the PostgREST builder calls of one statement"""
+
+    def __init__(self, name: str):
+        self.calls = [("table", name)]
+
+    def __getattr__(self, method):
+        def call(*args, **kwargs):
+            self.calls.append((method, *args))
+            return self
+        return call
+
+    def called(self, method):
+        return next((args for name, *args in self.calls if name == method), None)
+
+class FakeSupabase:
+    def __init__(self):
+        self.statements = []
+
+    def table(self, name):
+        return FakeQuery(name)
+
+    def rpc(self, name, params):
+        query = FakeQuery(name)
+        query.calls.append(("rpc", params))
+        return query
+
+    async def execute(self, query):
+        self.statements.append(query)
+        inserted = query.called("insert")
+        if inserted is not None:
+            rows = inserted[0] if isinstance(inserted[0], list) else [inserted[0]]
+            return SimpleNamespace(data=[{**row, "id": str(uuid.uuid4()), "added_at": "2026-10-18T10:00:00+00:00"} for row in rows])
+        return SimpleNamespace(data=[])
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeSupabase()
+    monkeypatch.setattr(server, "supabase_admin", db)
+    monkeypatch.setattr(server.supabase_executor, "execute", db.execute)
+    return db
+
+@pytest.fixture
+def client(db):
+    server.app.dependency_overrides[server.get_current_user] = lambda: {"user_id": USER_ID, "email": "user@example.com"}
+    yield TestClient(server.app)
+    server.app.dependency_overrides.clear()
+
+def _create(**overrides):
+    return {"op": "create", "item": {"destination_id": "petra", "destination_name": "Petra", **overrides}}
+
+def test_batch_reports_bad_priority_and_status_per_operation(client, db):
+    operations = [
+        _create(priority=3),
+        _create(priority=9),
+        _create(status="done"),
+        {"op": "update", "id": str(uuid.uuid4()), "changes": {"priority": 0}},
+        {"op": "update", "id": str(uuid.uuid4()), "changes": {"status": "gone"}},
+    ]
+    response = client.post("/api/itineraries/batch", json={"operations": operations})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["ok", "invalid", "invalid", "invalid", "invalid"]
+    assert "priority" in results[1]["error"] and "priority" in results[3]["error"]
+    assert "status" in results[2]["error"] and "status" in results[4]["error"]
+    # Only the valid create reached the database
+    assert len(db.statements) == 1
+    assert [row["priority"] for row in db.statements[0].called("insert")[0]] == [3]
+
+def test_oversized_batch_is_rejected_before_anything_runs(client, db):
+    operations = [_create() for _ in range(ITINERARY_BATCH_MAX_SIZE + 1)]
+    response = client.post("/api/itineraries/batch", json={"operations": operations})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "too_long"
+    assert db.statements == []
+
+def test_single_create_still_rejects_bad_priority(client, db):
+    response = client.post("/api/itineraries", json={"destination_id": "petra", "destination_name": "Petra", "priority": 6})
+
+    assert response.status_code == 422
+    assert db.statements == []
+
+@pytest.mark.parametrize("visit_date, stored", [
+    ("2026-10-18", "2026-10-18"),
+    ("2026-10-18T23:30:00+03:00", "2026-10-18"),
+    # 04:30 UTC on the 19th, which is the 19th in Amman as well
+    ("2026-10-18T23:30:00-05:00", "2026-10-19"),
+    ("2026-10-18T22:30:00Z", "2026-10-19"),
+])
+def test_visit_date_is_stored_as_the_trip_local_day(client, db, visit_date, stored):
+    item = {"destination_id": "petra", "destination_name": "Petra", "visit_date": visit_date}
+    assert client.post("/api/itineraries", json=item).status_code == 200
+    item_id = str(uuid.uuid4())
+    response = client.post("/api/itineraries/batch", json={"operations": [{"op": "update", "id": item_id, "changes": {"visit_date": visit_date}}]})
+    assert response.status_code == 200
+
+    create, update = db.statements
+    assert create.called("insert")[0]["visit_date"] == stored
+    assert update.called("rpc")[0]["p_changes"] == [{"id": item_id, "visit_date": stored}]
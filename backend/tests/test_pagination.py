@@ -0,0 +1,32 @@
+import base64
+import json
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from pagination import decode_cursor, encode_cursor
+
+def _raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def test_cursor_round_trip():
+    item_id = str(uuid.uuid4())
+    for added_at in ("2026-01-02T03:04:05.123456+00:00", "2026-01-02T03:04:05Z"):
+        cursor = encode_cursor({"added_at": added_at, "id": item_id})
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (added_at, item_id)
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    _raw_cursor("just a string"),
+    _raw_cursor(["2026-01-02T03:04:05Z"]),
+    _raw_cursor([123, str(uuid.uuid4())]),
+    _raw_cursor(['2026-01-02",id.gt.0', str(uuid.uuid4())]),
+    _raw_cursor(["2026-01-02T03:04:05Z", "1),or(user_id.neq.x"]),
+    _raw_cursor(["2026-01-02T03:04:05Z", "42"]),
+])
+def test_malformed_or_crafted_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
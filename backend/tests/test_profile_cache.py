@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import cache as cache_module
+import profile_cache as profile_cache_module
+from profile_cache import ProfileCache
+
+USER_ID = "user-1"
+
+class Statement:
+    def __init__(self, kind, params=None):
+        self.kind = kind
+        self.params = params
+
+    def select(self, *args):
+        return self
+
+    def eq(self, *args):
+        return self
+
+class FakeProfiles:
+    """Profiles table behind supabase_admin, with calls that can be held until released"""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = []
+        self.gate = None
+
+    def table(self, name):
+        assert name == "profiles"
+        return Statement("select")
+
+    def rpc(self, name, params):
+        assert name == "get_or_create_profile"
+        return Statement("create", params)
+
+    async def execute(self, statement):
+        self.calls.append(statement.kind)
+        if statement.kind == "create":
+            params = statement.params
+            data = self.rows.setdefault(params["p_user_id"], {"id": params["p_user_id"], "preferences": params["p_preferences"]})
+        else:
+            data = [self.rows[USER_ID]] if USER_ID in self.rows else []
+        # The database has answered; the response is still on its way back
+        if self.gate is not None:
+            await self.gate.wait()
+        return SimpleNamespace(data=data)
+
+@pytest.fixture
+def profiles(monkeypatch):
+    profiles = FakeProfiles()
+    monkeypatch.setattr(profile_cache_module, "supabase_admin", profiles)
+    monkeypatch.setattr(profile_cache_module, "supabase_executor", profiles)
+    return profiles
+
+@pytest.fixture
+def cache():
+    return ProfileCache(ttl=300, max_size=100, miss_ttl=30)
+
+def test_concurrent_gets_share_one_select(profiles, cache):
+    profiles.rows[USER_ID] = {"id": USER_ID, "preferences": {"budget": "medium"}}
+
+    async def scenario():
+        profiles.gate = asyncio.Event()
+        readers = [asyncio.create_task(cache.get(USER_ID)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        profiles.gate.set()
+        rows = await asyncio.gather(*readers)
+        return rows, await cache.get(USER_ID)
+
+    rows, cached = asyncio.run(scenario())
+    assert profiles.calls == ["select"]
+    assert all(row == profiles.rows[USER_ID] for row in rows)
+    assert cached == profiles.rows[USER_ID]
+
+def test_get_or_create_creates_in_one_call_and_caches_the_row(profiles, cache):
+    async def scenario():
+        created = await cache.get_or_create(USER_ID, {"budget": "low"})
+        return created, await cache.get(USER_ID), await cache.get_preferences(USER_ID)
+
+    created, cached, preferences = asyncio.run(scenario())
+    assert created == {"id": USER_ID, "preferences": {"budget": "low"}}
+    assert cached == created
+    assert preferences == {"budget": "low"}
+    assert profiles.calls == ["create"]
+
+def test_get_or_create_joining_a_plain_select_still_creates(profiles, cache):
+    async def scenario():
+        profiles.gate = asyncio.Event()
+        reader = asyncio.create_task(cache.get(USER_ID))
+        await asyncio.sleep(0.01)
+        creator = asyncio.create_task(cache.get_or_create(USER_ID, {"budget": "low"}))
+        await asyncio.sleep(0.01)
+        profiles.gate.set()
+        return await reader, await creator
+
+    read, created = asyncio.run(scenario())
+    assert read is None
+    assert created == {"id": USER_ID, "preferences": {"budget": "low"}}
+    assert profiles.calls == ["select", "create"]
+
+def test_missing_profile_is_cached_for_the_miss_ttl(profiles, cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        first = await cache.get(USER_ID)
+        second = await cache.get(USER_ID)
+        profiles.rows[USER_ID] = {"id": USER_ID, "preferences": {}}
+        now[0] += 31
+        return first, second, await cache.get(USER_ID)
+
+    first, second, third = asyncio.run(scenario())
+    assert first is None and second is None
+    assert third == {"id": USER_ID, "preferences": {}}
+    assert profiles.calls == ["select", "select"]
+
+def test_cached_miss_does_not_stop_get_or_create(profiles, cache):
+    async def scenario():
+        assert await cache.get(USER_ID) is None
+        assert await cache.get_preferences(USER_ID, {"default": True}) == {"default": True}
+        return await cache.get_or_create(USER_ID, {"budget": "low"})
+
+    assert asyncio.run(scenario()) == {"id": USER_ID, "preferences": {"budget": "low"}}
+    assert profiles.calls == ["select", "create"]
+
+def test_invalidate_during_a_load_keeps_its_result_out_of_the_cache(profiles, cache):
+    profiles.rows[USER_ID] = {"id": USER_ID, "preferences": {"budget": "low"}}
+
+    async def scenario():
+        profiles.gate = asyncio.Event()
+        reader = asyncio.create_task(cache.get(USER_ID))
+        await asyncio.sleep(0.01)
+        # A write lands while the select is still running
+        profiles.rows[USER_ID] = {"id": USER_ID, "preferences": {"budget": "luxury"}}
+        cache.invalidate(USER_ID)
+        assert cache.stats()["loads_in_flight"] == 0
+        profiles.gate.set()
+        old = await reader
+        return old, await cache.get(USER_ID)
+
+    old, fresh = asyncio.run(scenario())
+    assert old["preferences"] == {"budget": "low"}
+    assert fresh["preferences"] == {"budget": "luxury"}
+    assert profiles.calls == ["select", "select"]
+
+def test_set_stores_the_authoritative_row(profiles, cache):
+    cache.set(USER_ID, {"id": USER_ID, "preferences": {"budget": "medium"}})
+    assert asyncio.run(cache.get(USER_ID))["preferences"] == {"budget": "medium"}
+    assert profiles.calls == []
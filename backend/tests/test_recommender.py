@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+import pytest
+
+import recommender as recommender_module
+from recommender import Recommender
+
+def _destination(destination_id, category, rating, lat=31.0, lon=35.5):
+    return SimpleNamespace(id=destination_id, category=category, rating=rating, latitude=lat, longitude=lon)
+
+@pytest.fixture
+def catalog():
+    # Six historical places rated above two nature places and one museum
+    destinations = [_destination(f"h{i}", "historical", 5.0 - i * 0.1) for i in range(6)]
+    destinations += [_destination("n0", "nature", 3.0), _destination("n1", "nature", 2.5), _destination("m0", "museum", 2.0)]
+    model = Recommender()
+    model.rebuild(destinations, version=1)
+    return model
+
+def _ids(results):
+    return [destination_id for destination_id, _, _ in results]
+
+def test_category_cap_reranks_without_truncating(catalog, monkeypatch):
+    monkeypatch.setattr(recommender_module, "RECOMMEND_MAX_PER_CATEGORY", 3)
+    results = catalog.recommend({"interests": ["history"]}, limit=8)
+
+    # The three best historical places, then the other categories, then the rest of history
+    assert _ids(results) == ["h0", "h1", "h2", "m0", "n0", "n1", "h3", "h4"]
+    assert all(0.0 <= score <= 1.0 for _, score, _ in results)
+
+def test_category_cap_keeps_score_order_within_the_capped_picks(catalog, monkeypatch):
+    monkeypatch.setattr(recommender_module, "RECOMMEND_MAX_PER_CATEGORY", 2)
+    results = catalog.recommend({}, limit=4)
+
+    assert _ids(results) == ["h0", "h1", "n0", "n1"]
+    scores = [score for _, score, _ in results]
+    assert scores == sorted(scores, reverse=True)
+
+def test_category_filter_skips_the_cap(catalog, monkeypatch):
+    monkeypatch.setattr(recommender_module, "RECOMMEND_MAX_PER_CATEGORY", 3)
+    results = catalog.recommend({"interests": ["history"]}, categories={"historical"}, limit=5)
+
+    assert _ids(results) == ["h0", "h1", "h2", "h3", "h4"]
+
+def test_cap_disabled_is_plain_score_order(catalog, monkeypatch):
+    monkeypatch.setattr(recommender_module, "RECOMMEND_MAX_PER_CATEGORY", 0)
+    results = catalog.recommend({"interests": ["history"]}, limit=4)
+
+    assert _ids(results) == ["h0", "h1", "h2", "h3"]
+
+def test_excluded_ids_are_never_recommended(catalog):
+    results = catalog.recommend({}, exclude_ids={"h0", "n0"}, limit=20)
+
+    assert len(results) == 7
+    assert not {"h0", "n0"} & set(_ids(results))
+
+@pytest.mark.parametrize("interests", ["nature", " Nature , food", ["nature"]])
+def test_interests_given_as_a_string_are_used(catalog, interests):
+    results = catalog.recommend({"interests": interests}, limit=1)
+
+    assert _ids(results) == ["n0"]
+    assert "matches your interest in nature" in results[0][2]
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import pytest
+
+from resilience import Bulkhead, BulkheadFullError, CircuitBreaker
+
+def _half_open(breaker: CircuitBreaker):
+    breaker._open()
+    breaker.opened_at = time.monotonic() - breaker.reset_seconds - 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", slow_call_seconds=1.0, failure_threshold=3, reset_seconds=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+def test_slow_success_counts_as_failure():
+    breaker = CircuitBreaker("test", slow_call_seconds=1.0, failure_threshold=1)
+    breaker.record_success(2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.slow_calls == 1
+
+def test_half_open_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test", slow_call_seconds=1.0, failure_threshold=1, half_open_max_calls=1)
+    _half_open(breaker)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    _half_open(breaker)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_released_probe_lets_the_next_call_probe():
+    breaker = CircuitBreaker("test", slow_call_seconds=1.0, reset_seconds=60, half_open_max_calls=1)
+    _half_open(breaker)
+    assert breaker.allow_request()
+    # The probe was cancelled before the upstream answered
+    breaker.release_probe()
+    assert breaker.allow_request()
+    breaker.record_success(0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+def test_bulkhead_queues_then_times_out_without_losing_permits():
+    async def main():
+        bulkhead = Bulkhead("test", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with bulkhead.acquire():
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(BulkheadFullError):
+            async with bulkhead.acquire():
+                pass
+        assert bulkhead.timed_out == 1
+
+        release.set()
+        await holder
+        # Every permit is back: max_concurrent calls can run again
+        async with bulkhead.acquire():
+            assert bulkhead.in_flight == 1
+        return bulkhead
+
+    bulkhead = asyncio.run(main())
+    assert bulkhead.in_flight == 0
+    assert bulkhead.queued == 0
+    assert not bulkhead._semaphore.locked()
+
+def test_bulkhead_rejects_when_queue_is_full():
+    async def main():
+        bulkhead = Bulkhead("test", max_concurrent=1, max_queue=0, queue_timeout=1.0)
+        async with bulkhead.acquire():
+            with pytest.raises(BulkheadFullError):
+                async with bulkhead.acquire():
+                    pass
+        return bulkhead
+
+    assert asyncio.run(main()).rejected == 1
@@ -0,0 +1,73 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from routing import optimize_route
+
+def _distances(points) -> np.ndarray:
+    points = np.asarray(points, dtype=float)
+    return np.linalg.norm(points[:, None] - points[None, :], axis=-1)
+
+def _length(distances, order) -> float:
+    return float(sum(distances[a, b] for a, b in zip(order, order[1:])))
+
+def _brute_force(distances, start=None, end=None) -> float:
+    n = len(distances)
+    fixed = [node for node in (start, end) if node is not None]
+    head = [start] if start is not None else []
+    tail = [end] if end is not None else []
+    return min(_length(distances, head + list(middle) + tail) for middle in itertools.permutations([i for i in range(n) if i not in fixed]))
+
+def _ends(n):
+    return [(None, None), (0, None), (0, n - 1), (0, 0)]
+
+def test_empty_and_single_node():
+    assert optimize_route(np.zeros((0, 0))) == ([], 0.0)
+    assert optimize_route(np.zeros((1, 1))) == ([0], 0.0)
+    assert optimize_route(np.zeros((1, 1)), 0, 0) == ([0, 0], 0.0)
+
+@pytest.mark.parametrize("n", range(2, 8))
+def test_route_is_a_valid_path_no_shorter_than_brute_force(n):
+    rng = np.random.default_rng(n)
+    for _ in range(20):
+        distances = _distances(rng.random((n, 2)))
+        for start, end in _ends(n):
+            order, length = optimize_route(distances, start, end)
+
+            expected_nodes = list(range(n)) + ([0] if start == end == 0 else [])
+            assert sorted(order) == sorted(expected_nodes)
+            if start is not None:
+                assert order[0] == start
+            if end is not None:
+                assert order[-1] == end
+            assert length == pytest.approx(_length(distances, order))
+            assert length >= _brute_force(distances, start, end) - 1e-9
+
+@pytest.mark.parametrize("n", [2, 3])
+def test_tiny_routes_are_optimal(n):
+    rng = np.random.default_rng(100 + n)
+    for _ in range(20):
+        distances = _distances(rng.random((n, 2)))
+        for start, end in _ends(n):
+            _, length = optimize_route(distances, start, end)
+            assert length == pytest.approx(_brute_force(distances, start, end))
+
+def test_points_on_a_line_are_visited_in_order():
+    positions = [3.0, 0.0, 7.0, 1.0, 5.0, 2.0]
+    distances = _distances([[x, 0.0] for x in positions])
+    order, length = optimize_route(distances)
+
+    assert length == pytest.approx(7.0) == pytest.approx(_brute_force(distances))
+    assert [positions[i] for i in order] in (sorted(positions), sorted(positions, reverse=True))
+
+@pytest.mark.parametrize("n", [5, 6, 7])
+def test_round_trip_over_convex_points_matches_brute_force(n):
+    # A 2-opt tour has no crossing edges, which for points in convex position is the optimum
+    rng = np.random.default_rng(n)
+    angles = np.sort(rng.random(n)) * 2 * np.pi
+    points = np.stack([np.cos(angles), np.sin(angles)], axis=1)[rng.permutation(n)]
+    distances = _distances(points)
+
+    _, length = optimize_route(distances, 0, 0)
+    assert length == pytest.approx(_brute_force(distances, 0, 0))
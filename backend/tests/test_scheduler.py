@@ -0,0 +1,56 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from scheduler import SCHEDULE_DEFAULT_VISIT_MINUTES, local_date, plan_days, visit_minutes
+
+def _line_travel(positions, base=None):
+    """Travel minutes between stops on a line; the base, if given, is appended last."""
+    points = list(positions) + ([base] if base is not None else [])
+    coords = np.array(points, dtype=float)
+    return np.abs(coords[:, None] - coords[None, :])
+
+def test_visit_minutes_by_category():
+    assert visit_minutes("Museum ") == 90
+    assert visit_minutes(None) == SCHEDULE_DEFAULT_VISIT_MINUTES
+    assert visit_minutes("unknown") == SCHEDULE_DEFAULT_VISIT_MINUTES
+
+def test_local_date_uses_trip_timezone():
+    # 22:30 UTC is already the next day in Amman (UTC+3)
+    assert local_date(datetime(2026, 5, 1, 22, 30, tzinfo=timezone.utc)) == date(2026, 5, 2)
+    assert local_date(datetime(2026, 5, 1, 22, 30, tzinfo=timezone(timedelta(hours=3)))) == date(2026, 5, 1)
+    assert local_date(datetime(2026, 5, 1, 23, 59)) == date(2026, 5, 1)
+
+def test_days_stay_within_budget():
+    travel = _line_travel([0, 10, 20, 30, 40, 50], base=25)
+    durations = [60] * 6
+    days, unscheduled = plan_days(travel, durations, [1] * 6, [None] * 6, 3, 200, base=6)
+
+    assert unscheduled == []
+    assert sorted(stop for day in days for stop in day) == list(range(6))
+    for day in days:
+        route = [6] + day + [6]
+        used = sum(durations[stop] for stop in day) + sum(travel[a, b] for a, b in zip(route, route[1:]))
+        assert used <= 200
+
+def test_lowest_priority_is_dropped_when_over_budget():
+    travel = np.zeros((3, 3))
+    days, unscheduled = plan_days(travel, [100, 100, 100], [5, 1, 3], [None] * 3, 1, 250)
+
+    assert days == [[0, 2]] or days == [[2, 0]]
+    assert unscheduled == [(1, "does not fit in the daily time budget")]
+
+def test_fixed_days_are_kept_even_past_budget():
+    travel = np.zeros((3, 3))
+    days, unscheduled = plan_days(travel, [300, 300, 60], [1, 1, 5], [1, 1, None], 2, 240)
+
+    assert sorted(days[1]) == [0, 1]
+    assert days[0] == [2]
+    assert unscheduled == []
+
+def test_fixed_day_outside_trip_is_unscheduled():
+    travel = np.zeros((2, 2))
+    days, unscheduled = plan_days(travel, [60, 60], [1, 1], [-1, 3], 3, 480)
+
+    assert days == [[], [], []]
+    assert unscheduled == [(0, "visit_date is outside the trip"), (1, "visit_date is outside the trip")]
@@ -0,0 +1,79 @@
+import pytest
+
+from search import SearchIndex, normalize, stem, tokenize
+
+def test_normalize_folds_case_accents_and_arabic_variants():
+    assert normalize("Café PETRA") == "cafe petra"
+    # Diacritics and tatweel are dropped, alef/teh marbuta variants folded
+    assert normalize("البَتْـراء") == normalize("البتراء")
+    assert normalize("أإآ") == "ااا"
+    assert normalize("قلعة") == "قلعه"
+
+def test_tokenize_splits_words():
+    assert tokenize("Wadi Rum, the Valley of the Moon!") == ["wadi", "rum", "the", "valley", "of", "the", "moon"]
+    assert tokenize(None) == []
+
+@pytest.mark.parametrize("token, expected", [
+    ("cities", "city"),
+    ("churches", "church"),
+    ("castles", "castle"),
+    ("walking", "walk"),
+    ("painted", "paint"),
+    # Suffix stripping never leaves a stem shorter than STEM_MIN_LENGTH
+    ("spring", "spring"),
+    ("hiking", "hiking"),
+    ("bus", "bus"),
+    ("البتراء", "بتراء"),
+])
+def test_stem(token, expected):
+    assert stem(token) == expected
+
+@pytest.fixture
+def index() -> SearchIndex:
+    index = SearchIndex()
+    index.upsert("hike", {"name": "Hiking Trails of Dana", "category": "nature"})
+    index.upsert("city", {"name": "Cities of the Decapolis", "category": "historical"})
+    index.upsert("spring", {"name": "Ma'in Hot Springs", "category": "wellness"})
+    index.upsert("petra", {"name": "Petra", "name_ar": "البتراء", "category": "historical"})
+    return index
+
+def _ids(results):
+    return [doc_id for _, doc_id in results]
+
+@pytest.mark.parametrize("query, expected", [
+    ("hiki", "hike"),
+    ("hikin", "hike"),
+    ("citi", "city"),
+    ("spri", "spring"),
+    ("sprin", "spring"),
+    ("pet", "petra"),
+    ("الب", "petra"),
+    ("بتر", "petra"),
+])
+def test_prefix_matches_partial_words(index, query, expected):
+    assert _ids(index.search(query)) == [expected]
+
+def test_prefix_only_applies_to_the_last_token(index):
+    assert _ids(index.search("hot spri")) == ["spring"]
+    assert _ids(index.search("spri hot")) == []
+    assert _ids(index.search("hiki", prefix=False)) == []
+
+def test_whole_word_outranks_prefix_and_all_tokens_must_match():
+    index = SearchIndex()
+    index.upsert("a", {"name": "Rum"})
+    index.upsert("b", {"name": "Rummana Campsite"})
+    assert _ids(index.search("rum")) == ["a", "b"]
+    assert _ids(index.search("campsite rum")) == ["b"]
+    assert _ids(index.search("rum campsite")) == []
+
+def test_accept_filters_documents(index):
+    assert _ids(index.search("of", accept=lambda doc_id: doc_id == "city")) == ["city"]
+
+def test_remove_and_reupsert_keep_vocabularies_consistent(index):
+    index.upsert("hike", {"name": "Dana Biosphere Reserve"})
+    assert _ids(index.search("hiki")) == []
+    assert _ids(index.search("biosph")) == ["hike"]
+    for doc_id in ("hike", "city", "spring", "petra"):
+        index.remove(doc_id)
+    assert len(index) == 0
+    assert index.stats() == {"documents": 0, "terms": 0, "surface_tokens": 0}
@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import pytest
+
+from supabase_executor import BlockingCallExecutor, SupabaseBusyError
+
+def test_run_returns_result_and_counts():
+    async def main():
+        executor = BlockingCallExecutor("test", 2, 2)
+        assert await executor.run(lambda a, b: a + b, 1, b=2) == 3
+        with pytest.raises(ZeroDivisionError):
+            await executor.run(lambda: 1 / 0)
+        await asyncio.sleep(0)
+        return executor.stats()
+
+    stats = asyncio.run(main())
+    assert stats["completed"] == 1
+    assert stats["failed"] == 1
+    assert stats["in_flight"] == 0
+
+def test_cancelled_caller_keeps_call_in_flight_until_thread_finishes():
+    release = threading.Event()
+
+    async def main():
+        executor = BlockingCallExecutor("test", 1, 0)
+        task = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The thread is still blocked, so the pool is still full
+        assert executor.in_flight == 1
+        with pytest.raises(SupabaseBusyError):
+            await executor.run(lambda: None)
+
+        release.set()
+        for _ in range(100):
+            if executor.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        return executor.stats()
+
+    stats = asyncio.run(main())
+    assert stats["in_flight"] == 0
+    assert stats["rejected"] == 1
@@ -0,0 +1,160 @@
+import asyncio
+import time
+
+import pytest
+
+import weather
+from weather import WeatherCache, WeatherPrefetcher, geohash_encode, parse_locations
+
+class Clock:
+    """time.monotonic shifted by an adjustable offset"""
+
+    def __init__(self, monotonic):
+        self.monotonic = monotonic
+        self.offset = 0.0
+
+    def __call__(self) -> float:
+        return self.monotonic() + self.offset
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(time.monotonic)
+    monkeypatch.setattr(weather.time, "monotonic", clock)
+    return clock
+
+class Upstream:
+    """Weather fetcher that counts calls and can be held until released"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = None
+        self.result = "ok"
+
+    async def __call__(self, lat, lon, lang):
+        self.calls.append((lat, lon, lang))
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.result == "error":
+            raise ConnectionError("weather API unreachable")
+        if self.result is None:
+            return None
+        return {"temp": len(self.calls), "lang": lang}
+
+def _cache() -> WeatherCache:
+    return WeatherCache(ttl=600, stale=3600, max_size=100, precision=5)
+
+def test_geohash_known_cells():
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash_encode(0.0, 0.0, 5) == "s0000"
+    assert geohash_encode(-90.0, -180.0, 3) == "000"
+
+def test_nearby_points_share_a_cell_and_distant_ones_do_not():
+    cache = _cache()
+    # Two points about 300 m apart in central Amman
+    assert cache.key(31.9539, 35.9106, "en") == cache.key(31.9520, 35.9130, "en")
+    assert cache.key(31.9539, 35.9106, "en") != cache.key(31.9539, 35.9106, "ar")
+    assert cache.key(31.9539, 35.9106, "en") != cache.key(30.3285, 35.4444, "en")
+    assert len(cache.key(31.9539, 35.9106, "en")[0]) == 5
+
+def test_parse_locations_skips_invalid_entries():
+    assert parse_locations("Amman:31.95:35.91; ;Bad;Wadi Rum:29.5:35.4") == [("Amman", 31.95, 35.91), ("Wadi Rum", 29.5, 35.4)]
+
+def test_miss_then_hit_then_stale_then_expired(clock):
+    cache = _cache()
+    upstream = Upstream()
+
+    async def scenario():
+        first = await cache.get(31.95, 35.91, "en", upstream)
+        hit = await cache.get(31.9501, 35.9101, "en", upstream)
+        clock.offset += 601
+        stale = await cache.get(31.95, 35.91, "en", upstream)
+        # The background refresh replaces the stale entry
+        await asyncio.sleep(0)
+        await asyncio.gather(*cache._inflight.values())
+        refreshed = await cache.get(31.95, 35.91, "en", upstream)
+        clock.offset += 600 + 3600
+        expired = await cache.get(31.95, 35.91, "en", upstream)
+        return first, hit, stale, refreshed, expired
+
+    first, hit, stale, refreshed, expired = asyncio.run(scenario())
+    assert first == ({"temp": 1, "lang": "en"}, "MISS")
+    assert hit == ({"temp": 1, "lang": "en"}, "HIT")
+    assert stale == ({"temp": 1, "lang": "en"}, "STALE")
+    assert refreshed == ({"temp": 2, "lang": "en"}, "HIT")
+    assert expired == ({"temp": 3, "lang": "en"}, "MISS")
+    assert cache.stats()["stale_hits"] == 1
+
+def test_concurrent_misses_share_one_upstream_call(clock):
+    cache = _cache()
+    upstream = Upstream()
+
+    async def scenario():
+        upstream.gate = asyncio.Event()
+        requests = [asyncio.create_task(cache.get(31.95, 35.91, "en", upstream)) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        assert cache.stats()["refreshes_in_flight"] == 1
+        upstream.gate.set()
+        return await asyncio.gather(*requests)
+
+    results = asyncio.run(scenario())
+    assert len(upstream.calls) == 1
+    assert all(result == ({"temp": 1, "lang": "en"}, "MISS") for result in results)
+    assert cache.stats()["refreshes_in_flight"] == 0
+
+def test_stale_entry_is_refreshed_once_in_the_background(clock):
+    cache = _cache()
+    upstream = Upstream()
+
+    async def scenario():
+        await cache.get(31.95, 35.91, "en", upstream)
+        clock.offset += 601
+        upstream.gate = asyncio.Event()
+        # Stale answers do not wait for the upstream call
+        results = [await cache.get(31.95, 35.91, "en", upstream) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert len(cache._inflight) == 1
+        upstream.gate.set()
+        await asyncio.gather(*cache._inflight.values())
+        return results
+
+    results = asyncio.run(scenario())
+    assert [status for _, status in results] == ["STALE"] * 5
+    assert len(upstream.calls) == 2
+
+@pytest.mark.parametrize("result", [None, "error"])
+def test_failed_refresh_keeps_the_stale_entry(clock, result):
+    cache = _cache()
+    upstream = Upstream()
+
+    async def scenario():
+        await cache.get(31.95, 35.91, "en", upstream)
+        clock.offset += 601
+        upstream.result = result
+        await cache.get(31.95, 35.91, "en", upstream)
+        await asyncio.sleep(0)
+        await asyncio.gather(*cache._inflight.values())
+        return await cache.get(31.95, 35.91, "en", upstream), await cache.get(10.0, 10.0, "en", upstream)
+
+    stale, missing = asyncio.run(scenario())
+    assert stale[1] == "STALE" and stale[0]["temp"] == 1
+    assert missing == (None, "MISS")
+    # The failed refresh, the retry started by the next stale read, and the miss
+    assert cache.stats()["refresh_failures"] == 3
+
+def test_prefetcher_refreshes_each_cell_and_language_once(clock):
+    cache = _cache()
+    upstream = Upstream()
+
+    async def locations():
+        # Two Amman points fall in the same cell
+        return [("Amman", 31.9539, 35.9106), ("Amman Citadel", 31.9520, 35.9130), ("Petra", 30.3285, 35.4444)]
+
+    prefetcher = WeatherPrefetcher(cache, upstream, locations, interval=480, langs=["en", "ar"], concurrency=2)
+
+    async def scenario():
+        await prefetcher.run_once()
+        return await cache.get(31.9539, 35.9106, "ar", upstream)
+
+    assert asyncio.run(scenario())[1] == "HIT"
+    assert len(upstream.calls) == 4
+    assert prefetcher.stats()["locations"] == 3
@@ -0,0 +1,236 @@
+import os
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+# Weather cache configuration
+WEATHER_CACHE_TTL_SECONDS = int(os.getenv("WEATHER_CACHE_TTL_SECONDS", "600"))
+WEATHER_CACHE_STALE_SECONDS = int(os.getenv("WEATHER_CACHE_STALE_SECONDS", "3600"))
+WEATHER_CACHE_MAX_SIZE = int(os.getenv("WEATHER_CACHE_MAX_SIZE", "2048"))
+# Precision 5 is a cell of roughly 4.9 x 4.9 km
+WEATHER_GEOHASH_PRECISION = int(os.getenv("WEATHER_GEOHASH_PRECISION", "5"))
+
+# Background prefetching of popular destinations
+WEATHER_PREFETCH_ENABLED = os.getenv("WEATHER_PREFETCH_ENABLED", "true").lower() == "true"
+WEATHER_PREFETCH_INTERVAL_SECONDS = int(os.getenv("WEATHER_PREFETCH_INTERVAL_SECONDS", "480"))
+WEATHER_PREFETCH_CONCURRENCY = int(os.getenv("WEATHER_PREFETCH_CONCURRENCY", "4"))
+WEATHER_PREFETCH_LANGS = [lang.strip() for lang in os.getenv("WEATHER_PREFETCH_LANGS", "en,ar").split(",") if lang.strip()]
+# "static" uses WEATHER_PREFETCH_LOCATIONS, "destinations" uses the active rows of the destinations table
+WEATHER_PREFETCH_SOURCE = os.getenv("WEATHER_PREFETCH_SOURCE", "static").lower()
+
+DEFAULT_PREFETCH_LOCATIONS = "Amman:31.9539:35.9106;Petra:30.3285:35.4444;Wadi Rum:29.5765:35.4195;Dead Sea:31.5590:35.4732;Aqaba:29.5320:35.0063;Jerash:32.2808:35.8993"
+
+Location = Tuple[str, float, float]
+
+def parse_locations(value: str) -> List[Location]:
+    """Parse "Name:lat:lon;Name:lat:lon" into (name, lat, lon) tuples"""
+    locations = []
+    for item in value.split(";"):
+        if not item.strip():
+            continue
+        try:
+            name, lat, lon = item.rsplit(":", 2)
+            locations.append((name.strip(), float(lat), float(lon)))
+        except ValueError:
+            logger.warning(f"Ignoring invalid weather prefetch location: {item!r}")
+    return locations
+
+WEATHER_PREFETCH_LOCATIONS = parse_locations(os.getenv("WEATHER_PREFETCH_LOCATIONS", DEFAULT_PREFETCH_LOCATIONS))
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+WeatherFetcher = Callable[[float, float, str], Awaitable[Optional[Dict[str, Any]]]]
+
+def geohash_encode(lat: float, lon: float, precision: int = WEATHER_GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a geohash cell of the given length"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        value, value_range = (lon, lon_range) if even else (lat, lat_range)
+        mid = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            value_range[0] = mid
+        else:
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(geohash)
+
+class WeatherCache:
+    """
+    Weather payloads keyed by geohash cell and language, served stale-while-revalidate.
+
+    A fresh entry (younger than ttl) is returned as is. A stale entry (younger
+    than ttl + stale) is still returned, and a single background refresh is
+    started for its cell. Concurrent misses for the same cell share one
+    upstream call.
+    """
+
+    def __init__(self, ttl: int, stale: int, max_size: int, precision: int):
+        self.ttl = ttl
+        self.stale = stale
+        self.precision = precision
+        self._entries = TTLCache("weather", max_size=max_size, ttl=ttl + stale)
+        self._inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+        self.stale_hits = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+    def key(self, lat: float, lon: float, lang: str) -> Tuple[str, str]:
+        return geohash_encode(lat, lon, self.precision), lang
+
+    async def get(self, lat: float, lon: float, lang: str, fetch: WeatherFetcher) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Return (payload, cache_status) where cache_status is HIT, STALE or MISS.
+        The payload is None when nothing is cached and the upstream call failed.
+        """
+        key = self.key(lat, lon, lang)
+        entry = self._entries.get(key)
+        if entry is not MISSING:
+            payload, fetched_at = entry
+            if time.monotonic() - fetched_at < self.ttl:
+                return payload, "HIT"
+            self.stale_hits += 1
+            self._refresh(key, lat, lon, lang, fetch)
+            return payload, "STALE"
+
+        payload = await asyncio.shield(self._refresh(key, lat, lon, lang, fetch))
+        return payload, "MISS"
+
+    def refresh(self, lat: float, lon: float, lang: str, fetch: WeatherFetcher) -> asyncio.Task:
+        """Refresh a cell regardless of its age (used to warm the cache)"""
+        return self._refresh(self.key(lat, lon, lang), lat, lon, lang, fetch)
+
+    def _refresh(self, key: Tuple[str, str], lat: float, lon: float, lang: str, fetch: WeatherFetcher) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, lat, lon, lang, fetch))
+            self._inflight[key] = task
+        return task
+
+    async def _fetch(self, key: Tuple[str, str], lat: float, lon: float, lang: str, fetch: WeatherFetcher) -> Optional[Dict[str, Any]]:
+        self.refreshes += 1
+        try:
+            payload = await fetch(lat, lon, lang)
+            if payload is not None:
+                self._entries.set(key, (payload, time.monotonic()))
+            else:
+                self.refresh_failures += 1
+            return payload
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.error(f"Error refreshing weather for cell {key[0]}: {e}")
+            return None
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._entries.stats(),
+            "fresh_ttl_seconds": self.ttl,
+            "stale_seconds": self.stale,
+            "geohash_precision": self.precision,
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "refreshes_in_flight": len(self._inflight),
+        }
+
+weather_cache = WeatherCache(
+    WEATHER_CACHE_TTL_SECONDS,
+    WEATHER_CACHE_STALE_SECONDS,
+    WEATHER_CACHE_MAX_SIZE,
+    WEATHER_GEOHASH_PRECISION,
+)
+
+class WeatherPrefetcher:
+    """
+    Keeps the weather cache warm for a list of locations.
+
+    Every interval (shorter than the cache TTL) each location is refreshed in
+    every configured language, so user requests for those cells are always hits.
+    """
+
+    def __init__(
+        self,
+        cache: WeatherCache,
+        fetch: WeatherFetcher,
+        load_locations: Callable[[], Awaitable[List[Location]]],
+        interval: int,
+        langs: List[str],
+        concurrency: int,
+    ):
+        self.cache = cache
+        self.fetch = fetch
+        self.load_locations = load_locations
+        self.interval = interval
+        self.langs = langs
+        self.concurrency = concurrency
+        self.last_run: Optional[float] = None
+        self.last_location_count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Weather prefetcher started (every {self.interval}s, langs={self.langs})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Weather prefetch failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        locations = await self.load_locations()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Several destinations can share a cell; refresh each cell once
+        cells = {}
+        for name, lat, lon in locations:
+            for lang in self.langs:
+                cells.setdefault(self.cache.key(lat, lon, lang), (lat, lon, lang))
+
+        async def refresh(lat: float, lon: float, lang: str):
+            async with semaphore:
+                await self.cache.refresh(lat, lon, lang, self.fetch)
+
+        await asyncio.gather(*(refresh(*args) for args in cells.values()))
+        self.last_run = time.time()
+        self.last_location_count = len(locations)
+        logger.debug(f"Prefetched weather for {len(cells)} cell(s)")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None,
+            "interval_seconds": self.interval,
+            "locations": self.last_location_count,
+            "last_run": self.last_run,
+        }
@@ -6,7 +6,7 @@ CREATE TABLE IF NOT EXISTS itineraries (
     destination_name TEXT NOT NULL,
     destination_type TEXT,
     destination_icon TEXT,
-    added_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    added_at TIMESTAMP WITH TIME ZONE DEFAULT NOW() NOT NULL,
     notes TEXT,
     status TEXT DEFAULT 'planned' CHECK (status IN ('planned', 'visited', 'cancelled')),
     visit_date DATE,
@@ -0,0 +1,40 @@
+-- Publish changed keys so every API worker can evict them from its in-process caches
+-- Workers LISTEN on the "cache_invalidation" channel (requires a direct, non-pooled connection)
+
+CREATE OR REPLACE FUNCTION notify_cache_invalidation()
+RETURNS TRIGGER AS $$
+DECLARE
+    changed JSONB;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed = to_jsonb(OLD);
+    ELSE
+        changed = to_jsonb(NEW);
+    END IF;
+
+    PERFORM pg_notify(
+        'cache_invalidation',
+        json_build_object(
+            'table', TG_TABLE_NAME,
+            'op', TG_OP,
+            'id', changed->>'id',
+            'user_id', changed->>'user_id'
+        )::text
+    );
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Profiles: the cache key is the profile id (the user id)
+DROP TRIGGER IF EXISTS notify_profiles_cache_invalidation ON profiles;
+CREATE TRIGGER notify_profiles_cache_invalidation
+    AFTER INSERT OR UPDATE OR DELETE ON profiles
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_cache_invalidation();
+
+-- Itineraries: caches are scoped per user, so the payload carries user_id as well
+DROP TRIGGER IF EXISTS notify_itineraries_cache_invalidation ON itineraries;
+CREATE TRIGGER notify_itineraries_cache_invalidation
+    AFTER INSERT OR UPDATE OR DELETE ON itineraries
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_cache_invalidation();
@@ -0,0 +1,23 @@
+-- Fetch a user's profile, creating it with default preferences if it does not exist yet
+-- One round trip from the API: supabase.rpc("get_or_create_profile", {"p_user_id": ...})
+-- Safe under concurrent first requests: the INSERT ... ON CONFLICT DO NOTHING loser
+-- falls through to the SELECT, which sees the winner's committed row
+
+CREATE OR REPLACE FUNCTION get_or_create_profile(
+    p_user_id UUID,
+    p_preferences JSONB DEFAULT '{"interests": [], "budget": "medium", "travelsWith": "Solo"}'
+)
+RETURNS SETOF profiles AS $$
+BEGIN
+    RETURN QUERY
+    INSERT INTO profiles (id, preferences)
+    VALUES (p_user_id, p_preferences)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING *;
+
+    IF NOT FOUND THEN
+        RETURN QUERY
+        SELECT * FROM profiles WHERE id = p_user_id;
+    END IF;
+END;
+$$ language 'plpgsql';
@@ -0,0 +1,22 @@
+-- Keyset cursors carry added_at, so every row needs one: backfill rows that have none
+-- (from a legacy created_at column where there is one) and keep the column NOT NULL
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'itineraries' AND column_name = 'created_at'
+    ) THEN
+        UPDATE itineraries SET added_at = COALESCE(created_at, NOW()) WHERE added_at IS NULL;
+    ELSE
+        UPDATE itineraries SET added_at = NOW() WHERE added_at IS NULL;
+    END IF;
+END $$;
+ALTER TABLE itineraries ALTER COLUMN added_at SET DEFAULT NOW();
+ALTER TABLE itineraries ALTER COLUMN added_at SET NOT NULL;
+
+-- Composite index for keyset pagination of GET /api/itineraries
+-- Matches: WHERE user_id = $1 [AND (added_at, id) < ($2, $3)] ORDER BY added_at DESC, id DESC LIMIT n
+CREATE INDEX IF NOT EXISTS idx_itineraries_user_added_at_id ON itineraries(user_id, added_at DESC, id DESC);
+
+-- Filters on status / visit_date are applied on top of the user's rows
+CREATE INDEX IF NOT EXISTS idx_itineraries_user_visit_date ON itineraries(user_id, visit_date);
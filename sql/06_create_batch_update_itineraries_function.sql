@@ -0,0 +1,21 @@
+-- Apply many itinerary updates for one user in a single statement
+-- p_changes is a JSON array of objects: {"id": "<uuid>", "<column>": <value>, ...}
+-- Only keys present in an object are written, so a key with a null value clears that column
+-- Rows that do not exist or belong to another user are skipped (not returned)
+
+CREATE OR REPLACE FUNCTION batch_update_itineraries(p_user_id UUID, p_changes JSONB)
+RETURNS SETOF itineraries AS $$
+    UPDATE itineraries AS i
+    SET
+        destination_name = CASE WHEN c.change ? 'destination_name' THEN c.change->>'destination_name' ELSE i.destination_name END,
+        destination_type = CASE WHEN c.change ? 'destination_type' THEN c.change->>'destination_type' ELSE i.destination_type END,
+        destination_icon = CASE WHEN c.change ? 'destination_icon' THEN c.change->>'destination_icon' ELSE i.destination_icon END,
+        notes = CASE WHEN c.change ? 'notes' THEN c.change->>'notes' ELSE i.notes END,
+        status = CASE WHEN c.change ? 'status' THEN c.change->>'status' ELSE i.status END,
+        visit_date = CASE WHEN c.change ? 'visit_date' THEN (c.change->>'visit_date')::date ELSE i.visit_date END,
+        priority = CASE WHEN c.change ? 'priority' THEN (c.change->>'priority')::integer ELSE i.priority END
+    FROM jsonb_array_elements(p_changes) AS c(change)
+    WHERE i.id = (c.change->>'id')::uuid
+      AND i.user_id = p_user_id
+    RETURNING i.*;
+$$ language 'sql';
@@ -0,0 +1,22 @@
+-- Track when each destination changes so API workers can refresh their in-memory catalog incrementally
+-- (rows with updated_at past the last one seen) instead of reloading the whole table
+
+ALTER TABLE destinations
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+-- update_updated_at_column() is created in 01_create_profiles_table.sql
+DROP TRIGGER IF EXISTS update_destinations_updated_at ON destinations;
+CREATE TRIGGER update_destinations_updated_at
+    BEFORE UPDATE ON destinations
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+CREATE INDEX IF NOT EXISTS idx_destinations_updated_at ON destinations(updated_at);
+
+-- Tell workers to refresh right away (notify_cache_invalidation() is created in 03_create_cache_invalidation_triggers.sql)
+-- Deactivate destinations (is_active = false) rather than deleting them so incremental refreshes see the change
+DROP TRIGGER IF EXISTS notify_destinations_cache_invalidation ON destinations;
+CREATE TRIGGER notify_destinations_cache_invalidation
+    AFTER INSERT OR UPDATE OR DELETE ON destinations
+    FOR EACH ROW
+    EXECUTE FUNCTION notify_cache_invalidation();